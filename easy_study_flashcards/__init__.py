@@ -1,97 +1,418 @@
+import argparse
 import os
 import pathlib
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from loguru import logger
-from easy_study_flashcards.pdf_processing.core import PDFProcessor
-from easy_study_flashcards.gemini.client import GeminiClientManager, get_chapters_from_gemini, process_pdfs_with_gemini_sdk
-from easy_study_flashcards.gemini.models import ChapterInfo
-from easy_study_flashcards.pdf_processing.splitter import split_pdf_by_chapters
-from easy_study_flashcards.utils.latex import get_xelatex_path
-from easy_study_flashcards.utils.localization import localizer as _
+# Only the standard library is imported here: the SDK, pypdf and the pydantic
+# models are loaded inside main() after the cheap startup checks, so that
+# --help, an empty folder or a missing xelatex answer immediately.
 
-if __name__ == "__main__":
-    get_xelatex_path() # checks if xelatex is available
+INPUT_MODES: List[str] = ["pdf", "text_layer"]  # values of InputMode
+DROPPABLE_PAGE_KINDS: List[str] = ["blank", "figure", "bibliography", "index"]  # values of PageKind
+GENERATION_MODES: List[str] = ["full_document", "body_only", "structured"]  # values of GenerationMode
+SCHEDULE_POLICIES: List[str] = ["file_order", "longest_first", "shortest_first", "priority"]  # values of SchedulePolicy
+STAGES: List[str] = ["chapter_detection", "first_chapter_page", "generation", "correction"]  # values of Stage
 
-    pdf_folder: str = "."
 
-    gemini_model_2_0: str = "gemini-2.0-flash"
-    gemini_model_2_5: str = "gemini-2.5-flash"
+def _stage_deadline(value: str) -> Tuple[str, float]:
+    """STAGE=SECONDS, for --stage-deadline"""
+    stage, separator, seconds = value.partition("=")
+    if not separator or stage not in STAGES:
+        raise argparse.ArgumentTypeError(f"expected STAGE=SECONDS with STAGE one of {', '.join(STAGES)}")
+    try:
+        return stage, float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number of seconds: {seconds}")
+
+
+def _build_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Study flashcards from pdf")
+    parser.add_argument(
+        "folder",
+        nargs="?",
+        default=".",
+        help="folder containing the PDF books to process (default: current folder)",
+    )
+    parser.add_argument(
+        "--input-mode",
+        choices=INPUT_MODES,
+        default="pdf",
+        help="send pages as PDF, or send their text layer and fall back to PDF for pages without text",
+    )
+    parser.add_argument(
+        "--drop-pages",
+        nargs="+",
+        choices=DROPPABLE_PAGE_KINDS,
+        metavar="KIND",
+        help="don't send these kinds of chapter pages to Gemini: blank, figure, bibliography, index",
+    )
+    parser.add_argument(
+        "--compact-dpi",
+        type=int,
+        metavar="DPI",
+        help="compact chapter PDFs before the upload, downsampling images above this resolution",
+    )
+    parser.add_argument(
+        "--precompile-preamble",
+        action="store_true",
+        help="compile the generated LaTeX against a cached xelatex format of its preamble",
+    )
+    parser.add_argument(
+        "--generation-mode",
+        choices=GENERATION_MODES,
+        default="full_document",
+        help="let the model write the whole LaTeX document, only its body, or structured flashcards rendered to LaTeX locally",
+    )
+    parser.add_argument(
+        "--card-store",
+        metavar="PATH",
+        help="SQLite file where the cards of every finished chapter are stored "
+        "(query it with python -m easy_study_flashcards.cards)",
+    )
+    parser.add_argument(
+        "--deduplicate",
+        action="store_true",
+        help="don't extract again the theorems and definitions restated in later chapters of a book",
+    )
+    parser.add_argument(
+        "--locate-toc",
+        action="store_true",
+        help="find the table of contents locally and send only it and the first chapter for the chapter detection",
+    )
+    parser.add_argument(
+        "--adaptive-scan",
+        action="store_true",
+        help="detect the chapters from the first 12 pages, doubling them while the chapter list looks incomplete",
+    )
+    parser.add_argument(
+        "--adaptive-scan-max-pages",
+        type=int,
+        default=80,
+        help="with --adaptive-scan, the most pages the detection may look at (default: 80)",
+    )
+    parser.add_argument(
+        "--single-call-detection",
+        action="store_true",
+        help="detect the chapters and the first chapter page with one structured request per book",
+    )
+    parser.add_argument(
+        "--verify-offsets",
+        action="store_true",
+        help="check the detected chapter pages against the text of the book before the split, skip the book if they don't match",
+    )
+    parser.add_argument(
+        "--prune-split-resources",
+        action="store_true",
+        help="keep in every chapter file only the fonts and images its pages use: smaller files for books whose pages share one resource dictionary, at the cost of split time and memory",
+    )
+    parser.add_argument(
+        "--chapters-model",
+        default="gemini-2.0-flash",
+        help="model that detects the chapters of the books (default: gemini-2.0-flash)",
+    )
+    parser.add_argument(
+        "--generation-model",
+        default="gemini-2.5-flash",
+        help="model that writes the flashcards (default: gemini-2.5-flash)",
+    )
+    parser.add_argument(
+        "--light-model",
+        help="cheaper model for the first chapter page lookup, small chapters and the first correction of a chapter",
+    )
+    parser.add_argument(
+        "--small-chapter-pages",
+        type=int,
+        default=8,
+        help="chapters with at most this many pages go to the light model (default: 8)",
+    )
+    parser.add_argument(
+        "--model-table",
+        metavar="PATH",
+        help="JSON file with the price and latency of the models, added to the built-in table",
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=int,
+        default=10,
+        help="request limit of every API key (default: 10). Several keys can be given, comma separated, in GEMINI_API_KEYS",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=SCHEDULE_POLICIES,
+        default="file_order",
+        help="order in which the chapters of a book are processed (default: file_order)",
+    )
+    parser.add_argument(
+        "--chapter-priority",
+        nargs="+",
+        metavar="NAME",
+        help="with --schedule priority, chapters whose file name contains these names are processed first, in this order",
+    )
+    parser.add_argument(
+        "--stage-deadline",
+        nargs="+",
+        type=_stage_deadline,
+        metavar="STAGE=SECONDS",
+        help="abandon the requests of a stage after this many seconds, 0 for no deadline "
+        "(default: chapter_detection=180 first_chapter_page=60 generation=600 correction=600)",
+    )
+    parser.add_argument(
+        "--hedge-requests",
+        action="store_true",
+        help="send a duplicate of a request still running after the p95 latency of its stage, if the rate limit allows it",
+    )
+    parser.add_argument(
+        "--subject",
+        help="subject of the books; if missing it is asked interactively (or generic in service mode)",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="only estimate the tokens, cost and wall time of every book, without generating anything",
+    )
+    parser.add_argument(
+        "--count-tokens",
+        action="store_true",
+        help="with --plan, count the input tokens of every book with the API instead of estimating them locally",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="reuse the chapters of a previous run whose content didn't change, generating only the changed ones",
+    )
+    parser.add_argument(
+        "--queue",
+        metavar="PATH",
+        help="SQLite job queue shared by the workers: the books are only detected and split, "
+        "their chapters are queued for the workers",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="take chapters from the --queue and generate them, until interrupted",
+    )
+    parser.add_argument(
+        "--exit-when-drained",
+        action="store_true",
+        help="with --worker, stop when no chapter is queued or running",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="keep running: process the PDFs that appear in the folder and the jobs sent over HTTP",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="port of the local HTTP API in service mode (default: 8765)",
+    )
+    return parser
 
-    api_key: Optional[str] = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        logger.error(_.get_string('api_key_missing'))
-        exit()
 
-    gemini_client: GeminiClientManager = GeminiClientManager(api_key=api_key)
+def main() -> None:
+    parser: argparse.ArgumentParser = _build_argument_parser()
+    args = parser.parse_args()
+    if args.worker and not args.queue:
+        parser.error("--worker needs --queue")
 
-    PAGES_TO_ANALYZE_FOR_CHAPTERS: int = 30
-    PAGES_TO_ANALYZE_FOR_FIRST_CHAPTER_PHYSICAL_PAGE: int = 40
+    from loguru import logger
+    from easy_study_flashcards.utils.localization import localizer as _
+
+    pdf_folder: str = args.folder
+    if not os.path.isdir(pdf_folder):
+        logger.error(_.get_string('folder_not_exist', folder=pdf_folder))
+        return
 
     pdf_files_to_process: List[str] = [
         f for f in os.listdir(pdf_folder) if f.lower().endswith(".pdf")
     ]
-
-    if not pdf_files_to_process:
+    if not pdf_files_to_process and not args.serve and not args.worker:
         logger.warning(_.get_string('no_pdf_files', folder=pdf_folder))
-    else:
-        subject_matter_input: str = input(_.get_string('subject_prompt'))
-        if not subject_matter_input.strip():
+        return
+
+    from easy_study_flashcards.utils.latex import XelatexNotFoundError, get_xelatex_path
+
+    if not args.plan:
+        try:
+            get_xelatex_path() # checks if xelatex is available
+        except XelatexNotFoundError:
+            exit()
+
+    api_keys: List[str] = [
+        key.strip()
+        for key in (os.environ.get("GEMINI_API_KEYS") or os.environ.get("GEMINI_API_KEY") or "").split(",")
+        if key.strip()
+    ]
+    if not api_keys and (not args.plan or args.count_tokens):
+        logger.error(_.get_string('api_key_missing'))
+        exit()
+
+    # Heavy imports, only once the run is known to be possible
+    from easy_study_flashcards.gemini.chapter_scheduler import SchedulePolicy
+    from easy_study_flashcards.gemini.client import GeminiClientManager
+    from easy_study_flashcards.gemini.client_pool import GeminiClientPool
+    from easy_study_flashcards.gemini.hedging import DEFAULT_STAGE_DEADLINES, HedgedClient
+    from easy_study_flashcards.gemini.routing import Stage, UsageReport, load_model_profiles
+    from easy_study_flashcards.gemini.prompts import GenerationMode
+    from easy_study_flashcards.pdf_processing.compaction import CompactionOptions
+    from easy_study_flashcards.pdf_processing.page_filter import PageFilterPolicy, PageKind
+    from easy_study_flashcards.pdf_processing.text_layer import InputMode
+    from easy_study_flashcards.pipeline import PipelineSettings, process_book
+
+    subject_matter_input: str = args.subject or ""
+    if not subject_matter_input.strip() and not args.serve and not args.plan and not args.worker:
+        subject_matter_input = input(_.get_string('subject_prompt'))
+    if not subject_matter_input.strip():
+        if not args.plan:
             logger.warning(_.get_string('no_subject'))
-            subject_matter_input = _.get_string("generic_subject")
-
-        for pdf_file in pdf_files_to_process:
-            full_pdf_path: pathlib.Path = pathlib.Path(
-                os.path.join(pdf_folder, pdf_file)
-            )
-
-            book_structure = get_chapters_from_gemini(
-                full_pdf_path,
-                gemini_model_2_0,
-                gemini_model_2_5,
-                gemini_client,
-                lang=_.get_current_language().value,
-                pages_to_process_chapters=PAGES_TO_ANALYZE_FOR_CHAPTERS,
-                pages_to_process_physical_page=PAGES_TO_ANALYZE_FOR_FIRST_CHAPTER_PHYSICAL_PAGE,
-            )
-
-            if book_structure:
-                chapters_info: Optional[List[ChapterInfo]] = book_structure.chapters
-                first_numbered_page: Optional[int] = (
-                    book_structure.first_chapter_physical_page
-                )
-
-                logger.info(
-                    _.get_string(
-                        'chapter_start_index',
-                        index=first_numbered_page
-                    )
-                )
-
-                output_chapter_folder: str = os.path.join(
-                    pdf_folder, f"{os.path.splitext(pdf_file)[0]}_chapters"
-                )
-                split_pdf_by_chapters(
-                    full_pdf_path,
-                    chapters_info,
-                    first_numbered_page,
-                    output_chapter_folder,
-                )
-
-                process_pdfs_with_gemini_sdk(
-                    output_chapter_folder,
-                    gemini_model_2_5,
-                    gemini_client,
-                    lang=_.get_current_language().value,
-                    subject_matter=subject_matter_input,
-                )
-            else:
-                logger.error(
-                    _.get_string(
-                        'chapter_info_error',
-                        model=gemini_model_2_0,
-                        error='No structure returned'
-                    )
-                )
-    # print(f"{Colors.WARNING}Total cost for the whole conversion: ${gemini_client.total_cost.amount_as_string()} {Colors.ENDC}")
-    logger.info(_.get_string('processing_complete'))
\ No newline at end of file
+        subject_matter_input = _.get_string("generic_subject")
+
+    settings: PipelineSettings = PipelineSettings(
+        subject_matter=subject_matter_input,
+        lang=_.get_current_language().value,
+        model_name_chapters=args.chapters_model,
+        model_name_generation=args.generation_model,
+        light_model=args.light_model,
+        small_chapter_pages=args.small_chapter_pages,
+        input_mode=InputMode(args.input_mode),
+        locate_toc=args.locate_toc,
+        adaptive_scan=args.adaptive_scan,
+        adaptive_scan_max_pages=args.adaptive_scan_max_pages,
+        single_call_detection=args.single_call_detection,
+        verify_offsets=args.verify_offsets,
+        page_filter_policy=(
+            PageFilterPolicy(drop_kinds={PageKind(kind) for kind in args.drop_pages})
+            if args.drop_pages
+            else None
+        ),
+        compaction_options=(
+            CompactionOptions(target_dpi=args.compact_dpi) if args.compact_dpi else None
+        ),
+        precompiled_preamble=args.precompile_preamble,
+        generation_mode=GenerationMode(args.generation_mode),
+        card_store_path=os.path.abspath(args.card_store) if args.card_store else None,
+        deduplicate=args.deduplicate,
+        prune_split_resources=args.prune_split_resources,
+        schedule_policy=SchedulePolicy(args.schedule),
+        chapter_priorities=args.chapter_priority,
+        job_queue_path=os.path.abspath(args.queue) if args.queue and not args.worker else None,
+        incremental=args.incremental,
+    )
+
+    usage: UsageReport = UsageReport(load_model_profiles(args.model_table) if args.model_table else None)
+
+    if args.plan:
+        _plan(pdf_folder, settings, usage, api_keys, args.requests_per_minute, args.count_tokens)
+        return
+
+    stage_deadlines = dict(DEFAULT_STAGE_DEADLINES)
+    for stage_name, seconds in args.stage_deadline or []:
+        if seconds > 0:
+            stage_deadlines[Stage(stage_name)] = seconds
+        else:
+            stage_deadlines.pop(Stage(stage_name), None)
+    gemini_client: HedgedClient = HedgedClient(
+        GeminiClientPool.from_api_keys(api_keys, args.requests_per_minute, usage=usage)
+        if len(api_keys) > 1
+        else GeminiClientManager(
+            api_key=api_keys[0], max_requests_per_minute=args.requests_per_minute, usage=usage
+        ),
+        deadlines=stage_deadlines,
+        hedging=args.hedge_requests,
+    )
+
+    if args.worker:
+        _work(os.path.abspath(args.queue), gemini_client, settings, args.exit_when_drained)
+        usage.log_summary()
+        gemini_client.metrics.log_summary()
+        return
+
+    if args.serve:
+        _serve(pdf_folder, args.port, gemini_client, settings)
+        usage.log_summary()
+        gemini_client.metrics.log_summary()
+        return
+
+    for pdf_file in pdf_files_to_process:
+        full_pdf_path: pathlib.Path = pathlib.Path(
+            os.path.join(pdf_folder, pdf_file)
+        )
+        process_book(full_pdf_path, gemini_client, settings)
+
+    usage.log_summary()
+    gemini_client.metrics.log_summary()
+    logger.info(_.get_string('processing_complete'))
+
+
+def _plan(pdf_folder: str, settings, usage, api_keys: List[str], requests_per_minute: int, count_tokens: bool) -> None:
+    """Runs the planner on the folder. Only --count-tokens talks to the API."""
+    from easy_study_flashcards.gemini.client import GeminiClientManager, count_pdf_tokens
+    from easy_study_flashcards.planner import plan_folder
+
+    token_counter = None
+    if count_tokens:
+        client = GeminiClientManager(api_key=api_keys[0])
+        token_counter = lambda pdf_paths, model_name: count_pdf_tokens(
+            client,
+            pdf_paths,
+            model_name,
+            settings.input_mode,
+            settings.page_filter_policy,
+            settings.compaction_options,
+        )
+    plan_folder(
+        pdf_folder,
+        settings,
+        requests_per_minute * max(len(api_keys), 1),
+        usage,
+        token_counter,
+    )
+
+
+def _work(queue_path: str, gemini_client, settings, exit_when_drained: bool) -> None:
+    """Runs a queue worker until interrupted, or until the queue is drained."""
+    from loguru import logger
+    from easy_study_flashcards.job_queue import JobQueue, QueueWorker
+    from easy_study_flashcards.pipeline import process_queued_chapter
+    from easy_study_flashcards.utils.localization import localizer as _
+
+    with JobQueue(queue_path) as job_queue:
+        worker = QueueWorker(job_queue, lambda job: process_queued_chapter(job, gemini_client, settings))
+        logger.info(_.get_string("queue_worker_started", worker=worker.worker_id, path=queue_path))
+        try:
+            worker.run(exit_when_drained=exit_when_drained)
+        except KeyboardInterrupt:
+            logger.info(_.get_string("service_stopping"))
+        logger.info(_.get_string("queue_worker_finished", worker=worker.worker_id, jobs=worker.processed))
+
+
+def _serve(pdf_folder: str, port: int, gemini_client, settings) -> None:
+    """Runs the service mode until interrupted, reusing the same client for every job."""
+    import dataclasses
+    import time
+
+    from loguru import logger
+    from easy_study_flashcards.pipeline import process_book
+    from easy_study_flashcards.service import FlashcardService, Job
+    from easy_study_flashcards.utils.localization import localizer as _
+
+    def process_job(job: Job) -> bool:
+        job_settings = settings
+        if job.subject_matter:
+            job_settings = dataclasses.replace(settings, subject_matter=job.subject_matter)
+        return process_book(pathlib.Path(job.pdf_path), gemini_client, job_settings)
+
+    service = FlashcardService(process_job, watch_folder=pdf_folder)
+    service.start(port=port)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info(_.get_string("service_stopping"))
+    finally:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+from easy_study_flashcards import main
+
+main()
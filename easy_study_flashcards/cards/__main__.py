@@ -0,0 +1,72 @@
+import argparse
+import sqlite3
+from typing import List
+
+from easy_study_flashcards.cards.export import export_anki, export_csv
+from easy_study_flashcards.cards.store import Card, CardStore
+from easy_study_flashcards.utils.colors import Colors
+from easy_study_flashcards.utils.localization import localizer as _
+
+
+def _print_cards(cards: List[Card]) -> None:
+    if not cards:
+        print(_.get_string("cards_none_found"))
+        return
+    for card in cards:
+        print(f"{Colors.OKCYAN}[{card.id}] {card.book} / {card.chapter} ({card.kind.value}){Colors.ENDC}")
+        print(card.front)
+        print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query and export the card store")
+    parser.add_argument("store", help="path of the card store (see --card-store)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="full-text search over the cards")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument(
+        "--fts-syntax", action="store_true", help="use FTS5 query syntax (AND, OR, NEAR, prefix*)"
+    )
+
+    due = commands.add_parser("due", help="list the cards due for review")
+    due.add_argument("--book")
+    due.add_argument("--limit", type=int, default=20)
+
+    review = commands.add_parser("review", help="record a review graded from 0 to 5")
+    review.add_argument("card_id", type=int)
+    review.add_argument("quality", type=int, choices=range(6))
+
+    export = commands.add_parser("export", help="export every card")
+    export.add_argument("output")
+    export.add_argument("--format", choices=["csv", "anki"], default="csv")
+
+    args = parser.parse_args()
+
+    with CardStore(args.store) as store:
+        if args.command == "search":
+            try:
+                cards: List[Card] = store.search(args.query, limit=args.limit, fts_syntax=args.fts_syntax)
+            except sqlite3.OperationalError as e:
+                print(_.get_string("cards_invalid_query", query=args.query, error=str(e)))
+                return
+            _print_cards(cards)
+        elif args.command == "due":
+            _print_cards(store.due_cards(limit=args.limit, book=args.book))
+        elif args.command == "review":
+            try:
+                card: Card = store.review(args.card_id, args.quality)
+            except KeyError:
+                print(_.get_string("cards_none_found"))
+                return
+            print(_.get_string("card_reviewed", id=card.id, days=card.state.interval_days))
+        else:
+            with open(args.output, "w", encoding="utf-8", newline="") as output:
+                exporter = export_anki if args.format == "anki" else export_csv
+                count: int = exporter(store, output)
+            print(_.get_string("cards_exported", count=count, file=args.output))
+
+
+if __name__ == "__main__":
+    main()
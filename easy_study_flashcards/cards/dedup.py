@@ -0,0 +1,138 @@
+import hashlib
+import random
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from easy_study_flashcards.cards.extraction import PROOF_LABELS, CardKind, ExtractedCard
+
+# Only statements are restated across chapters, exercises are always new
+DEDUPLICATED_KINDS: Set[CardKind] = {CardKind.THEOREM, CardKind.DEFINITION}
+
+SHINGLE_SIZE: int = 2
+NUM_PERMUTATIONS: int = 64
+# 16 bands of 4 rows: pairs above the threshold almost always share a band
+NUM_BANDS: int = 16
+ROWS_PER_BAND: int = NUM_PERMUTATIONS // NUM_BANDS
+DEFAULT_THRESHOLD: float = 0.7
+
+_MERSENNE_PRIME: int = (1 << 61) - 1
+_random = random.Random(20240601)  # fixed, signatures must be stable between runs
+_PERMUTATIONS: List[Tuple[int, int]] = [
+    (_random.randrange(1, _MERSENNE_PRIME), _random.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+LABEL_PATTERN = re.compile(r"^\s*\\textbf\{[^{}]*\}\s*")
+COMMAND_PATTERN = re.compile(r"\\([a-zA-Z]+)")
+NON_WORD_PATTERN = re.compile(r"[^\w]+")
+# Words the prompts put around the statement, which every card shares,
+# and formatting commands, which don't change what it says
+BOILERPLATE_WORDS: Set[str] = {
+    "define", "definire", "par", "textbf", "textit", "texttt", "emph", "underline", "text", "mathrm",
+} | {label.rstrip(":").lower() for label in PROOF_LABELS}
+
+
+def normalize_statement(front: str) -> str:
+    """
+    The text of a card without its label (numbers change between chapters),
+    formatting and punctuation, lowercase.
+    """
+    text: str = LABEL_PATTERN.sub("", front)
+    text = COMMAND_PATTERN.sub(r" \1 ", text)
+    words: List[str] = [
+        word for word in NON_WORD_PATTERN.sub(" ", text.lower()).split() if word not in BOILERPLATE_WORDS
+    ]
+    return " ".join(words)
+
+
+def shingles(normalized_text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    words: List[str] = normalized_text.split()
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(shingle_set: Set[str]) -> Tuple[int, ...]:
+    hashes: List[int] = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        for shingle in shingle_set
+    ]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def estimated_similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the shingle sets of two signatures."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERMUTATIONS
+
+
+@dataclass
+class IndexedItem:
+    chapter: str
+    card: ExtractedCard
+    normalized: str
+    signature: Tuple[int, ...]
+
+
+class DuplicateIndex:
+    """
+    Per-book index of the statements already extracted. A card is a duplicate
+    of an item of another chapter with the same normalized text, or with an
+    estimated shingle similarity above the threshold (candidates come from
+    MinHash LSH buckets, so lookups don't scan the whole book).
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold: float = threshold
+        self.items: List[IndexedItem] = []
+        self._by_text: Dict[str, List[IndexedItem]] = defaultdict(list)
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[IndexedItem]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @staticmethod
+    def _bands(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [
+            (band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])
+            for band in range(NUM_BANDS)
+        ]
+
+    def add(self, chapter: str, card: ExtractedCard) -> None:
+        if card.kind not in DEDUPLICATED_KINDS:
+            return
+        normalized: str = normalize_statement(card.front)
+        if not normalized:
+            return
+        item = IndexedItem(chapter, card, normalized, minhash_signature(shingles(normalized)))
+        self.items.append(item)
+        self._by_text[normalized].append(item)
+        for band in self._bands(item.signature):
+            self._buckets[band].append(item)
+
+    def find_duplicate(self, chapter: str, card: ExtractedCard) -> Optional[IndexedItem]:
+        """The item of another chapter this card restates, if any."""
+        if card.kind not in DEDUPLICATED_KINDS:
+            return None
+        normalized: str = normalize_statement(card.front)
+        if not normalized:
+            return None
+
+        for item in self._by_text.get(normalized, []):
+            if item.chapter != chapter:
+                return item
+
+        signature: Tuple[int, ...] = minhash_signature(shingles(normalized))
+        best: Optional[IndexedItem] = None
+        best_similarity: float = self.threshold
+        seen: Set[int] = set()
+        for band in self._bands(signature):
+            for item in self._buckets.get(band, []):
+                if item.chapter == chapter or id(item) in seen:
+                    continue
+                seen.add(id(item))
+                similarity: float = estimated_similarity(signature, item.signature)
+                if similarity >= best_similarity:
+                    best, best_similarity = item, similarity
+        return best
@@ -0,0 +1,59 @@
+import csv
+import html
+from typing import TextIO
+
+from easy_study_flashcards.cards.store import CardStore
+
+CSV_HEADER = ["id", "book", "chapter", "kind", "front", "due_at", "interval_days", "ease", "repetitions", "lapses"]
+
+
+def _tag(text: str) -> str:
+    """Anki tags can't contain spaces."""
+    return "_".join(text.split())
+
+
+def export_csv(store: CardStore, output: TextIO) -> int:
+    """Writes every card, with its review state, as CSV. Returns the number of cards."""
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+    count: int = 0
+    for card in store.iter_cards():
+        writer.writerow(
+            [
+                card.id,
+                card.book,
+                card.chapter,
+                card.kind.value,
+                card.front,
+                card.due_at,
+                card.state.interval_days,
+                card.state.ease,
+                card.state.repetitions,
+                card.state.lapses,
+            ]
+        )
+        count += 1
+    return count
+
+
+def export_anki(store: CardStore, output: TextIO) -> int:
+    """
+    Writes every card as an Anki text import file (File > Import): the front is
+    rendered by Anki's LaTeX support, the back is left for the answer and the
+    tags are the book, the chapter and the kind. Returns the number of cards.
+    """
+    output.write("#separator:tab\n#html:true\n#tags column:3\n")
+    writer = csv.writer(output, delimiter="\t", lineterminator="\n")
+    count: int = 0
+    for card in store.iter_cards():
+        writer.writerow(
+            [
+                f"[latex]{html.escape(card.front, quote=False)}[/latex]",
+                "",
+                " ".join(
+                    [_tag(card.book), f"{_tag(card.book)}::{_tag(card.chapter)}", card.kind.value]
+                ),
+            ]
+        )
+        count += 1
+    return count
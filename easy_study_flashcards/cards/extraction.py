@@ -0,0 +1,135 @@
+import re
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from easy_study_flashcards.gemini.rendering import RENDERING_STRINGS
+
+
+class CardKind(Enum):
+    THEOREM = "theorem"
+    DEFINITION = "definition"
+    EXERCISE = "exercise"
+    GENERATED_EXERCISE = "generated_exercise"
+
+
+@dataclass
+class ExtractedCard:
+    """The front of a card, as found in the generated LaTeX of a chapter."""
+
+    kind: CardKind
+    front: str
+
+
+SECTION_PATTERN = re.compile(r"\\section\*?\{([^}]*)\}")
+LIST_TOKEN_PATTERN = re.compile(
+    r"\\begin\{(?:enumerate|itemize|description)\}|\\end\{(?:enumerate|itemize|description)\}|\\item\b"
+)
+
+# Section headings of every prompt language, mapped to the kind of their cards
+# (None for the statements, whose kind depends on the item)
+SECTION_KINDS: Dict[str, Optional[CardKind]] = {}
+for _strings in RENDERING_STRINGS.values():
+    SECTION_KINDS[_strings["extracted_content"].lower()] = None
+    SECTION_KINDS[_strings["original_exercises"].lower()] = CardKind.EXERCISE
+    SECTION_KINDS[_strings["generated_exercises"].lower()] = CardKind.GENERATED_EXERCISE
+PROOF_LABELS: List[str] = [_strings["proof"] for _strings in RENDERING_STRINGS.values()]
+
+
+def _top_level_item_spans(section_text: str) -> List[Tuple[int, int, int]]:
+    """
+    (\\item position, text start, text end) of the items of the outermost
+    list of a section; nested lists are part of their item.
+    """
+    spans: List[Tuple[int, int, int]] = []
+    depth: int = 0
+    item: Optional[Tuple[int, int]] = None
+
+    for match in LIST_TOKEN_PATTERN.finditer(section_text):
+        token: str = match.group(0)
+        if token.startswith("\\begin"):
+            depth += 1
+        elif token.startswith("\\end"):
+            if depth == 1 and item is not None:
+                spans.append((item[0], item[1], match.start()))
+                item = None
+            depth = max(depth - 1, 0)
+        elif depth == 1:
+            if item is not None:
+                spans.append((item[0], item[1], match.start()))
+            item = (match.start(), match.end())
+
+    return spans
+
+
+def split_top_level_items(section_text: str) -> List[str]:
+    """Returns the \\item texts of the outermost list of a section, nested lists included in their item."""
+    items: List[str] = [
+        section_text[start:end].strip() for _, start, end in _top_level_item_spans(section_text)
+    ]
+    return [item for item in items if item]
+
+
+def _iter_sections(latex_body: str) -> Iterator[Tuple[int, int, int, Optional[CardKind]]]:
+    """(heading start, content start, end, kind) of the known sections of a body."""
+    sections = list(SECTION_PATTERN.finditer(latex_body))
+    # In a full document the last section ends at \end{document}
+    body_end: int = latex_body.rfind(r"\end{document}")
+    if body_end == -1:
+        body_end = len(latex_body)
+    for index, section in enumerate(sections):
+        heading: str = section.group(1).strip().lower()
+        if heading not in SECTION_KINDS:
+            continue
+        section_end: int = sections[index + 1].start() if index + 1 < len(sections) else body_end
+        yield section.start(), section.end(), section_end, SECTION_KINDS[heading]
+
+
+def _card_kind(section_kind: Optional[CardKind], item: str) -> CardKind:
+    return section_kind or (
+        CardKind.THEOREM if any(label in item for label in PROOF_LABELS) else CardKind.DEFINITION
+    )
+
+
+def extract_cards(latex_body: str) -> List[ExtractedCard]:
+    """
+    Reads the cards of a chapter from the body of its generated LaTeX: one card
+    per top-level item of the known sections, in the order of the document.
+    """
+    cards: List[ExtractedCard] = []
+    for _, content_start, section_end, section_kind in _iter_sections(latex_body):
+        for item in split_top_level_items(latex_body[content_start:section_end]):
+            cards.append(ExtractedCard(kind=_card_kind(section_kind, item), front=item))
+    return cards
+
+
+def drop_cards(
+    latex_body: str, should_drop: Callable[[ExtractedCard], bool]
+) -> Tuple[str, List[ExtractedCard]]:
+    """
+    Removes from a body the items whose card should be dropped, and the
+    sections left without items (an empty list doesn't compile).
+    Returns the new body and the dropped cards.
+    """
+    dropped: List[ExtractedCard] = []
+    removals: List[Tuple[int, int]] = []
+
+    for heading_start, content_start, section_end, section_kind in _iter_sections(latex_body):
+        section_text: str = latex_body[content_start:section_end]
+        spans = _top_level_item_spans(section_text)
+        section_removals: List[Tuple[int, int]] = []
+        for item_position, start, end in spans:
+            item: str = section_text[start:end].strip()
+            card: ExtractedCard = ExtractedCard(kind=_card_kind(section_kind, item), front=item)
+            if item and should_drop(card):
+                dropped.append(card)
+                section_removals.append((content_start + item_position, content_start + end))
+
+        if spans and len(section_removals) == len(spans):
+            removals.append((heading_start, section_end))
+        else:
+            removals.extend(section_removals)
+
+    for start, end in reversed(removals):
+        latex_body = latex_body[:start] + latex_body[end:]
+    return latex_body, dropped
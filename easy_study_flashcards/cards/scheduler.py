@@ -0,0 +1,44 @@
+from dataclasses import dataclass
+
+SECONDS_PER_DAY: int = 86400
+MIN_EASE: float = 1.3
+DEFAULT_EASE: float = 2.5
+
+
+@dataclass
+class ReviewState:
+    """Spaced-repetition state of a card."""
+
+    interval_days: float = 0.0
+    ease: float = DEFAULT_EASE
+    repetitions: int = 0
+    lapses: int = 0
+
+
+def schedule_review(state: ReviewState, quality: int) -> ReviewState:
+    """
+    SM-2: computes the state after a review graded from 0 (blackout) to 5 (perfect).
+    Grades below 3 start the card over, the others grow the interval by the ease.
+    """
+    assert 0 <= quality <= 5, "quality should be an integer between 0 and 5"
+
+    if quality < 3:
+        repetitions: int = 0
+        interval_days: float = 1.0
+        lapses: int = state.lapses + 1
+    else:
+        repetitions = state.repetitions + 1
+        lapses = state.lapses
+        if state.repetitions == 0:
+            interval_days = 1.0
+        elif state.repetitions == 1:
+            interval_days = 6.0
+        else:
+            interval_days = float(round(state.interval_days * state.ease))
+
+    ease: float = max(
+        MIN_EASE, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    )
+    return ReviewState(
+        interval_days=interval_days, ease=ease, repetitions=repetitions, lapses=lapses
+    )
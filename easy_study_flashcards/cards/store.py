@@ -0,0 +1,221 @@
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Set
+
+from easy_study_flashcards.cards.extraction import CardKind, ExtractedCard
+from easy_study_flashcards.cards.scheduler import SECONDS_PER_DAY, ReviewState, schedule_review
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    book TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    front TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    due_at REAL NOT NULL,
+    interval_days REAL NOT NULL DEFAULT 0,
+    ease REAL NOT NULL DEFAULT 2.5,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    lapses INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (book, chapter, front)
+);
+-- The due queue is a range scan on these, whatever the number of cards
+CREATE INDEX IF NOT EXISTS cards_due_at ON cards (due_at);
+CREATE INDEX IF NOT EXISTS cards_book_due_at ON cards (book, due_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+    front, book, chapter, content='cards', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS cards_fts_insert AFTER INSERT ON cards BEGIN
+    INSERT INTO cards_fts (rowid, front, book, chapter)
+    VALUES (new.id, new.front, new.book, new.chapter);
+END;
+CREATE TRIGGER IF NOT EXISTS cards_fts_delete AFTER DELETE ON cards BEGIN
+    INSERT INTO cards_fts (cards_fts, rowid, front, book, chapter)
+    VALUES ('delete', old.id, old.front, old.book, old.chapter);
+END;
+CREATE TRIGGER IF NOT EXISTS cards_fts_update AFTER UPDATE OF front, book, chapter ON cards BEGIN
+    INSERT INTO cards_fts (cards_fts, rowid, front, book, chapter)
+    VALUES ('delete', old.id, old.front, old.book, old.chapter);
+    INSERT INTO cards_fts (rowid, front, book, chapter)
+    VALUES (new.id, new.front, new.book, new.chapter);
+END;
+"""
+
+
+@dataclass
+class Card:
+    id: int
+    book: str
+    chapter: str
+    kind: CardKind
+    front: str
+    due_at: float
+    state: ReviewState = field(default_factory=ReviewState)
+
+
+def _card_from_row(row: sqlite3.Row) -> Card:
+    return Card(
+        id=row["id"],
+        book=row["book"],
+        chapter=row["chapter"],
+        kind=CardKind(row["kind"]),
+        front=row["front"],
+        due_at=row["due_at"],
+        state=ReviewState(
+            interval_days=row["interval_days"],
+            ease=row["ease"],
+            repetitions=row["repetitions"],
+            lapses=row["lapses"],
+        ),
+    )
+
+
+def _fts_phrases(query: str) -> str:
+    """Quotes every word as an FTS5 string, so "-", ":" or "\\" are plain text."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+class CardStore:
+    """
+    SQLite-backed store of the generated cards, with a full-text index over
+    their text and an SM-2 due queue.
+    """
+
+    def __init__(self, path: str):
+        self.connection: sqlite3.Connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        # Readers (search, study) don't block the pipeline while it writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "CardStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def add_chapter_cards(
+        self,
+        book: str,
+        chapter: str,
+        cards: Iterable[ExtractedCard],
+        now: Optional[float] = None,
+    ) -> int:
+        """
+        Stores the cards of a chapter, replacing the ones of a previous run.
+        Cards whose text didn't change keep their review history.
+        New cards are due immediately. Returns the number of new cards.
+        """
+        now = time.time() if now is None else now
+        cards = list(cards)
+        with self.connection:
+            existing: Set[str] = {
+                row["front"]
+                for row in self.connection.execute(
+                    "SELECT front FROM cards WHERE book = ? AND chapter = ?", (book, chapter)
+                )
+            }
+            new_fronts: Set[str] = {card.front for card in cards}
+            self.connection.executemany(
+                "DELETE FROM cards WHERE book = ? AND chapter = ? AND front = ?",
+                [(book, chapter, front) for front in existing - new_fronts],
+            )
+            inserted = self.connection.executemany(
+                "INSERT OR IGNORE INTO cards (book, chapter, kind, front, created_at, due_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (book, chapter, card.kind.value, card.front, now, now)
+                    for card in cards
+                    if card.front not in existing
+                ],
+            )
+        return inserted.rowcount
+
+    def count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+
+    def get_card(self, card_id: int) -> Optional[Card]:
+        row = self.connection.execute(
+            "SELECT * FROM cards WHERE id = ?", (card_id,)
+        ).fetchone()
+        return _card_from_row(row) if row is not None else None
+
+    def search(self, query: str, limit: int = 20, fts_syntax: bool = False) -> List[Card]:
+        """
+        Full-text search over the cards, best matches first. Every word of the
+        query must appear; with fts_syntax the query is passed to FTS5 as it is,
+        and a malformed one raises sqlite3.OperationalError.
+        """
+        if not fts_syntax:
+            query = _fts_phrases(query)
+            if not query:
+                return []
+        rows = self.connection.execute(
+            "SELECT cards.* FROM cards_fts JOIN cards ON cards.id = cards_fts.rowid "
+            "WHERE cards_fts MATCH ? ORDER BY bm25(cards_fts) LIMIT ?",
+            (query, limit),
+        )
+        return [_card_from_row(row) for row in rows]
+
+    def due_cards(
+        self, now: Optional[float] = None, limit: int = 20, book: Optional[str] = None
+    ) -> List[Card]:
+        """The cards to study at the given time, the most overdue first."""
+        now = time.time() if now is None else now
+        if book is None:
+            rows = self.connection.execute(
+                "SELECT * FROM cards WHERE due_at <= ? ORDER BY due_at LIMIT ?",
+                (now, limit),
+            )
+        else:
+            rows = self.connection.execute(
+                "SELECT * FROM cards WHERE book = ? AND due_at <= ? "
+                "ORDER BY due_at LIMIT ?",
+                (book, now, limit),
+            )
+        return [_card_from_row(row) for row in rows]
+
+    def review(self, card_id: int, quality: int, now: Optional[float] = None) -> Card:
+        """Records a review graded 0-5 and schedules the next one."""
+        now = time.time() if now is None else now
+        card: Optional[Card] = self.get_card(card_id)
+        if card is None:
+            raise KeyError(card_id)
+
+        card.state = schedule_review(card.state, quality)
+        card.due_at = now + card.state.interval_days * SECONDS_PER_DAY
+        with self.connection:
+            self.connection.execute(
+                "UPDATE cards SET due_at = ?, interval_days = ?, ease = ?, repetitions = ?, lapses = ? "
+                "WHERE id = ?",
+                (
+                    card.due_at,
+                    card.state.interval_days,
+                    card.state.ease,
+                    card.state.repetitions,
+                    card.state.lapses,
+                    card_id,
+                ),
+            )
+        return card
+
+    def iter_cards(self, batch_size: int = 1000, book: Optional[str] = None) -> Iterator[Card]:
+        """All the cards (of a book), read in batches so exports don't load the whole store."""
+        if book is None:
+            cursor = self.connection.execute("SELECT * FROM cards ORDER BY id")
+        else:
+            cursor = self.connection.execute(
+                "SELECT * FROM cards WHERE book = ? ORDER BY id", (book,)
+            )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield _card_from_row(row)
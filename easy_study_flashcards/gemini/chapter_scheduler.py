@@ -0,0 +1,176 @@
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Deque, List, Optional, Tuple
+
+from loguru import logger
+from pypdf import PdfReader
+
+from easy_study_flashcards.utils.localization import localizer as _
+
+# Throughput is measured on the requests of the last minutes, so the ETA follows slowdowns
+THROUGHPUT_WINDOW_SECONDS: float = 300.0
+
+
+class SchedulePolicy(Enum):
+    FILE_ORDER = "file_order"  # Natural order of the chapter files
+    LONGEST_FIRST = "longest_first"
+    SHORTEST_FIRST = "shortest_first"
+    PRIORITY = "priority"  # The listed chapters first, in the given order
+
+
+@dataclass
+class ChapterJob:
+    file_name: str
+    pages: int
+
+
+def natural_sort_key(name: str) -> List[int | str]:
+    """"Chapter_2" before "Chapter_10"."""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def _count_pages(pdf_path: str) -> int:
+    try:
+        return len(PdfReader(pdf_path).pages)
+    except Exception:
+        return 0
+
+
+def schedule_chapters(
+    folder_path: str,
+    pdf_files: List[str],
+    policy: SchedulePolicy = SchedulePolicy.FILE_ORDER,
+    priorities: Optional[List[str]] = None,
+) -> List[ChapterJob]:
+    """
+    Orders the chapter files of a folder. The size of a chapter is its page
+    count. With SchedulePolicy.PRIORITY, the chapters whose file name contains
+    one of the priorities (case insensitive) come first, in the order of the
+    priorities; the others follow in file order, as do ties of the other policies.
+    """
+    jobs: List[ChapterJob] = [
+        ChapterJob(file_name, _count_pages(os.path.join(folder_path, file_name)))
+        for file_name in sorted(pdf_files, key=natural_sort_key)
+    ]
+
+    if policy == SchedulePolicy.LONGEST_FIRST:
+        return sorted(jobs, key=lambda job: -job.pages)
+    if policy == SchedulePolicy.SHORTEST_FIRST:
+        return sorted(jobs, key=lambda job: job.pages)
+    if policy == SchedulePolicy.PRIORITY:
+        lowered: List[str] = [priority.lower() for priority in priorities or []]
+
+        def rank(job: ChapterJob) -> int:
+            name: str = job.file_name.lower()
+            return next((i for i, priority in enumerate(lowered) if priority in name), len(lowered))
+
+        return sorted(jobs, key=rank)
+    return jobs
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m {seconds % 60:02d}s"
+
+
+class ProgressTracker:
+    """
+    Progress of the chapters of a folder, with an ETA from the observed
+    throughput: the pages left are turned into tokens and requests with the
+    tokens per page and the requests per chapter seen so far, and the ETA is
+    the longer of the two at the tokens per second and requests per minute
+    of the last THROUGHPUT_WINDOW_SECONDS.
+    """
+
+    def __init__(self, jobs: List[ChapterJob], clock: Callable[[], float] = time.time):
+        self.total_chapters: int = len(jobs)
+        self.total_pages: int = sum(job.pages for job in jobs)
+        self.done_chapters: int = 0
+        self.done_pages: int = 0
+        self.requests: int = 0
+        self.tokens: int = 0
+        # Tokens and requests of the chapter in progress, counted once it's done
+        self._chapter_tokens: int = 0
+        self._chapter_requests: int = 0
+        self._done_tokens: int = 0
+        self._done_requests: int = 0
+        self._recent: Deque[Tuple[float, int]] = deque()
+        self._window_full: bool = False
+        self._clock: Callable[[], float] = clock
+        self.started: float = clock()
+
+    def record_request(self, tokens: int) -> None:
+        now: float = self._clock()
+        self.requests += 1
+        self.tokens += tokens
+        self._chapter_requests += 1
+        self._chapter_tokens += tokens
+        self._recent.append((now, tokens))
+        while self._recent and now - self._recent[0][0] > THROUGHPUT_WINDOW_SECONDS:
+            self._recent.popleft()
+            self._window_full = True
+
+    def finish_chapter(self, job: ChapterJob) -> None:
+        self.done_chapters += 1
+        self.done_pages += job.pages
+        self._done_tokens += self._chapter_tokens
+        self._done_requests += self._chapter_requests
+        self._chapter_tokens = 0
+        self._chapter_requests = 0
+
+    def _window_seconds(self) -> float:
+        # From the start of the run until requests start falling out of the window
+        start: float = self._recent[0][0] if self._window_full else self.started
+        return max(self._clock() - start, 1e-9)
+
+    @property
+    def tokens_per_second(self) -> float:
+        return sum(tokens for _ts, tokens in self._recent) / self._window_seconds() if self._recent else 0.0
+
+    @property
+    def requests_per_minute(self) -> float:
+        return len(self._recent) * 60 / self._window_seconds() if self._recent else 0.0
+
+    def eta_seconds(self) -> Optional[float]:
+        """None until a chapter is done: before that there is nothing to extrapolate from."""
+        if self.done_chapters == 0 or not self._recent:
+            return None
+        remaining_chapters: int = self.total_chapters - self.done_chapters
+        if remaining_chapters <= 0:
+            return 0.0
+        remaining_pages: int = self.total_pages - self.done_pages
+        # Tokens of the work left, minus what the chapter in progress already used
+        tokens_per_unit: float = (
+            self._done_tokens / self.done_pages if self.done_pages > 0 else self._done_tokens / self.done_chapters
+        )
+        remaining_units: int = remaining_pages if self.done_pages > 0 else remaining_chapters
+        remaining_tokens: float = max(remaining_units * tokens_per_unit - self._chapter_tokens, 0)
+        remaining_requests: float = max(
+            remaining_chapters * self._done_requests / self.done_chapters - self._chapter_requests, 0
+        )
+        token_seconds: float = remaining_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+        request_seconds: float = (
+            remaining_requests * 60 / self.requests_per_minute if self.requests_per_minute else 0.0
+        )
+        return max(token_seconds, request_seconds)
+
+    def log_progress(self) -> None:
+        eta: Optional[float] = self.eta_seconds()
+        logger.info(
+            _.get_string(
+                "chapter_progress",
+                done=self.done_chapters,
+                total=self.total_chapters,
+                done_pages=self.done_pages,
+                total_pages=self.total_pages,
+                tokens_per_second=f"{self.tokens_per_second:.0f}",
+                requests_per_minute=f"{self.requests_per_minute:.1f}",
+                eta=format_duration(eta) if eta is not None else "--",
+            )
+        )
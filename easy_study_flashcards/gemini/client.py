@@ -1,27 +1,79 @@
 import os
 import pathlib
+import threading
 import time
 from io import BytesIO
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 from google import genai
 from google.genai.types import GenerateContentResponse, Part
 from pypdf import PdfReader
 from stockholm import Money
 
+from easy_study_flashcards.cards.dedup import DuplicateIndex
+from easy_study_flashcards.cards.extraction import ExtractedCard, drop_cards, extract_cards
+from easy_study_flashcards.cards.store import CardStore
+from easy_study_flashcards.gemini.chapter_scheduler import (
+    ChapterJob,
+    ProgressTracker,
+    SchedulePolicy,
+    schedule_chapters,
+)
 from easy_study_flashcards.gemini.models import (
     BookStructure,
+    ChapterFlashcards,
     ChapterInfo,
     ChaptersOnly,
 )
-from easy_study_flashcards.gemini.prompts import PromptsForGemini
-from easy_study_flashcards.utils.latex import fix_common_generated_latex_erros
+from easy_study_flashcards.gemini.prompts import GenerationMode, PromptsForGemini
+from easy_study_flashcards.gemini.rendering import render_flashcards_body
+from easy_study_flashcards.gemini.routing import RoutingPolicy, Stage, UsageReport
+from easy_study_flashcards.utils.latex import (
+    LATEX_PREAMBLE,
+    XelatexNotFoundError,
+    extract_latex_body,
+    fix_common_generated_latex_erros,
+    is_latex_body,
+    shift_error_line_numbers,
+    wrap_latex_body,
+)
+from easy_study_flashcards.utils.latex_rules import default_rule_engine
 from easy_study_flashcards.utils.colors import Colors
 from easy_study_flashcards.utils.localization import localizer as _
 from loguru import logger
 
+from easy_study_flashcards.pdf_processing.compaction import CompactionOptions, compact_pdf_bytes
 from easy_study_flashcards.pdf_processing.core import PDFProcessor
+from easy_study_flashcards.pdf_processing.page_filter import PageFilterPolicy, filter_pages
+from easy_study_flashcards.pdf_processing.text_layer import (
+    PDF_PAGE_TOKEN_COST,
+    InputMode,
+    build_text_layer_payload_from_reader,
+    estimate_text_tokens,
+)
+from easy_study_flashcards.pdf_processing.toc_locator import (
+    TocLocation,
+    locate_table_of_contents,
+    map_sent_page_to_physical,
+)
 from google.genai.errors import ClientError, ServerError
 
+# The skip list of the deduplication is bounded, so it can't outgrow the savings
+MAX_SKIP_LIST_ITEMS: int = 80
+MAX_SKIP_LIST_ITEM_CHARS: int = 120
+# Rounds of local patches (each one followed by a compile) before asking the model
+MAX_LOCAL_PATCH_ROUNDS: int = 3
+# Free tier limit of a single API key
+DEFAULT_MAX_REQUESTS_PER_MINUTE: int = 10
+RATE_LIMIT_WINDOW_SECONDS: int = 60
+# Unavailable (503) answers retried before giving up, and the wait after each one
+MAX_UNAVAILABLE_RETRIES: int = 6
+UNAVAILABLE_RETRY_SECONDS: float = 10.0
+
+
+class RequestCancelled(Exception):
+    """The request was abandoned by its caller before it got an answer."""
+
+
 class GeminiClientManager(genai.Client):
     """
     A class that extends the Gemini client to manage API calls
@@ -30,99 +82,258 @@ class GeminiClientManager(genai.Client):
 
     request_timestamps: list[float]
     total_cost: Money = Money(0)
-    __MAX_REQUESTS_PER_MINUTE: int = 10
-    __TIME_WINDOW_SECONDS: int = 60
+    __TIME_WINDOW_SECONDS: int = RATE_LIMIT_WINDOW_SECONDS
 
-    def __init__(self, *args, **kwargs):
+    def __init__(
+        self,
+        *args,
+        max_requests_per_minute: int = DEFAULT_MAX_REQUESTS_PER_MINUTE,
+        usage: Optional[UsageReport] = None,
+        **kwargs,
+    ):
+        assert max_requests_per_minute > 0, "max_requests_per_minute should be bigger than 0"
         super().__init__(*args, **kwargs)
         self.request_timestamps = []
+        self.max_requests_per_minute: int = max_requests_per_minute
+        self.usage: UsageReport = usage if usage is not None else UsageReport()
+        # Requests of a HedgedClient run on several threads
+        self._rate_limit_lock: threading.Lock = threading.Lock()
 
     def _wait_for_rate_limit(self):
         """
         Internal method to enforce the API request rate limit.
+        Reserves the slot of the request, so that concurrent callers can't take the same one.
         """
-        current_time: float = time.time()
-        # Filter out timestamps older than the time window
-        self.request_timestamps = [
-            ts
-            for ts in self.request_timestamps
-            if current_time - ts < self.__TIME_WINDOW_SECONDS
-        ]
-
-        if len(self.request_timestamps) >= self.__MAX_REQUESTS_PER_MINUTE:
-            time_to_wait: float = (
-                self.request_timestamps[0] + self.__TIME_WINDOW_SECONDS - current_time
-            )
-            if time_to_wait > 0:
-                logger.warning(_.get_string("rate_limit", seconds=time_to_wait))
-                time.sleep(time_to_wait)
-                # After waiting, update the current time and filter timestamps again
-                current_time = time.time()
+        while True:
+            with self._rate_limit_lock:
+                current_time: float = time.time()
+                # Filter out timestamps older than the time window
                 self.request_timestamps = [
                     ts
                     for ts in self.request_timestamps
                     if current_time - ts < self.__TIME_WINDOW_SECONDS
                 ]
+                if len(self.request_timestamps) < self.max_requests_per_minute:
+                    # Record the timestamp of the new request
+                    self.request_timestamps.append(current_time)
+                    return
+                time_to_wait: float = (
+                    self.request_timestamps[0] + self.__TIME_WINDOW_SECONDS - current_time
+                )
+            logger.warning(_.get_string("rate_limit", seconds=time_to_wait))
+            time.sleep(max(time_to_wait, 0.01))
+
+    def has_headroom(self) -> bool:
+        """Whether a request can be sent now without waiting for the rate limit."""
+        with self._rate_limit_lock:
+            current_time: float = time.time()
+            recent: int = sum(current_time - ts < self.__TIME_WINDOW_SECONDS for ts in self.request_timestamps)
+        return recent < self.max_requests_per_minute
 
-    def generate_content_with_rate_limit(self, **kwargs) -> GenerateContentResponse:
+    def generate_content_with_rate_limit(
+        self,
+        stage: Optional[Stage] = None,
+        on_sent: Optional[Callable[[], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+        **kwargs,
+    ) -> GenerateContentResponse:
         """
         Wrapper around the generate_content method that respects the rate limit.
+        The stage of the request is only used by wrappers such as HedgedClient.
+        on_sent is called right before every call to the model, after the rate
+        limit wait; once cancelled is set, the request isn't sent or retried again.
         """
         self._wait_for_rate_limit()
         
         input_tokens = self.models.count_tokens(model=kwargs["model"], contents=kwargs["contents"]).total_tokens
 
-        while True:
+        for attempt in range(MAX_UNAVAILABLE_RETRIES + 1):
+            if cancelled is not None and cancelled.is_set():
+                raise RequestCancelled(_.get_string("request_cancelled", model=kwargs["model"]))
+            if on_sent is not None:
+                on_sent()
+            started: float = time.perf_counter()
             try:
                 # Make the API call
                 response = self.models.generate_content(**kwargs)
                 break
             except ServerError as err:
                 # Unavailable
-                if err.code == 503:
-                    logger.warning("Gemini server is being overused, waiting 10 seconds")
-                    time.sleep(10)
+                if err.code != 503 or attempt == MAX_UNAVAILABLE_RETRIES:
+                    raise
+                logger.warning(_.get_string("server_unavailable", seconds=UNAVAILABLE_RETRY_SECONDS))
+                if cancelled is not None:
+                    cancelled.wait(UNAVAILABLE_RETRY_SECONDS)
+                else:
+                    time.sleep(UNAVAILABLE_RETRY_SECONDS)
 
+        latency_seconds: float = time.perf_counter() - started
         output_tokens = response.usage_metadata.candidates_token_count if response.usage_metadata is not None else 0
 
-        self.print_generated_content_cost(input_tokens , output_tokens , kwargs["model"])
-
-        # Record the timestamp of the new request
-        self.request_timestamps.append(time.time())
+        self.print_generated_content_cost(input_tokens, output_tokens or 0, kwargs["model"], latency_seconds)
         return response
 
-    def print_generated_content_cost(self, input_tokens, output_tokens, model_name):
+    def print_generated_content_cost(self, input_tokens, output_tokens, model_name, latency_seconds=0.0):
         """
-        Calculates the estimated cost of a Gemini API call.
-        Note: Pricing is subject to change. Always refer to the official documentation.
+        Records a Gemini API call in the usage report and prints its estimated cost.
+        Note: Pricing is subject to change, the table is in gemini/routing.py.
         """
-        # Prices per 1 million tokens in USD
-        # Using example rates for a specific model (e.g., Gemini 2.5 Flash)
-        # Check the latest prices on the official Google AI for Developers site.
-        pricing = {
-            "gemini-2.5-flash": {
-                "input": 0.30,  # $0.30 per 1M input tokens
-                "output": 2.50,  # $2.50 per 1M output tokens
-            },
-            "gemini-1.5-flash": {
-                "input": 0.075,
-                "output":0.15
-            },
-        }
-
-        if model_name not in pricing:
+        content_cost: Optional[Money] = self.usage.record(
+            model_name, input_tokens, output_tokens, latency_seconds
+        )
+        if content_cost is None:
             return "Error: Pricing data not available for this model."
 
-        input_price = pricing[model_name]["input"]
-        output_price = pricing[model_name]["output"]
+        with self._rate_limit_lock:
+            self.total_cost += content_cost
 
-        content_cost = (Money(input_tokens) / 1_000_000) * input_price + (
-            Money(output_tokens) / 1_000_000
-        ) * output_price
+        print(f"{Colors.BOLD}Total cost: ${content_cost.amount_as_string()}. Input tokens: {input_tokens}, output tokens: {output_tokens} {Colors.ENDC}")
 
-        self.total_cost += content_cost
 
-        print(f"{Colors.BOLD}Total cost: ${content_cost.amount_as_string()}. Input tokens: {input_tokens}, output tokens: {output_tokens} {Colors.ENDC}")
+def _build_document_contents(
+    pdf_path: pathlib.Path,
+    input_mode: InputMode,
+    start_page_index: int = 0,
+    end_page_index: Optional[int] = None,
+    page_filter_policy: Optional[PageFilterPolicy] = None,
+    compaction_options: Optional[CompactionOptions] = None,
+    selected_pages: Optional[List[int]] = None,
+) -> Optional[List[Part | str]]:
+    """
+    Builds the contents that represent the pages [start_page_index, end_page_index)
+    of a PDF. end_page_index=None means up to the end of the file.
+    selected_pages replaces the range with an explicit list of pages, numbered
+    from 1 in the order of the list (in the page markers of the text layer too).
+    In TEXT_LAYER mode pages with a usable text layer are sent as text,
+    the others are still attached as PDF.
+    If a page filter policy is given, non-content pages are left out.
+    If compaction options are given, every PDF part is compacted before being built.
+    """
+    reader: PdfReader = PdfReader(pdf_path)
+    total_pdf_pages: int = len(reader.pages)
+    if end_page_index is None or end_page_index > total_pdf_pages:
+        end_page_index = total_pdf_pages
+
+    page_indices: List[int] = (
+        [i for i in selected_pages if 0 <= i < total_pdf_pages]
+        if selected_pages is not None
+        else list(range(start_page_index, end_page_index))
+    )
+    if not page_indices:
+        logger.error(
+            _.get_string(
+                "pdf_invalid_page_indices",
+                start=start_page_index,
+                end=end_page_index,
+                total=total_pdf_pages,
+            )
+        )
+        return None
+
+    if page_filter_policy is not None:
+        page_indices = filter_pages(reader, page_indices, page_filter_policy, pdf_path.name)
+        if not page_indices:
+            logger.warning(_.get_string("all_pages_dropped", filename=pdf_path.name))
+            return None
+
+    segments: List[str | bytes]
+    if input_mode == InputMode.TEXT_LAYER:
+        payload = build_text_layer_payload_from_reader(
+            reader, page_indices, relative_page_markers=selected_pages is not None
+        )
+        logger.info(
+            _.get_string(
+                "text_layer_savings",
+                filename=pdf_path.name,
+                text_pages=payload.text_pages,
+                total_pages=payload.total_pages,
+                pdf_tokens=payload.estimated_pdf_tokens,
+                tokens=payload.estimated_tokens,
+                saved=payload.estimated_saved_tokens,
+            )
+        )
+        segments = payload.segments
+    elif len(page_indices) == total_pdf_pages:
+        segments = [pdf_path.read_bytes()]
+    else:
+        sub_pdf_bytes: Optional[BytesIO] = PDFProcessor.extract_pdf_page_list_to_bytes(
+            reader, page_indices
+        )
+        if not sub_pdf_bytes:
+            return None
+        segments = [sub_pdf_bytes.getvalue()]
+
+    if compaction_options is not None:
+        original_size: int = 0
+        compacted_size: int = 0
+        images_downsampled: int = 0
+        for i, segment in enumerate(segments):
+            if isinstance(segment, bytes):
+                compaction = compact_pdf_bytes(segment, compaction_options)
+                segments[i] = compaction.data
+                original_size += compaction.original_size
+                compacted_size += compaction.compacted_size
+                images_downsampled += compaction.images_downsampled
+        if original_size > 0:
+            logger.info(
+                _.get_string(
+                    "compaction_saved",
+                    filename=pdf_path.name,
+                    original=original_size,
+                    compacted=compacted_size,
+                    saved=original_size - compacted_size,
+                    images=images_downsampled,
+                )
+            )
+
+    return [
+        Part.from_bytes(data=segment, mime_type="application/pdf")
+        if isinstance(segment, bytes)
+        else segment
+        for segment in segments
+    ]
+
+
+def estimate_contents_tokens(contents: List[Part | str]) -> int:
+    """Local estimate of the input tokens of document contents, as the planner makes it."""
+    tokens: int = 0
+    for content in contents:
+        if isinstance(content, str):
+            tokens += estimate_text_tokens(content)
+        elif content.inline_data is not None and content.inline_data.data:
+            tokens += len(PdfReader(BytesIO(content.inline_data.data)).pages) * PDF_PAGE_TOKEN_COST
+    return tokens
+
+
+def count_pdf_tokens(
+    client: GeminiClientManager,
+    pdf_paths: List[pathlib.Path],
+    model_name: str,
+    input_mode: InputMode = InputMode.PDF,
+    page_filter_policy: Optional[PageFilterPolicy] = None,
+    compaction_options: Optional[CompactionOptions] = None,
+) -> Optional[int]:
+    """
+    Counts with a single count_tokens call the input tokens of a batch of PDF files,
+    built as they would be sent, with the same page filter and compaction.
+    Returns None if the files can't be read or counted.
+    """
+    contents: List[Part | str] = []
+    for pdf_path in pdf_paths:
+        document_contents: Optional[List[Part | str]] = _build_document_contents(
+            pdf_path,
+            input_mode,
+            page_filter_policy=page_filter_policy,
+            compaction_options=compaction_options,
+        )
+        if document_contents is None:
+            return None
+        contents.extend(document_contents)
+    try:
+        return client.models.count_tokens(model=model_name, contents=contents).total_tokens
+    except Exception as e:
+        logger.warning(_.get_string("count_tokens_error", error=e))
+        return None
 
 
 def get_chapters_from_gemini(
@@ -133,10 +344,18 @@ def get_chapters_from_gemini(
     lang: str,
     pages_to_process_chapters: int = 30,
     pages_to_process_physical_page: int = 40,
+    input_mode: InputMode = InputMode.PDF,
+    locate_toc: bool = False,
+    single_call: bool = False,
 ) -> Optional[BookStructure]:
     """
     Asks Gemini models to identify chapters and the physical page of the first chapter,
     processing only a subset of initial PDF pages.
+    With InputMode.TEXT_LAYER the text layer of the pages is sent instead of the PDF.
+    With locate_toc, if the table of contents is found locally in those pages,
+    only it and the pages around the first chapter are sent to both models.
+    With single_call, model_name_physical_page fills the whole BookStructure
+    in one request, from the larger of the two page windows.
     Returns a BookStructure object.
     """
 
@@ -161,46 +380,102 @@ def get_chapters_from_gemini(
     chapters_info: Optional[List[ChapterInfo]] = None
     first_chapter_physical_page: Optional[int] = None
 
-    # --- Prepare PDF parts for the two models using PDFProcessor ---
+    # --- Prepare the document contents for the two models ---
 
-    # For the chapters model (fewer pages)
     num_pages_to_extract_chapters: int = min(pages_to_process_chapters, total_pdf_pages)
-    sub_pdf_bytes_chapters: Optional[BytesIO] = PDFProcessor.extract_pdf_pages_to_bytes(
-        pdf_path, 0, num_pages_to_extract_chapters
-    )
-    if not sub_pdf_bytes_chapters:
-        return None
-
-    # For the physical page model (more pages)
     num_pages_to_extract_physical_page: int = min(
         pages_to_process_physical_page, total_pdf_pages
     )
-    sub_pdf_bytes_physical_page: Optional[BytesIO] = (
-        PDFProcessor.extract_pdf_pages_to_bytes(
-            pdf_path, 0, num_pages_to_extract_physical_page
+    toc_location: Optional[TocLocation] = (
+        locate_table_of_contents(
+            reader, max(num_pages_to_extract_chapters, num_pages_to_extract_physical_page)
         )
+        if locate_toc
+        else None
     )
-    if not sub_pdf_bytes_physical_page:
+
+    detection_calls: int = 1 if single_call else 2
+    # The physical page model answers with a position in these pages, if set
+    sent_pages: Optional[List[int]] = None
+    document_contents_chapters: Optional[List[Part | str]]
+    document_contents_physical_page: Optional[List[Part | str]]
+    if toc_location is not None:
+        sent_pages = toc_location.pages_to_send(total_pdf_pages)
+        document_contents_chapters = _build_document_contents(
+            pdf_path, input_mode, selected_pages=sent_pages
+        )
+        document_contents_physical_page = document_contents_chapters
+        prompt_chapters: str = PromptsForGemini.get_prompt_chapters_from_toc(lang=lang)
+        prompt_physical_page: str = PromptsForGemini.get_prompt_first_chapter_page_in_selection(
+            lang=lang
+        )
+        original_pages: int = num_pages_to_extract_chapters + num_pages_to_extract_physical_page
+        num_pages_to_extract_chapters = num_pages_to_extract_physical_page = len(sent_pages)
+        logger.info(
+            _.get_string(
+                "toc_located",
+                filename=pdf_path.name,
+                toc_pages=", ".join(str(i + 1) for i in toc_location.toc_pages),
+                first_chapter=(
+                    toc_location.first_chapter_page + 1
+                    if toc_location.first_chapter_page is not None
+                    else "?"
+                ),
+                pages=detection_calls * len(sent_pages),
+                original_pages=original_pages,
+                saved=(original_pages - detection_calls * len(sent_pages)) * PDF_PAGE_TOKEN_COST,
+            )
+        )
+    else:
+        if locate_toc:
+            logger.warning(_.get_string("toc_not_found", filename=pdf_path.name))
+        if single_call:
+            # A single window, large enough for both questions
+            num_pages_to_extract_physical_page = max(
+                num_pages_to_extract_chapters, num_pages_to_extract_physical_page
+            )
+        # For the physical page model (more pages)
+        document_contents_physical_page = _build_document_contents(
+            pdf_path, input_mode, 0, num_pages_to_extract_physical_page
+        )
+        # For the chapters model (fewer pages)
+        document_contents_chapters = (
+            document_contents_physical_page
+            if single_call
+            else _build_document_contents(pdf_path, input_mode, 0, num_pages_to_extract_chapters)
+        )
+        prompt_chapters = PromptsForGemini.get_prompt_chapters_pages(
+            lang=lang, pages_to_scan=num_pages_to_extract_chapters
+        )
+        prompt_physical_page = PromptsForGemini.get_prompt_first_chapter_physical_page(
+            lang=lang, pages_to_scan=num_pages_to_extract_physical_page
+        )
+    if not document_contents_chapters or not document_contents_physical_page:
         return None
 
+    if single_call:
+        return _get_book_structure_in_one_call(
+            client,
+            model_name_physical_page,
+            document_contents_physical_page,
+            PromptsForGemini.get_prompt_book_structure(
+                lang=lang,
+                pages_to_scan=None if sent_pages is not None else num_pages_to_extract_physical_page,
+            ),
+            num_pages_to_extract_physical_page,
+            sent_pages,
+        )
+
     # --- PHASE 1: Extract chapters with Gemini 1.5 (using pages_to_process_chapters) ---
-    prompt_chapters: str = PromptsForGemini.get_prompt_chapters_pages(
-        lang=lang, pages_to_scan=num_pages_to_extract_chapters
-    )
     print(
-        f"{Colors.OKCYAN}Sending first {num_pages_to_extract_chapters} pages to '{model_name_chapters}' for chapter extraction...{Colors.ENDC}"
+        f"{Colors.OKCYAN}Sending {num_pages_to_extract_chapters} pages to '{model_name_chapters}' for chapter extraction...{Colors.ENDC}"
     )
     try:
         gemini_response_chapters: GenerateContentResponse = (
             client.generate_content_with_rate_limit(
+                stage=Stage.CHAPTER_DETECTION,
                 model=model_name_chapters,
-                contents=[
-                    Part.from_bytes(
-                        data=sub_pdf_bytes_chapters.getvalue(),
-                        mime_type="application/pdf",
-                    ),
-                    prompt_chapters,
-                ],
+                contents=[*document_contents_chapters, prompt_chapters],
                 config={
                     "response_mime_type": "application/json",
                     "response_schema": ChaptersOnly,
@@ -221,23 +496,15 @@ def get_chapters_from_gemini(
         return None
 
     # --- PHASE 2: Extract physical page of the first chapter with Gemini 2.5 (using pages_to_process_physical_page) ---
-    prompt_physical_page: str = PromptsForGemini.get_prompt_first_chapter_physical_page(
-        lang=lang, pages_to_scan=num_pages_to_extract_physical_page
-    )
     print(
-        f"{Colors.OKCYAN}Sending first {num_pages_to_extract_physical_page} pages to '{model_name_physical_page}' for first chapter physical page extraction...{Colors.ENDC}"
+        f"{Colors.OKCYAN}Sending {num_pages_to_extract_physical_page} pages to '{model_name_physical_page}' for first chapter physical page extraction...{Colors.ENDC}"
     )
     try:
         gemini_response_physical_page: GenerateContentResponse = (
             client.generate_content_with_rate_limit(
+                stage=Stage.FIRST_CHAPTER_PAGE,
                 model=model_name_physical_page,
-                contents=[
-                    Part.from_bytes(
-                        data=sub_pdf_bytes_physical_page.getvalue(),
-                        mime_type="application/pdf",
-                    ),
-                    prompt_physical_page,
-                ],
+                contents=[*document_contents_physical_page, prompt_physical_page],
                 config={
                     "response_mime_type": "text/plain",  # We expect only an integer as text
                 },
@@ -260,6 +527,15 @@ def get_chapters_from_gemini(
             )
             return None
 
+        if sent_pages is not None:
+            answered_position: int = first_chapter_physical_page
+            first_chapter_physical_page = map_sent_page_to_physical(answered_position, sent_pages)
+            if first_chapter_physical_page is None:
+                print(
+                    f"{Colors.FAIL}Error: Gemini answered page {answered_position}, but only {len(sent_pages)} pages were sent.{Colors.ENDC}"
+                )
+                return None
+
         print(
             f"{Colors.OKGREEN}First chapter physical page successfully extracted from '{model_name_physical_page}'.{Colors.ENDC}"
         )
@@ -279,60 +555,235 @@ def get_chapters_from_gemini(
     return None
 
 
+def _get_book_structure_in_one_call(
+    client: GeminiClientManager,
+    model_name: str,
+    document_contents: List[Part | str],
+    prompt: str,
+    num_pages: int,
+    sent_pages: Optional[List[int]] = None,
+) -> Optional[BookStructure]:
+    """
+    Asks a single model for the chapters and the first chapter page, parsed
+    through the BookStructure schema. If sent_pages is set the page is a
+    position in them and is mapped back to the physical page of the book.
+    """
+    print(
+        f"{Colors.OKCYAN}Sending {num_pages} pages to '{model_name}' for chapter and first chapter page extraction...{Colors.ENDC}"
+    )
+    try:
+        response: GenerateContentResponse = client.generate_content_with_rate_limit(
+            stage=Stage.CHAPTER_DETECTION,
+            model=model_name,
+            contents=[*document_contents, prompt],
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": BookStructure,
+            },
+        )
+    except Exception as e:
+        logger.error(f"Error getting the book structure from '{model_name}': {e}")
+        return None
+
+    book_structure: Optional[BookStructure] = response.parsed  # type: ignore
+    if book_structure is None:
+        print(f"{Colors.FAIL}Raw response from Gemini (on error): {response.text}{Colors.ENDC}")
+        return None
+
+    if sent_pages is not None:
+        physical_page: Optional[int] = map_sent_page_to_physical(
+            book_structure.first_chapter_physical_page, sent_pages
+        )
+        if physical_page is None:
+            print(
+                f"{Colors.FAIL}Error: Gemini answered page {book_structure.first_chapter_physical_page}, but only {len(sent_pages)} pages were sent.{Colors.ENDC}"
+            )
+            return None
+        book_structure.first_chapter_physical_page = physical_page
+
+    print(
+        f"{Colors.OKGREEN}Book structure successfully extracted from '{model_name}'.{Colors.ENDC}"
+    )
+    return book_structure
+
+
+def _compile_with_local_patches(
+    document: str,
+    error_message: str,
+    output_directory: str,
+    output_file_name_base: str,
+    precompiled_preamble: bool,
+) -> Tuple[Optional[str], int]:
+    """
+    Tries the deterministic patches of the rule engine for the errors of a failed
+    compile, validating again after each round. Returns the patched document if
+    it compiles, and the number of validation compiles run.
+    """
+    compiles: int = 0
+    for _round in range(MAX_LOCAL_PATCH_ROUNDS):
+        patched_document, applied_patches = default_rule_engine.patch_errors(document, error_message)
+        if patched_document is None:
+            break
+        logger.info(
+            _.get_string(
+                "latex_local_patch", patches=", ".join(applied_patches), filename=output_file_name_base
+            )
+        )
+        is_valid, error_message = PDFProcessor.validate_and_compile_latex_to_pdf(
+            patched_document,
+            output_directory,
+            output_file_name_base,
+            use_precompiled_preamble=precompiled_preamble,
+            produce_pdf=False,
+        )
+        compiles += 1
+        if is_valid:
+            return patched_document, compiles
+        document = patched_document
+    return None, compiles
+
+
+def _write_final_pdf(
+    document: str,
+    output_directory: str,
+    output_file_name_base: str,
+    precompiled_preamble: bool,
+) -> float:
+    """
+    Writes the PDF of the accepted version of a document from the output of its
+    validation compile, compiling it again only if that isn't possible.
+    Returns the seconds it took.
+    """
+    started: float = time.perf_counter()
+    if not PDFProcessor.convert_xdv_to_pdf(output_directory, output_file_name_base):
+        PDFProcessor.validate_and_compile_latex_to_pdf(
+            document,
+            output_directory,
+            output_file_name_base,
+            use_precompiled_preamble=precompiled_preamble,
+        )
+    return time.perf_counter() - started
+
+
 def process_pdfs_with_gemini_sdk(
     folder_path: str,
     model_name: str,
     client: GeminiClientManager,
     lang: str,
     subject_matter: str,  # Added subject_matter
-) -> None:
+    input_mode: InputMode = InputMode.PDF,
+    page_filter_policy: Optional[PageFilterPolicy] = None,
+    compaction_options: Optional[CompactionOptions] = None,
+    precompiled_preamble: bool = False,
+    generation_mode: GenerationMode = GenerationMode.FULL_DOCUMENT,
+    card_store: Optional[CardStore] = None,
+    book_name: Optional[str] = None,
+    deduplicate: bool = False,
+    routing_policy: Optional[RoutingPolicy] = None,
+    schedule_policy: SchedulePolicy = SchedulePolicy.FILE_ORDER,
+    chapter_priorities: Optional[List[str]] = None,
+    chapter_files: Optional[List[str]] = None,
+) -> List[str]:
     """
     Processes PDF files with the Gemini SDK, including LaTeX validation and auto-correction,
     and then converts the validated LaTeX to PDF.
+    With InputMode.TEXT_LAYER each chapter is sent as extracted text where possible.
+    With a page filter policy, blank pages, figures, bibliographies and indexes are not sent.
+    With compaction options, the PDF parts are compacted before the upload.
+    With precompiled_preamble, validation compiles reuse a cached xelatex format of the preamble.
+    With GenerationMode.BODY_ONLY the model writes only the body and the preamble is attached locally.
+    With GenerationMode.STRUCTURED the model fills the ChapterFlashcards schema and the document is
+    rendered locally; only if the rendered document doesn't compile, its body is sent back for correction.
+    With a card store, the cards of every valid chapter are stored under book_name as soon as it's done.
+    With deduplicate, the prompts list the theorems and definitions already extracted from the other
+    chapters of the book, and the ones restated anyway are dropped from the output.
+    With a routing policy, the model of every request is chosen from the size of the
+    chapter and the retry number, model_name is used otherwise.
+    Chapters are processed in the order of the schedule policy (chapter_priorities are the
+    names of the chapters to process first with SchedulePolicy.PRIORITY), logging the
+    progress and the ETA after each one. With deduplicate, a statement is kept in the first
+    chapter processed, so the file order is the one that matches the book.
+    With chapter_files, only these files of the folder are processed.
+    Returns the files of the chapters whose LaTeX is valid.
     """
 
     if not os.path.isdir(folder_path):
         logger.error(_.get_string("folder_not_exist", folder=folder_path))
-        return
+        return []
 
     result_folder_path: str = os.path.join(folder_path, "results/")
     if not os.path.exists(result_folder_path):
         os.mkdir(result_folder_path)
 
     pdf_files: List[str] = [
-        f for f in os.listdir(folder_path) if f.lower().endswith(".pdf")
+        f
+        for f in os.listdir(folder_path)
+        if f.lower().endswith(".pdf") and (chapter_files is None or f in chapter_files)
     ]
 
     if not pdf_files:
         logger.warning(_.get_string("no_pdf_files", folder=folder_path))
-        return
+        return []
 
     logger.info(_.get_string("pdf_processing_start", folder=folder_path))
     logger.info(
         _.get_string("pdf_files_found", count=len(pdf_files), folder=folder_path)
     )
+    chapter_jobs: List[ChapterJob] = schedule_chapters(
+        folder_path, pdf_files, schedule_policy, chapter_priorities
+    )
+    logger.info(_.get_string("chapters_scheduled", count=len(chapter_jobs), policy=schedule_policy.value))
+    progress: ProgressTracker = ProgressTracker(chapter_jobs)
 
     MAX_RETRIES: int = 3
+    structured: bool = generation_mode == GenerationMode.STRUCTURED
+    body_only: bool = generation_mode in (GenerationMode.BODY_ONLY, GenerationMode.STRUCTURED)
+    preamble_line_count: int = LATEX_PREAMBLE.count("\n")
+
+    processed_chapters: int = 0
+    valid_chapters: List[str] = []
+    total_retries: int = 0
+    total_output_tokens: int = 0
 
-    for pdf_file in pdf_files:
+    book: str = book_name or os.path.basename(os.path.normpath(folder_path))
+    duplicate_index: Optional[DuplicateIndex] = None
+    if deduplicate:
+        duplicate_index = DuplicateIndex()
+        # Chapters processed in previous runs count as well
+        if card_store is not None:
+            for stored_card in card_store.iter_cards(book=book):
+                duplicate_index.add(stored_card.chapter, ExtractedCard(stored_card.kind, stored_card.front))
+
+    for chapter_job in chapter_jobs:
+        pdf_file: str = chapter_job.file_name
         pdf_path: pathlib.Path = pathlib.Path(os.path.join(folder_path, pdf_file))
+        chapter_name: str = os.path.splitext(pdf_file)[0]
         output_file_name_base: str = os.path.splitext(pdf_file)[0] + "-domande"
         output_tex_file_path: str = os.path.join(
             result_folder_path, output_file_name_base + ".tex"
         )
 
-        # Make sure to read bytes only once for the original PDF part
+        # Make sure to read the document only once for the original contents
         try:
-            original_pdf_part: Part = Part.from_bytes(
-                data=pdf_path.read_bytes(), mime_type="application/pdf"
+            original_contents: Optional[List[Part | str]] = _build_document_contents(
+                pdf_path,
+                input_mode,
+                page_filter_policy=page_filter_policy,
+                compaction_options=compaction_options,
             )
         except Exception as e:
-            logger.warning(
-                f"Error reading PDF file '{pdf_file}': {e}. Skipping this file."
-            )
+            original_contents = None
+            logger.warning(f"Error reading PDF file '{pdf_file}': {e}.")
+        if not original_contents:
+            logger.warning(f"Couldn't read '{pdf_file}'. Skipping this file.")
+            progress.finish_chapter(chapter_job)
             continue
+        chapter_tokens: Optional[int] = (
+            estimate_contents_tokens(original_contents) if routing_policy is not None else None
+        )
 
         num_retries: int = 0
+        validation_compiles: int = 0
         latex_is_valid: bool = False
         generated_text: str = ""
         last_error_message: str = ""
@@ -341,47 +792,113 @@ def process_pdfs_with_gemini_sdk(
             try:
                 prompt_to_send: str
                 contents_to_send: List[Part | str]
+                # Until there is something to correct, the chapter is asked again from scratch
+                ask_from_scratch: bool = num_retries == 0 or not generated_text
+                use_schema: bool = structured and ask_from_scratch
+                request_stage: Stage = Stage.GENERATION if ask_from_scratch else Stage.CORRECTION
+                request_model: str = (
+                    routing_policy.choose_model(
+                        request_stage,
+                        pages=chapter_job.pages,
+                        tokens=chapter_tokens,
+                        retry=num_retries,
+                    )
+                    if routing_policy is not None
+                    else model_name
+                )
 
-                if num_retries == 0:
+                if ask_from_scratch:
                     logger.info(
-                        f"Initial invocation of Gemini model '{model_name}' for '{pdf_file}'..."
+                        f"Initial invocation of Gemini model '{request_model}' for '{pdf_file}'..."
                     )
                     prompt_to_send = (
                         PromptsForGemini.get_prompt_to_elaborate_single_pdf(
                             lang=lang,
                             subject_matter=subject_matter,  # Add this parameter
+                            generation_mode=generation_mode,
                         )
                     )
-                    contents_to_send = [original_pdf_part, prompt_to_send]
+                    if duplicate_index is not None:
+                        prompt_to_send += PromptsForGemini.get_prompt_skip_list(
+                            lang,
+                            [
+                                item.card.front[:MAX_SKIP_LIST_ITEM_CHARS]
+                                for item in duplicate_index.items
+                                if item.chapter != chapter_name
+                            ][:MAX_SKIP_LIST_ITEMS],
+                        )
+                    contents_to_send = [*original_contents, prompt_to_send]
                 else:
                     logger.info(
                         f"Attempt {num_retries}/{MAX_RETRIES}: Requesting LaTeX correction for '{pdf_file}'..."
                     )
                     correction_prompt: str = (
                         PromptsForGemini.get_prompt_for_error_correction(
-                            lang=lang, error_message=last_error_message
+                            lang=lang,
+                            error_message=last_error_message,
+                            generation_mode=generation_mode,
                         )
                     )
 
                     contents_to_send = [
-                        original_pdf_part,
+                        *original_contents,
                         generated_text,  # Send previous generated text for context
                         correction_prompt,
                     ]
 
                 gemini_response = client.generate_content_with_rate_limit(
-                    model=model_name,
+                    stage=request_stage,
+                    model=request_model,
                     contents=contents_to_send,
+                    config=(
+                        {
+                            "response_mime_type": "application/json",
+                            "response_schema": ChapterFlashcards,
+                        }
+                        if use_schema
+                        else None
+                    ),
+                )
+
+                progress.record_request(
+                    (gemini_response.usage_metadata.total_token_count or 0)
+                    if gemini_response.usage_metadata is not None
+                    else 0
                 )
 
                 if gemini_response.text is None:
                     logger.error("Gemini didn't respond with any text")
                     continue
 
-                generated_text = gemini_response.text
-                generated_text = fix_common_generated_latex_erros(generated_text)
+                if gemini_response.usage_metadata is not None:
+                    total_output_tokens += gemini_response.usage_metadata.candidates_token_count or 0
 
-                if not generated_text.strip().startswith("\\documentclass"):
+                if use_schema:
+                    flashcards = gemini_response.parsed
+                    if not isinstance(flashcards, ChapterFlashcards):
+                        print(
+                            f"{Colors.WARNING}Warning: AI output doesn't match the flashcards schema.{Colors.ENDC}"
+                        )
+                        last_error_message = "Output doesn't match the flashcards schema."
+                        num_retries += 1
+                        time.sleep(1)
+                        continue
+                    generated_text = render_flashcards_body(flashcards, lang)
+                else:
+                    generated_text = fix_common_generated_latex_erros(gemini_response.text)
+
+                if body_only and not use_schema:
+                    # In body mode generated_text is the body, which is what goes back to the model
+                    generated_text = extract_latex_body(generated_text)
+                    if not is_latex_body(generated_text):
+                        print(
+                            f"{Colors.WARNING}Warning: AI output is not a LaTeX document body.{Colors.ENDC}"
+                        )
+                        last_error_message = "Output is empty or contains preamble commands (\\documentclass, \\usepackage). Only the body of the document must be written."
+                        num_retries += 1
+                        time.sleep(1)
+                        continue
+                elif not body_only and not generated_text.strip().startswith("\\documentclass"):
                     print(
                         f"{Colors.WARNING}Warning: AI output did not start with \\documentclass. This will likely cause an error.{Colors.ENDC}"
                     )
@@ -390,42 +907,141 @@ def process_pdfs_with_gemini_sdk(
                     time.sleep(1)
                     continue
 
+                if duplicate_index is not None:
+                    generated_text, dropped_cards = drop_cards(
+                        generated_text,
+                        lambda card: duplicate_index.find_duplicate(chapter_name, card) is not None,
+                    )
+                    if dropped_cards:
+                        logger.info(
+                            _.get_string("duplicates_dropped", count=len(dropped_cards), filename=pdf_file)
+                        )
+
                 is_valid: bool
                 error_msg: str
+                # Attempts are only typeset, the PDF is written for the accepted one
                 is_valid, error_msg = PDFProcessor.validate_and_compile_latex_to_pdf(
-                    generated_text, result_folder_path, output_file_name_base
+                    wrap_latex_body(generated_text) if body_only else generated_text,
+                    result_folder_path,
+                    output_file_name_base,
+                    use_precompiled_preamble=precompiled_preamble,
+                    produce_pdf=False,
                 )
+                validation_compiles += 1
 
                 if is_valid:
                     latex_is_valid = True
                     print(
-                        f"{Colors.OKGREEN}Generated LaTeX code for '{pdf_file}' is valid and PDF was created.{Colors.ENDC}"
+                        f"{Colors.OKGREEN}Generated LaTeX code for '{pdf_file}' is valid.{Colors.ENDC}"
                     )
                 else:
                     if error_msg == "xelatex_not_found":
                         logger.warning(
                             "Cannot validate LaTeX: xelatex not found. Saving generated file but no PDF conversion."
                         )
-                        exit()
+                        with open(output_tex_file_path, "w", encoding="utf-8") as output_file:
+                            output_file.write(wrap_latex_body(generated_text) if body_only else generated_text)
+                        raise XelatexNotFoundError(f"xelatex not found, '{pdf_file}' can't be validated")
                     else:
-                        last_error_message = error_msg
+                        patched_document: Optional[str]
+                        patch_compiles: int
+                        patched_document, patch_compiles = _compile_with_local_patches(
+                            wrap_latex_body(generated_text) if body_only else generated_text,
+                            error_msg,
+                            result_folder_path,
+                            output_file_name_base,
+                            precompiled_preamble,
+                        )
+                        validation_compiles += patch_compiles
+                        if patched_document is not None:
+                            generated_text = (
+                                extract_latex_body(patched_document) if body_only else patched_document
+                            )
+                            latex_is_valid = True
+                            print(
+                                f"{Colors.OKGREEN}Generated LaTeX code for '{pdf_file}' was fixed locally.{Colors.ENDC}"
+                            )
+                            continue
+
+                        last_error_message = (
+                            shift_error_line_numbers(error_msg, preamble_line_count)
+                            if body_only
+                            else error_msg
+                        )
                         num_retries += 1
                         print(
                             f"{Colors.FAIL}Generated LaTeX code for '{pdf_file}' is NOT valid. Attempting correction ({num_retries}/{MAX_RETRIES})...{Colors.ENDC}"
                         )
                         time.sleep(2)
+            except XelatexNotFoundError:
+                raise
             except Exception as e:
                 logger.error(f"Error processing '{pdf_file}' with Gemini: {e}")
                 last_error_message = f"Generic error during generation/compilation: {e}"
                 num_retries += 1
                 time.sleep(2)
 
+        if latex_is_valid:
+            pdf_seconds: float = _write_final_pdf(
+                wrap_latex_body(generated_text) if body_only else generated_text,
+                result_folder_path,
+                output_file_name_base,
+                precompiled_preamble,
+            )
+            logger.info(
+                _.get_string(
+                    "validation_saving",
+                    filename=pdf_file,
+                    attempts=validation_compiles,
+                    seconds=pdf_seconds,
+                )
+            )
+
         with open(output_tex_file_path, "w", encoding="utf-8") as output_file:
-            output_file.write(generated_text)
+            output_file.write(wrap_latex_body(generated_text) if body_only else generated_text)
         print(
             f"{Colors.HEADER}Final output (after {num_retries} attempts) saved to: {output_tex_file_path}{Colors.ENDC}"
         )
+        processed_chapters += 1
+        total_retries += num_retries
+        progress.finish_chapter(chapter_job)
+        progress.log_progress()
+
+        if not latex_is_valid:
+            continue
+        valid_chapters.append(pdf_file)
+        cards: List[ExtractedCard] = extract_cards(
+            generated_text if body_only else extract_latex_body(generated_text)
+        )
+        if duplicate_index is not None:
+            for card in cards:
+                duplicate_index.add(chapter_name, card)
+        if card_store is not None:
+            new_cards: int = card_store.add_chapter_cards(book, chapter_name, cards)
+            logger.info(
+                _.get_string("cards_stored", new=new_cards, total=len(cards), chapter=chapter_name)
+            )
+
+    if default_rule_engine.hits:
+        logger.info(
+            _.get_string(
+                "latex_rule_hits",
+                hits=", ".join(f"{name}={count}" for name, count in default_rule_engine.hits.most_common()),
+            )
+        )
+
+    if processed_chapters > 0:
+        logger.info(
+            _.get_string(
+                "generation_summary",
+                mode=generation_mode.value,
+                chapters=processed_chapters,
+                retries_per_chapter=f"{total_retries / processed_chapters:.2f}",
+                tokens_per_chapter=total_output_tokens // processed_chapters,
+            )
+        )
 
     print(
         f"\n--- {Colors.OKBLUE}PDF processing with Gemini SDK completed.{Colors.ENDC} ---"
     )
+    return valid_chapters
@@ -0,0 +1,193 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Set
+
+import httpx
+from google.genai.errors import ClientError, ServerError
+from google.genai.types import GenerateContentResponse
+from loguru import logger
+from stockholm import Money
+
+from easy_study_flashcards.gemini.client import (
+    DEFAULT_MAX_REQUESTS_PER_MINUTE,
+    RATE_LIMIT_WINDOW_SECONDS,
+    GeminiClientManager,
+)
+from easy_study_flashcards.gemini.routing import Stage, UsageReport
+from easy_study_flashcards.utils.localization import localizer as _
+
+# Errors caused by the key (invalid, forbidden, out of quota) rather than by the request
+KEY_FAILURE_CODES: Set[int] = {401, 403, 429}
+# A failing key leaves the rotation for this long, doubled at every consecutive failure
+BASE_COOLDOWN_SECONDS: float = 30.0
+MAX_COOLDOWN_SECONDS: float = 600.0
+
+
+def is_key_failure(error: Exception) -> bool:
+    """
+    Whether an error should take the key out of rotation: quota and
+    authorization errors, server errors, timeouts and connection errors.
+    Other client errors such as an invalid request, and local errors,
+    would fail the same way on every key.
+    """
+    if isinstance(error, ClientError):
+        return error.code in KEY_FAILURE_CODES
+    return isinstance(error, (ServerError, httpx.TransportError, TimeoutError, ConnectionError))
+
+
+@dataclass
+class PooledKey:
+    """A client of the pool with its rate limit and error state."""
+
+    name: str
+    client: Any  # GeminiClientManager, or anything with generate_content_with_rate_limit
+    max_requests_per_minute: int
+    request_timestamps: List[float] = field(default_factory=list)
+    in_flight: int = 0
+    consecutive_failures: int = 0
+    unavailable_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+
+    def recent_requests(self, now: float) -> int:
+        self.request_timestamps = [
+            ts for ts in self.request_timestamps if now - ts < RATE_LIMIT_WINDOW_SECONDS
+        ]
+        return len(self.request_timestamps)
+
+    def is_healthy(self, now: float) -> bool:
+        return self.unavailable_until <= now
+
+    def has_headroom(self, now: float) -> bool:
+        return self.recent_requests(now) + self.in_flight < self.max_requests_per_minute
+
+    def load(self, now: float) -> float:
+        return (self.recent_requests(now) + self.in_flight) / self.max_requests_per_minute
+
+    def next_free_slot(self, now: float) -> float:
+        if self.has_headroom(now) or not self.request_timestamps:
+            return now
+        return self.request_timestamps[0] + RATE_LIMIT_WINDOW_SECONDS
+
+
+class GeminiClientPool:
+    """
+    Spreads the requests over the clients of several API keys. Every request
+    goes to the least loaded healthy key with rate-limit headroom; keys that
+    fail leave the rotation for a growing cooldown and the request is retried
+    on another one. Same interface as GeminiClientManager for the pipeline.
+    """
+
+    def __init__(
+        self,
+        clients: List[Any],
+        max_requests_per_minute: int = DEFAULT_MAX_REQUESTS_PER_MINUTE,
+        names: Optional[List[str]] = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+        usage: Optional[UsageReport] = None,
+    ):
+        assert clients, "GeminiClientPool needs at least one client"
+        # Shared with the clients, so the report covers every key
+        self.usage: UsageReport = usage if usage is not None else UsageReport()
+        names = names or [f"key {i + 1}" for i in range(len(clients))]
+        self.keys: List[PooledKey] = [
+            PooledKey(name, client, max_requests_per_minute) for name, client in zip(names, clients)
+        ]
+        self._clock: Callable[[], float] = clock
+        self._sleep: Callable[[float], None] = sleep
+        self._lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def from_api_keys(
+        cls,
+        api_keys: List[str],
+        max_requests_per_minute: int = DEFAULT_MAX_REQUESTS_PER_MINUTE,
+        usage: Optional[UsageReport] = None,
+    ) -> "GeminiClientPool":
+        usage = usage if usage is not None else UsageReport()
+        return cls(
+            [
+                GeminiClientManager(
+                    api_key=api_key, max_requests_per_minute=max_requests_per_minute, usage=usage
+                )
+                for api_key in api_keys
+            ],
+            max_requests_per_minute,
+            # Never log the keys, only their end
+            names=[f"key ...{api_key[-4:]}" for api_key in api_keys],
+            usage=usage,
+        )
+
+    @property
+    def total_cost(self) -> Money:
+        return sum((getattr(key.client, "total_cost", Money(0)) for key in self.keys), Money(0))
+
+    def _acquire(self) -> PooledKey:
+        """Waits for a healthy key with headroom and reserves a request on it."""
+        while True:
+            with self._lock:
+                now: float = self._clock()
+                healthy: List[PooledKey] = [key for key in self.keys if key.is_healthy(now)]
+                ready: List[PooledKey] = [key for key in healthy if key.has_headroom(now)]
+                if ready:
+                    key: PooledKey = min(ready, key=lambda pooled: pooled.load(now))
+                    key.in_flight += 1
+                    key.request_timestamps.append(now)
+                    return key
+                wake_at: float = (
+                    min(key.next_free_slot(now) for key in healthy)
+                    if healthy
+                    else min(key.unavailable_until for key in self.keys)
+                )
+            logger.warning(_.get_string("rate_limit", seconds=max(wake_at - now, 0.0)))
+            self._sleep(max(wake_at - now, 0.01))
+
+    def _release(self, key: PooledKey, error: Optional[Exception] = None) -> None:
+        """
+        Ends a request on the key. A success resets its failure streak, a key
+        failure grows the cooldown; other errors leave the counters as they are.
+        """
+        with self._lock:
+            key.in_flight -= 1
+            if error is None:
+                key.requests += 1
+                key.consecutive_failures = 0
+                return
+            if not is_key_failure(error):
+                return
+            key.failures += 1
+            key.consecutive_failures += 1
+            cooldown: float = min(
+                BASE_COOLDOWN_SECONDS * 2 ** (key.consecutive_failures - 1), MAX_COOLDOWN_SECONDS
+            )
+            key.unavailable_until = self._clock() + cooldown
+        logger.warning(_.get_string("api_key_unavailable", key_name=key.name, error=error, seconds=cooldown))
+
+    def has_headroom(self) -> bool:
+        """Whether some key can take a request now."""
+        with self._lock:
+            now: float = self._clock()
+            return any(key.is_healthy(now) and key.has_headroom(now) for key in self.keys)
+
+    def generate_content_with_rate_limit(
+        self, stage: Optional[Stage] = None, **kwargs
+    ) -> GenerateContentResponse:
+        """Sends the request to the best key, moving to another one if the key fails."""
+        last_error: Optional[Exception] = None
+        for _attempt in range(len(self.keys)):
+            key: PooledKey = self._acquire()
+            try:
+                response: GenerateContentResponse = key.client.generate_content_with_rate_limit(**kwargs)
+            except Exception as error:
+                self._release(key, error)
+                if not is_key_failure(error):
+                    raise
+                last_error = error
+                continue
+            self._release(key)
+            return response
+
+        assert last_error is not None
+        raise last_error
@@ -0,0 +1,259 @@
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional
+
+from google.genai.types import GenerateContentResponse, HttpOptions
+from loguru import logger
+
+from easy_study_flashcards.gemini.routing import Stage
+from easy_study_flashcards.utils.localization import localizer as _
+
+# Seconds a request of each stage may take before it is abandoned
+DEFAULT_STAGE_DEADLINES: Dict[Stage, float] = {
+    Stage.CHAPTER_DETECTION: 180.0,
+    Stage.FIRST_CHAPTER_PAGE: 60.0,
+    Stage.GENERATION: 600.0,
+    Stage.CORRECTION: 600.0,
+}
+# Latencies kept per stage, and how many are needed before the percentile is trusted
+LATENCY_SAMPLES: int = 100
+MIN_LATENCY_SAMPLES: int = 20
+HEDGE_PERCENTILE: float = 0.95
+REQUEST_THREADS: int = 8
+# Abandoned requests keep their thread until they end: no hedges while this many still run
+MAX_ABANDONED_RUNNING: int = REQUEST_THREADS // 2
+# While a request waits for its rate-limit slot, how often the deadline checks whether it was sent
+SEND_POLL_SECONDS: float = 0.05
+
+
+class RequestDeadlineExceeded(TimeoutError):
+    pass
+
+
+class SentRequest:
+    """
+    When a request was last sent to the model, reported by the wrapped client
+    after its rate-limit wait, and the flag that stops its retries.
+    """
+
+    def __init__(self):
+        self.sent_at: Optional[float] = None
+        self.cancelled: threading.Event = threading.Event()
+
+    def mark_sent(self) -> None:
+        self.sent_at = time.monotonic()
+
+    def elapsed(self) -> float:
+        return 0.0 if self.sent_at is None else time.monotonic() - self.sent_at
+
+
+class LatencyTracker:
+    """The latencies of the last requests of a stage."""
+
+    def __init__(self, samples: int = LATENCY_SAMPLES):
+        self._latencies: Deque[float] = deque(maxlen=samples)
+
+    def __len__(self) -> int:
+        return len(self._latencies)
+
+    def record(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+
+    def percentile(self, fraction: float, min_samples: int = MIN_LATENCY_SAMPLES) -> Optional[float]:
+        """Nearest-rank percentile, None until there are min_samples latencies."""
+        if len(self._latencies) < max(min_samples, 1):
+            return None
+        ordered: List[float] = sorted(self._latencies)
+        return ordered[min(math.ceil(fraction * len(ordered)) - 1, len(ordered) - 1)]
+
+
+@dataclass
+class HedgeMetrics:
+    hedges_issued: int = 0
+    hedges_won: int = 0
+    deadlines_exceeded: int = 0
+    # Requests no longer waited for that were already sent: they run (and are billed) until they end
+    requests_abandoned: int = 0
+
+    def log_summary(self) -> None:
+        logger.info(
+            _.get_string(
+                "hedge_summary",
+                issued=self.hedges_issued,
+                won=self.hedges_won,
+                deadlines=self.deadlines_exceeded,
+                abandoned=self.requests_abandoned,
+            )
+        )
+
+
+def with_http_timeout(config: Any, seconds: float) -> Any:
+    """
+    Adds the deadline to the HTTP options of a request config, so that the
+    SDK drops a request that is abandoned instead of leaving it running.
+    """
+    http_options: Dict[str, int] = {"timeout": int(seconds * 1000)}
+    if config is None:
+        return {"http_options": http_options}
+    if isinstance(config, dict):
+        return {**config, "http_options": {**(config.get("http_options") or {}), **http_options}}
+    # Only the timeout changes: base_url, headers and api_version are kept
+    existing: Optional[HttpOptions] = config.http_options
+    merged: HttpOptions = (
+        existing.model_copy(update=http_options) if existing is not None else HttpOptions(**http_options)
+    )
+    return config.model_copy(update={"http_options": merged})
+
+
+class HedgedClient:
+    """
+    Wraps a GeminiClientManager or a GeminiClientPool, giving every request
+    the deadline of its stage. With hedging, a request still running after
+    the p95 latency of its stage is sent a second time, if the client has
+    rate-limit headroom: the first response wins. Deadlines and latencies
+    count from when the wrapped client sends the request to the model, not
+    from the wait for its rate-limit slot. The SDK can't abort a request
+    from another thread, so the other one is abandoned: it isn't retried,
+    but it keeps its thread and its rate-limit slot and is billed until it
+    ends (requests past their deadline are dropped by the SDK timeout). No
+    hedge is sent while MAX_ABANDONED_RUNNING abandoned requests still run.
+    Same interface as the wrapped client for the pipeline.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        deadlines: Optional[Dict[Stage, float]] = None,
+        hedging: bool = False,
+        min_samples: int = MIN_LATENCY_SAMPLES,
+    ):
+        self.client: Any = client
+        self.deadlines: Dict[Stage, float] = dict(DEFAULT_STAGE_DEADLINES if deadlines is None else deadlines)
+        self.hedging: bool = hedging
+        self.min_samples: int = min_samples
+        self.metrics: HedgeMetrics = HedgeMetrics()
+        self.latencies: Dict[Stage, LatencyTracker] = {stage: LatencyTracker() for stage in Stage}
+        self._lock: threading.Lock = threading.Lock()
+        # Requests run on these threads so that the caller can stop waiting for them
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=REQUEST_THREADS, thread_name_prefix="gemini-request"
+        )
+        self._abandoned_running: int = 0
+
+    @property
+    def usage(self):
+        return self.client.usage
+
+    def has_headroom(self) -> bool:
+        return self.client.has_headroom()
+
+    def _abandon(self, futures: List[Future], requests: Dict[Future, SentRequest]) -> None:
+        """Stops waiting for the futures: the ones not started yet are cancelled, the others abandoned."""
+        for future in futures:
+            requests[future].cancelled.set()
+            if future.cancel():
+                continue
+            with self._lock:
+                self.metrics.requests_abandoned += 1
+                self._abandoned_running += 1
+            future.add_done_callback(self._abandoned_finished)
+
+    def _abandoned_finished(self, _future: Future) -> None:
+        with self._lock:
+            self._abandoned_running -= 1
+
+    def can_hedge(self) -> bool:
+        with self._lock:
+            if self._abandoned_running >= MAX_ABANDONED_RUNNING:
+                return False
+        return self.client.has_headroom()
+
+    def hedge_delay(self, stage: Stage) -> Optional[float]:
+        """Seconds after which a request of the stage is hedged, None if it isn't."""
+        if not self.hedging:
+            return None
+        return self.latencies[stage].percentile(HEDGE_PERCENTILE, self.min_samples)
+
+    def _send(self, request: SentRequest, stage: Stage, kwargs: Dict[str, Any]) -> GenerateContentResponse:
+        return self.client.generate_content_with_rate_limit(
+            stage=stage, on_sent=request.mark_sent, cancelled=request.cancelled, **kwargs
+        )
+
+    def generate_content_with_rate_limit(
+        self, stage: Stage = Stage.GENERATION, **kwargs
+    ) -> GenerateContentResponse:
+        deadline: Optional[float] = self.deadlines.get(stage)
+        hedge_after: Optional[float] = self.hedge_delay(stage)
+        if deadline is None and hedge_after is None:
+            direct: SentRequest = SentRequest()
+            response: GenerateContentResponse = self._send(direct, stage, kwargs)
+            # Until the stage has enough latencies to hedge
+            with self._lock:
+                self.latencies[stage].record(direct.elapsed())
+            return response
+        if deadline is not None:
+            kwargs["config"] = with_http_timeout(kwargs.get("config"), deadline)
+
+        primary_request: SentRequest = SentRequest()
+        primary: Future = self._executor.submit(self._send, primary_request, stage, kwargs)
+        requests: Dict[Future, SentRequest] = {primary: primary_request}
+        pending: List[Future] = [primary]
+        hedge: Optional[Future] = None
+        last_error: Optional[BaseException] = None
+
+        while pending:
+            # Neither the deadline nor the hedge delay run before the primary is sent
+            waits: List[float] = []
+            if primary_request.sent_at is None:
+                waits.append(SEND_POLL_SECONDS)
+            else:
+                elapsed: float = primary_request.elapsed()
+                if deadline is not None:
+                    waits.append(deadline - elapsed)
+                if hedge is None and hedge_after is not None:
+                    waits.append(hedge_after - elapsed)
+            done, _not_done = wait(
+                pending, timeout=max(min(waits), 0.0) if waits else None, return_when=FIRST_COMPLETED
+            )
+
+            for future in done:
+                pending.remove(future)
+                if future.exception() is not None:
+                    last_error = future.exception()
+                    continue
+                self._abandon(pending, requests)
+                with self._lock:
+                    self.latencies[stage].record(requests[future].elapsed())
+                    if future is hedge:
+                        self.metrics.hedges_won += 1
+                return future.result()
+
+            if primary_request.sent_at is None or not pending:
+                continue
+            elapsed = primary_request.elapsed()
+            if deadline is not None and elapsed >= deadline:
+                self._abandon(pending, requests)
+                with self._lock:
+                    self.metrics.deadlines_exceeded += 1
+                logger.warning(_.get_string("request_deadline", stage=stage.value, seconds=deadline))
+                raise RequestDeadlineExceeded(f"{stage.value} request exceeded its {deadline:.0f}s deadline")
+
+            if hedge is None and hedge_after is not None and elapsed >= hedge_after:
+                if self.can_hedge():
+                    logger.info(_.get_string("request_hedged", stage=stage.value, seconds=elapsed))
+                    hedge_request: SentRequest = SentRequest()
+                    hedge = self._executor.submit(self._send, hedge_request, stage, kwargs)
+                    requests[hedge] = hedge_request
+                    pending.append(hedge)
+                    with self._lock:
+                        self.metrics.hedges_issued += 1
+                else:
+                    # No headroom or too many abandoned requests: this request won't be hedged
+                    hedge_after = None
+
+        assert last_error is not None
+        raise last_error
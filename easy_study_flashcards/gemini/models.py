@@ -1,3 +1,4 @@
+from enum import Enum
 from pydantic import BaseModel, Field
 from typing import List
 
@@ -29,3 +30,43 @@ class BookStructure(BaseModel):
     first_chapter_physical_page: int = Field(
         description="The physical position in the PDF (1-based page) of the book's first numbered chapter."
     )
+
+
+class StatementKind(str, Enum):
+    THEOREM = "theorem"
+    DEFINITION = "definition"
+
+
+class Statement(BaseModel):
+    """A theorem (or principle/law) or a definition extracted from a chapter."""
+
+    kind: StatementKind = Field(
+        description="'theorem' for theorems, principles and laws, 'definition' for definitions."
+    )
+    label: str = Field(
+        description="The name with its number, e.g. 'Theorem 1.1' or 'Definition 2.3'."
+    )
+    text: str = Field(
+        description="LaTeX fragment: the complete statement of a theorem, or the concept to be defined."
+    )
+
+
+class Exercise(BaseModel):
+    """An exercise presented in a chapter."""
+
+    label: str = Field(description="The name with its number, e.g. 'Exercise 1.4'.")
+    text: str = Field(description="LaTeX fragment: the complete text of the exercise.")
+
+
+class ChapterFlashcards(BaseModel):
+    """Schema of the flashcards generated for a chapter, rendered to LaTeX locally."""
+
+    title: str = Field(description="The main title of the document, empty if not present.")
+    author: str = Field(description="The author of the document, empty if not present.")
+    statements: List[Statement] = Field(
+        description="Theorems and definitions, in the order they appear in the document."
+    )
+    exercises: List[Exercise] = Field(description="The exercises presented in the document.")
+    generated_exercises: List[str] = Field(
+        description="LaTeX fragments: the texts of the new exercises, one for each extracted exercise."
+    )
@@ -1,3 +1,18 @@
+from enum import Enum
+from typing import List, Optional
+
+
+class GenerationMode(Enum):
+    """What the model writes for every chapter."""
+
+    # The model writes the whole document, preamble included
+    FULL_DOCUMENT = "full_document"
+    # The model writes only the body, the preamble is attached locally
+    BODY_ONLY = "body_only"
+    # The model fills a JSON schema, the whole document is rendered locally
+    STRUCTURED = "structured"
+
+
 class PromptsForGemini:
 
     @staticmethod
@@ -23,20 +38,78 @@ class PromptsForGemini:
         ].format(pages_to_scan=pages_to_scan)
 
     @staticmethod
-    def get_prompt_to_elaborate_single_pdf(lang: str, subject_matter:str) -> str:
+    def get_prompt_chapters_from_toc(lang: str) -> str:
+        """Chapters prompt for the table of contents located locally (see toc_locator)."""
+        assert lang in PromptsForGemini.prompts, "Invalid language provided"
+        return PromptsForGemini.prompts[lang]["prompt_chapters_toc"]
+
+    @staticmethod
+    def get_prompt_first_chapter_page_in_selection(lang: str) -> str:
+        """First chapter prompt for a selection of pages, answered as a position in it."""
+        assert lang in PromptsForGemini.prompts, "Invalid language provided"
+        return PromptsForGemini.prompts[lang]["prompt_first_chapter_page_in_selection"]
+
+    @staticmethod
+    def get_prompt_book_structure(lang: str, pages_to_scan: Optional[int] = None) -> str:
+        """
+        Prompt asking for the chapters and the first chapter page in one call.
+        Without pages_to_scan, the pages are the selection of the table of contents locator.
+        """
+        assert lang in PromptsForGemini.prompts, "Invalid language provided"
+        if pages_to_scan is None:
+            return PromptsForGemini.prompts[lang]["prompt_book_structure_toc"]
+        assert pages_to_scan > 0, "pages_to_scan should be an integer bigger than 0"
+        return PromptsForGemini.prompts[lang]["prompt_book_structure"].format(
+            pages_to_scan=pages_to_scan
+        )
+
+    @staticmethod
+    def get_prompt_to_elaborate_single_pdf(
+        lang: str,
+        subject_matter: str,
+        generation_mode: GenerationMode = GenerationMode.FULL_DOCUMENT,
+    ) -> str:
         """
         Gets the prompt template for elaborating a single PDF and formats it with the subject matter.
         """
         assert lang in PromptsForGemini.prompts, "Invalid language provided"
-        return PromptsForGemini.prompts[lang]["prompt_elaborate_single_pdf"].replace("**[subject]**", subject_matter)
+        key: str = {
+            GenerationMode.FULL_DOCUMENT: "prompt_elaborate_single_pdf",
+            GenerationMode.BODY_ONLY: "prompt_elaborate_single_pdf_body",
+            GenerationMode.STRUCTURED: "prompt_elaborate_single_pdf_structured",
+        }[generation_mode]
+        return PromptsForGemini.prompts[lang][key].replace("**[subject]**", subject_matter)
 
     @staticmethod
-    def get_prompt_for_error_correction(lang: str, error_message: str) -> str:
+    def get_prompt_for_error_correction(
+        lang: str,
+        error_message: str,
+        generation_mode: GenerationMode = GenerationMode.FULL_DOCUMENT,
+    ) -> str:
         assert (
             lang in PromptsForGemini.prompts
         ), "Invalid language provided to PromptsForGemini.get_prompt_for_error_correction"
 
-        return PromptsForGemini.prompts[lang]["prompt_error_correction"].replace("**[error_message]**", error_message)
+        # Structured outputs are corrected as bodies, the rendered body is what failed
+        key: str = (
+            "prompt_error_correction"
+            if generation_mode == GenerationMode.FULL_DOCUMENT
+            else "prompt_error_correction_body"
+        )
+        return PromptsForGemini.prompts[lang][key].replace("**[error_message]**", error_message)
+
+    @staticmethod
+    def get_prompt_skip_list(lang: str, items: List[str]) -> str:
+        """
+        Gets the addition to the elaboration prompt listing the statements already
+        extracted from the previous chapters of the book.
+        """
+        assert lang in PromptsForGemini.prompts, "Invalid language provided"
+        if not items:
+            return ""
+        return PromptsForGemini.prompts[lang]["prompt_skip_list"].replace(
+            "**[items]**", "\n".join(f"- {item}" for item in items)
+        )
 
     # Translated through AI, I'm way too lazy to do that by myself
     prompts: dict[str, dict[str, str]] = {
@@ -62,6 +135,51 @@ class PromptsForGemini:
                 For example, if the first chapter is found on physical page 8 of the PDF, you should return 8.
                 Your answer must be *exclusively* the integer of the physical page. Do not add any additional text, explanation, or formatting.
             """,
+            "prompt_chapters_toc": """
+                Analyze the attached pages of a textbook. They are not consecutive: they are the table of contents of the book and a few pages around the beginning of its first chapter.
+
+                Your task is to identify and list *exclusively* the main chapters that begin with clear numbering,
+                such as "Chapter 1", "Chapter 2", "Unit 3", "Section 4", or similar numbered formats.
+                Do not include introductions, prefaces, indexes, bibliographies, appendices, solutions, or any other section
+                that is not an explicitly numbered chapter. For each identified chapter, return its exact title as it appears in the table of contents and the page number where it begins,
+                as **numbered within the book** (the number printed in the table of contents, not the position of the page in the attached document).
+                List all the chapters of the table of contents, even the ones whose pages are not attached.
+                Make sure the output strictly adheres to the specified JSON format.
+            """,
+            "prompt_first_chapter_page_in_selection": """
+                Analyze the attached pages of a textbook. They are not consecutive: they are the table of contents of the book and a few pages around the beginning of its first chapter.
+
+                Your task is to identify the attached page (counting the attached pages from 1) that corresponds to the beginning of the *first numbered chapter*.
+                **[CRITICAL RULE]**: Do not consider prefaces, indexes, or other introductory sections as the first chapter, and do not answer with a page number printed in the table of contents.
+                For example, if the first chapter begins on the 4th attached page, you should return 4.
+                Your answer must be *exclusively* the integer of the page. Do not add any additional text, explanation, or formatting.
+            """,
+            "prompt_book_structure": """
+                Analyze the attached PDF, which is a textbook. I have extracted only the first {pages_to_scan} pages of the original document.
+
+                You have two tasks:
+                1. Identify and list *exclusively* the main chapters that begin with clear numbering, such as "Chapter 1", "Chapter 2", "Unit 3", "Section 4", or similar numbered formats.
+                   Do not include introductions, prefaces, indexes, bibliographies, appendices, solutions, or any other section that is not an explicitly numbered chapter.
+                   For each chapter, return its exact title and the page number where it begins, as **numbered within the book** (for example, if the chapter starts on physical page 15 of the PDF but is labeled as page '1' *in the book text*, you return 1 for `start_page`).
+                   If a table of contents is present in the extracted pages, prioritize extracting information from it and list all its chapters.
+                2. Identify the physical page number (1-based) of the PDF where the *first numbered chapter* begins, and return it as `first_chapter_physical_page`.
+                   **[CRITICAL RULE]**: Do not consider prefaces, indexes, or other introductory sections as the first chapter.
+
+                Make sure the output strictly adheres to the specified JSON format.
+            """,
+            "prompt_book_structure_toc": """
+                Analyze the attached pages of a textbook. They are not consecutive: they are the table of contents of the book and a few pages around the beginning of its first chapter.
+
+                You have two tasks:
+                1. Identify and list *exclusively* the main chapters that begin with clear numbering, such as "Chapter 1", "Chapter 2", "Unit 3", "Section 4", or similar numbered formats.
+                   Do not include introductions, prefaces, indexes, bibliographies, appendices, solutions, or any other section that is not an explicitly numbered chapter.
+                   For each chapter, return its exact title as it appears in the table of contents and the page number where it begins, as **numbered within the book** (the number printed in the table of contents).
+                   List all the chapters of the table of contents, even the ones whose pages are not attached.
+                2. Identify the attached page (counting the attached pages from 1) where the *first numbered chapter* begins, and return it as `first_chapter_physical_page`.
+                   **[CRITICAL RULE]**: Do not consider prefaces, indexes, or other introductory sections as the first chapter, and do not answer with a page number printed in the table of contents.
+
+                Make sure the output strictly adheres to the specified JSON format.
+            """,
             "prompt_elaborate_single_pdf": r""" 
                 **Role:** You are an AI assistant specialized in processing academic documents. Your expertise is in analyzing and restructuring technical content for any subject matter.
 
@@ -156,6 +274,112 @@ class PromptsForGemini:
                 Provide me with a valid and compilable version of the LaTeX code.
                 Maintain exactly the LaTeX format required in the original prompt (without introductions, greetings, or explanations, starting directly with `\documentclass{article}`).
             """,
+            "prompt_elaborate_single_pdf_body": r""" 
+                **Role:** You are an AI assistant specialized in processing academic documents. Your expertise is in analyzing and restructuring technical content for any subject matter.
+
+                I am analyzing a PDF document containing educational material (lectures, notes, handouts) related to "**[subject]**". I need to create a structured LaTeX document that summarizes key concepts, extracts presented exercises, and generates new exercises.
+
+                1. Carefully analyze the text of the provided PDF document.
+                2. **Identify and extract the document header, if present, such as the main title, author, and date.**
+                3. **Identify and extract all theorems or principles/laws presented.** For each theorem, you must include its complete statement and, if present, its number (e.g., Theorem 1.1, Ohm's Law). **Do not provide the theorem's proof, but ask the reader to prove it.**
+                4. **Identify and extract definitions of key concepts.** For each concept, you must indicate the term to be defined, then ask the reader to provide the definition and add the definition number. **It is crucial that the order of theorems and definitions in the LaTeX document mirrors their order in the original PDF.**
+                5. **Identify and extract the presented exercises.** For each exercise, you must include the complete exercise text. **If the original exercise text is not explicitly present but is only a reference (e.g., "Exercise 1"), the AI should generate a representative exercise text based on the surrounding context or the typical problem type for that topic.** **Do not provide the exercise solution.**
+                6. **Generate 1 additional exercise for each extracted exercise.** These AI-generated exercises must require the same conceptual tools for solving as the original exercises but must present different data, contexts, or scenarios to be conceptually distinct. Ensure they are consistent with the difficulty level and topics covered in the original document.
+                7. Completely ignore:
+                    * Complete theorem proofs.
+                    * Additional comments or explanations that don't fall into the above categories (theorems, definitions, exercises).
+                    * Grading rubrics or scores.
+                    * **Complete book content or in-depth explanatory sections that are not theorems, definitions, or exercises.**
+                    * **ISBN or any other editorial data.**
+
+                * The output must be in LaTeX format.
+                * **Write only the body of the document.** Do not write `\documentclass`, `\usepackage`, `\begin{document}` or `\end{document}`: the preamble is added automatically and provides the packages `amsmath`, `amsfonts`, `amssymb`, `enumitem`, `fancyhdr`, `hyperref`, `xcolor`, `courier` and `listings`. Don't use commands from other packages.
+                * **At the beginning of the body, insert the extracted header, if present, formatted as follows:**
+                    * The main title using `\title{}` and `\maketitle`.
+                    * The author using `\author{}`.
+                * **Use the following sections to organize the content:**
+                    * **Extracted Content:** Use a section titled `\section*{Extracted Content}`. Within this section, list theorems and definitions in the exact order they were found in the original document.
+                        * Each theorem must be presented as an item in a numbered list (`enumerate`). The statement must follow the format: `\textbf{Theorem/Principle/Law [Number/Name]:} [Complete statement]. \par \textbf{Proof:} [Leave space for reader's proof]`
+                        * Each concept to be defined must be presented as an item in a numbered list (`enumerate`). The definition must follow the format: `\textbf{Definition [Definition Number]:} Define [Concept to be Defined].`
+                    * **Original Exercises:** Use a section titled `\section*{Original Exercises}`. Each exercise must be presented as an item in a numbered list (`enumerate`). The exercise text must follow the format: `\textbf{Exercise [Exercise Number]:} [Complete exercise text generated by AI if missing or extracted].`
+                    * **AI-Generated Exercises:** Use a section titled `\section*{AI-Generated Exercises}`. Each generated exercise must be an item in a numbered list (`enumerate`). The format must be:
+                        ```latex
+                        \begin{enumerate}
+                            \item [Text of first generated exercise.]
+                            \item [Text of second generated exercise.]
+                            \item [Text of third generated exercise.]
+                            ...
+                            \item [Text of nth generated exercise.]
+                        \end{enumerate}
+                        ```
+                * Maintain the original text formatting:
+                    * **Bold** must be `\textbf{text}`.
+                    * `monospace` for inline code must be `\texttt{code}`.
+                * For mathematical and scientific notations, use standard LaTeX formatting:
+                    * Include inline mathematical expressions within `$ $`.
+                    * Include equation blocks within `$$ $$` or environments like `equation*` or `align*`.
+                * **[CRITICAL RULE]** Your response must contain *exclusively* the LaTeX content. Do not include any introductory, greeting, or explanatory phrases (e.g., "Here's the output...", "Sure, here are the questions...", etc.). Your response must start directly with the first command of the body (e.g. `\title{...}` or `\section*{...}`).
+            """,
+            "prompt_error_correction_body": r"""
+                The LaTeX code you previously generated for the document was invalid during compilation.
+                The following errors occurred:
+                ```
+                **[error_message]**
+
+                ```
+                Please analyze these errors carefully. Your task is to **correct the LaTeX code to resolve these compilation issues**, while **faithfully maintaining the original content and structure** that you extracted from the PDF. Do not alter the meaning or formatting of theorems, definitions, and exercises.
+
+                **Critical LaTeX Rules for Correction:**
+                * **Paired Environments:** Every `\begin{environment}` must have a corresponding `\end{environment}` (e.g., `\begin{itemize}` and `\end{itemize}`, `\begin{equation}` and `\end{equation}`).
+                * **Math Delimiters:**
+                    * Inline equations: Always use single dollars `$` to start and end (e.g., `A vector $v$`).
+                    * Equation blocks (display mode): Use double dollars `$$` or specific environments like `\begin{equation}` / `\end{equation}` or `\begin{align*}` / `\end{align*}`.
+                * **Undefined Commands:** Ensure all commands (`\cmd`) and environments are defined by included packages (`amsmath`, `amsfonts`, `amssymb`, `enumitem`, `fancyhdr`, `hyperref`, `xcolor`, `courier`, `listings`). Don't introduce new commands or environments without necessary packages.
+                * **Special Characters:** LaTeX special characters (e.g., `#`, `$`, `%`, `&`, `_`, `{{`, `}}`, `~`, `^`, `\\`, `<`, `>`) must be escaped with a backslash (`\\`) if they should appear as normal text, unless used for their LaTeX purpose.
+                * **Bracket Balance:** All parentheses, square brackets, and curly braces (especially those used in LaTeX commands or environments) must be properly balanced.
+                * **Avoid `[ ]` for Inline Text:** Don't use `[` and `]` to enclose normal text unless it's an optional argument of a LaTeX command.
+                * **Non-Math Text in Math Environments:** Normal text inside math environments (`$` or `$$`) must be enclosed in `\\text{}` or `\\mbox{}` to ensure proper font formatting (e.g., `$ \\text{where} x > 0 $`).
+                * **Common Error: Missing/Wrong Curly Braces:** The most common error, especially in generated exercises, is incorrect use or missing curly braces `}`. Often, a character like `>` is used instead of `}` to close a LaTeX command or environment. Carefully check that all curly braces are present and correctly positioned.
+
+                Provide me with a valid and compilable version of the LaTeX code.
+                Maintain exactly the LaTeX format required in the original prompt: only the body of the document, without `\documentclass`, `\usepackage`, `\begin{document}` and `\end{document}`, and without introductions, greetings, or explanations.
+            """,
+            "prompt_elaborate_single_pdf_structured": r""" 
+                **Role:** You are an AI assistant specialized in processing academic documents. Your expertise is in analyzing and restructuring technical content for any subject matter.
+
+                I am analyzing a PDF document containing educational material (lectures, notes, handouts) related to "**[subject]**". I need to create a structured LaTeX document that summarizes key concepts, extracts presented exercises, and generates new exercises.
+
+                1. Carefully analyze the text of the provided PDF document.
+                2. **Identify and extract the document header, if present, such as the main title, author, and date.**
+                3. **Identify and extract all theorems or principles/laws presented.** For each theorem, you must include its complete statement and, if present, its number (e.g., Theorem 1.1, Ohm's Law). **Do not provide the theorem's proof, but ask the reader to prove it.**
+                4. **Identify and extract definitions of key concepts.** For each concept, you must indicate the term to be defined, then ask the reader to provide the definition and add the definition number. **It is crucial that the order of theorems and definitions in the LaTeX document mirrors their order in the original PDF.**
+                5. **Identify and extract the presented exercises.** For each exercise, you must include the complete exercise text. **If the original exercise text is not explicitly present but is only a reference (e.g., "Exercise 1"), the AI should generate a representative exercise text based on the surrounding context or the typical problem type for that topic.** **Do not provide the exercise solution.**
+                6. **Generate 1 additional exercise for each extracted exercise.** These AI-generated exercises must require the same conceptual tools for solving as the original exercises but must present different data, contexts, or scenarios to be conceptually distinct. Ensure they are consistent with the difficulty level and topics covered in the original document.
+                7. Completely ignore:
+                    * Complete theorem proofs.
+                    * Additional comments or explanations that don't fall into the above categories (theorems, definitions, exercises).
+                    * Grading rubrics or scores.
+                    * **Complete book content or in-depth explanatory sections that are not theorems, definitions, or exercises.**
+                    * **ISBN or any other editorial data.**
+
+                * Fill in the requested JSON fields, don't write a LaTeX document: the document is built automatically from them.
+                * `title` and `author` contain the extracted header, or are empty if it isn't present.
+                * `statements` contains theorems and definitions in the exact order they were found in the original document:
+                    * `kind` is `theorem` for theorems, principles and laws, `definition` for definitions.
+                    * `label` is the name with its number, e.g. `Theorem 1.1`, `Ohm's Law`, `Definition 2.3`.
+                    * `text` is the complete statement for theorems, and only the concept to be defined for definitions.
+                * `exercises` contains the original exercises, with `label` (e.g. `Exercise 1.4`) and the complete `text`.
+                * `generated_exercises` contains the text of the AI-generated exercises.
+                * Every text field is a LaTeX fragment without environments for the document structure:
+                    * **Bold** must be `\textbf{text}`, `monospace` for inline code must be `\texttt{code}`.
+                    * Include inline mathematical expressions within `$ $` and equation blocks within `$$ $$` or environments like `equation*` or `align*`.
+                    * Use only the commands of the packages `amsmath`, `amsfonts`, `amssymb`, `enumitem` and `listings`.
+""",
+            "prompt_skip_list": r"""
+
+                **Already extracted:** the following theorems and definitions were already extracted from the previous chapters of the same book. Don't extract them again, even if they are restated in this document; extract only the new ones.
+**[items]**
+""",
         },
         "it": {
             "prompt_chapters_pages": """
@@ -179,6 +403,51 @@ class PromptsForGemini:
                 Ad esempio, se il primo capitolo si trova nella pagina fisica 8 del PDF, devi restituire 8.
                 La tua risposta deve essere *esclusivamente* il numero intero della pagina fisica. Non aggiungere alcun testo aggiuntivo, spiegazione o formattazione.
             """,
+            "prompt_chapters_toc": """
+                Analizza le pagine allegate di un libro di testo. Non sono consecutive: sono l'indice del libro e alcune pagine intorno all'inizio del suo primo capitolo.
+
+                Il tuo compito è identificare e elencare *esclusivamente* i capitoli principali che iniziano con una numerazione chiara,
+                come "Capitolo 1", "Capitolo 2", "Chapter 3", "Unit 4", o simili formati numerati.
+                Non includere introduzioni, prefazioni, indici, bibliografie, appendici, soluzioni, o qualsiasi altra sezione
+                che non sia un capitolo numerato esplicitamente. Per ogni capitolo identificato, restituisci il suo titolo esatto come appare nell'indice e il numero della pagina su cui inizia,
+                così come **numerato all'interno del libro** (il numero stampato nell'indice, non la posizione della pagina nel documento allegato).
+                Elenca tutti i capitoli dell'indice, anche quelli le cui pagine non sono allegate.
+                Assicurati che l'output aderisca rigorosamente al formato JSON specificato.
+            """,
+            "prompt_first_chapter_page_in_selection": """
+                Analizza le pagine allegate di un libro di testo. Non sono consecutive: sono l'indice del libro e alcune pagine intorno all'inizio del suo primo capitolo.
+
+                Il tuo compito è identificare la pagina allegata (contando le pagine allegate a partire da 1) che corrisponde all'inizio del *primo capitolo numerato*.
+                **[REGOLA CRITICA]**: Non considerare prefazioni, indici o altre sezioni introduttive come il primo capitolo, e non rispondere con un numero di pagina stampato nell'indice.
+                Ad esempio, se il primo capitolo inizia nella quarta pagina allegata, devi restituire 4.
+                La tua risposta deve essere *esclusivamente* il numero intero della pagina. Non aggiungere alcun testo aggiuntivo, spiegazione o formattazione.
+            """,
+            "prompt_book_structure": """
+                Analizza il PDF allegato, che è un libro di testo. Ho estratto solo le prime {pages_to_scan} pagine del documento originale.
+
+                Hai due compiti:
+                1. Identifica e elenca *esclusivamente* i capitoli principali che iniziano con una numerazione chiara, come "Capitolo 1", "Capitolo 2", "Chapter 3", "Unit 4", o simili formati numerati.
+                   Non includere introduzioni, prefazioni, indici, bibliografie, appendici, soluzioni, o qualsiasi altra sezione che non sia un capitolo numerato esplicitamente.
+                   Per ogni capitolo, restituisci il suo titolo esatto e il numero della pagina su cui inizia, così come **numerato all'interno del libro** (ad esempio, se il capitolo inizia sulla pagina fisica 15 del PDF ma è etichettata come pagina '1' *nel testo del libro*, tu restituisci 1 per `start_page`).
+                   Se un indice è presente nelle pagine estratte, prioritizza l'estrazione delle informazioni da esso ed elenca tutti i suoi capitoli.
+                2. Identifica la pagina fisica (basata su 1) del PDF in cui inizia il *primo capitolo numerato*, e restituiscila come `first_chapter_physical_page`.
+                   **[REGOLA CRITICA]**: Non considerare prefazioni, indici o altre sezioni introduttive come il primo capitolo.
+
+                Assicurati che l'output aderisca rigorosamente al formato JSON specificato.
+            """,
+            "prompt_book_structure_toc": """
+                Analizza le pagine allegate di un libro di testo. Non sono consecutive: sono l'indice del libro e alcune pagine intorno all'inizio del suo primo capitolo.
+
+                Hai due compiti:
+                1. Identifica e elenca *esclusivamente* i capitoli principali che iniziano con una numerazione chiara, come "Capitolo 1", "Capitolo 2", "Chapter 3", "Unit 4", o simili formati numerati.
+                   Non includere introduzioni, prefazioni, indici, bibliografie, appendici, soluzioni, o qualsiasi altra sezione che non sia un capitolo numerato esplicitamente.
+                   Per ogni capitolo, restituisci il suo titolo esatto come appare nell'indice e il numero della pagina su cui inizia, così come **numerato all'interno del libro** (il numero stampato nell'indice).
+                   Elenca tutti i capitoli dell'indice, anche quelli le cui pagine non sono allegate.
+                2. Identifica la pagina allegata (contando le pagine allegate a partire da 1) in cui inizia il *primo capitolo numerato*, e restituiscila come `first_chapter_physical_page`.
+                   **[REGOLA CRITICA]**: Non considerare prefazioni, indici o altre sezioni introduttive come il primo capitolo, e non rispondere con un numero di pagina stampato nell'indice.
+
+                Assicurati che l'output aderisca rigorosamente al formato JSON specificato.
+            """,
             "prompt_elaborate_single_pdf": r""" 
                  **Ruolo:** Sei un assistente AI esperto nell'elaborazione di documenti accademici. La tua specializzazione è l'analisi e la ristrutturazione di contenuti tecnici, per qualsiasi materia. 
 
@@ -270,5 +539,107 @@ class PromptsForGemini:
                 Forniscimi una versione valida e compilabile del codice LaTeX.
                 Mantieni esattamente il formato LaTeX richiesto nel prompt originale (senza introduzioni, saluti o spiegazioni, iniziando direttamente con `\documentclass{article}`).
             """,
+            "prompt_elaborate_single_pdf_body": r""" 
+                 **Ruolo:** Sei un assistente AI esperto nell'elaborazione di documenti accademici. La tua specializzazione è l'analisi e la ristrutturazione di contenuti tecnici, per qualsiasi materia. 
+
+                 Sto analizzando un documento PDF contenente materiale didattico (lezioni, appunti, dispense) relativo a "**[subject]**". Ho bisogno di creare un documento strutturato in LaTeX che riassuma i concetti chiave, estragga gli esercizi presentati e generi nuovi esercizi. 
+
+                 1.  Analizza attentamente il testo del documento PDF che ti verrà fornito. 
+                 2.  **Identifica e estrai l'intestazione del documento, se presente, come il titolo principale, l'autore e la data.**                 
+                 3.  **Identifica e estrai tutti i teoremi o principi/leggi presentati.** Per ogni teorema, dovrai includere il suo enunciato completo e, se presente, il suo numero (es. Teorema 1.1, Legge di Ohm). **Non devi fornire la dimostrazione del teorema, ma richiedi al lettore di farlo.**
+                 4.  **Identifica e estrai le definizioni dei concetti chiave.** Per ogni concetto, dovrai indicare il termine da definire richiedendo poi al lettore di dare la definizione e aggiungendo il numero della definizione. **È fondamentale che l'ordine di presentazione dei teoremi e delle definizioni nel documento LaTeX rispecchi l'ordine in cui appaiono nel PDF originale.**
+                 5.  **Identifica e estrai gli esercizi presentati.** Per ogni esercizio, dovrai includere il testo completo dell'esercizio. **Se il testo dell'esercizio originale non è esplicitamente presente ma è solo un riferimento (es. "Esercizio 1"), l'AI dovrà generare un testo dell'esercizio rappresentativo basandosi sul contesto circostante o sul tipo di problema tipico di quell'argomento.** **Non devi fornire la soluzione dell'esercizio.**
+                 6.  **Genera 1 esercizio aggiuntivo per ciascun esercizio estratto.** Questi esercizi generati dall'AI devono richiedere gli stessi strumenti concettuali per la risoluzione degli esercizi originali, ma devono presentare dati, contesti o scenari diversi in modo da essere concettualmente distinti. Assicurati che siano coerenti con il livello di difficoltà e gli argomenti trattati nel documento originale.
+                 7.  Ignora completamente: 
+                     * Dimostrazioni complete di teoremi. 
+                     * Commenti o spiegazioni aggiuntive che non rientrano nelle categorie sopra menzionate (teoremi, definizioni, esercizi). 
+                     * Griglie di valutazione o punteggi. 
+                     * **Contenuto completo del libro o sezioni esplicative approfondite che non siano teoremi, definizioni o esercizi.**                     
+                     * **ISBN o qualsiasi altro dato editoriale.**                 
+                * L'output deve essere in formato LaTeX. 
+                * **Scrivi solo il corpo del documento.** Non scrivere `\documentclass`, `\usepackage`, `\begin{document}` o `\end{document}`: il preambolo viene aggiunto automaticamente e fornisce i pacchetti `amsmath`, `amsfonts`, `amssymb`, `enumitem`, `fancyhdr`, `hyperref`, `xcolor`, `courier` e `listings`. Non usare comandi di altri pacchetti.
+                 * **All'inizio del corpo, inserisci l'intestazione estratta, se presente, formattandola come segue:**                     * Il titolo principale usando `\title{}` e `\maketitle`. 
+                     * L'autore usando `\author{}`. 
+                 * **Utilizza le seguenti sezioni per organizzare il contenuto:**                     * **Contenuti Estratti:** Utilizza una sezione intitolata `\section*{Contenuti Estratti}`. All'interno di questa sezione, elenca teoremi e definizioni nell'ordine esatto in cui sono stati trovati nel documento originale. 
+                         * Ogni teorema deve essere presentato come un elemento di un elenco numerato (`enumerate`). L'enunciato deve seguire il formato: `\textbf{Teorema/Principio/Legge [Numero/Nome]:} [Enunciato completo]. \par \textbf{Dimostrazione:} [Lasciare spazio per la dimostrazione del lettore]` 
+                         * Ogni concetto da definire deve essere presentato come un elemento di un elenco numerato (`enumerate`). La definizione deve seguire il formato: `\textbf{Definizione [Numero della Definizione]:} Definire [Concetto da Definire].` 
+                     * **Esercizi Originali:** Utilizza una sezione intitolata `\section*{Esercizi Originali}`. Ogni esercizio deve essere presentato come un elemento di un elenco numerato (`enumerate`). Il testo dell'esercizio deve seguire il formato: `\textbf{Esercizio [Numero dell'Esercizio]:} [Testo completo dell'esercizio generato dall'AI se mancante o estratto].` 
+                     * **Esercizi Generati dall'AI:** Utilizza una sezione intitolata `\section*{Esercizi Generati dall'AI}`. Ogni esercizio generato deve essere un elemento di un elenco numerato (`enumerate`). Il formato deve essere: 
+                         ```latex 
+                         \begin{enumerate} 
+                             \item [Testo del primo esercizio generato.] 
+                             \item [Testo del secondo esercizio generato.] 
+                             \item [Testo del terzo esercizio generato.] 
+                             ... 
+                             \item [Testo dell'n-esimo esecizio generato.] 
+                         \end{enumerate} 
+                         ``` 
+                 * Mantieni la formattazione originale del testo estratto: 
+                     * Il **grassetto** deve essere `\textbf{testo}`. 
+                     * Il `monospace` per il codice inline deve essere `\texttt{codice}`. 
+                 * Per le notazioni matematiche e scientifiche, utilizza la formattazione LaTeX standard: 
+                     * Includi le espressioni matematiche inline all'interno di `$ $`. 
+                     * Includi i blocchi di equazioni all'interno di `$$ $$` o ambienti come `equation*` o `align*`. 
+                 * **[REGOLA CRITICA]** La tua risposta deve contenere *esclusivamente* il contenuto LaTeX. Non includere alcuna frase introduttiva, di saluto o di spiegazione (es. "Ecco l'output...", "Certo, ecco le domande...", ecc.). La tua risposta deve iniziare direttamente con il primo comando del corpo (es. `\title{...}` o `\section*{...}`). 
+             """,
+            "prompt_error_correction_body": r"""
+                Il codice LaTeX che hai generato in precedenza per il documento è risultato non valido durante la compilazione.
+                Si sono verificati i seguenti errori:
+                ```
+                **[error_message]**
+
+                ```
+                Ti prego di analizzare attentamente questi errori. Il tuo compito è **correggere il codice LaTeX in modo da risolvere questi problemi di compilazione**, mantenendo **fedelmente il contenuto e la struttura originale** che avevi estratto dal PDF. Non alterare il significato o la formattazione dei teoremi, definizioni ed esercizi.
+
+                **Regole LaTeX Cruciali per la Correzione:**
+                * **Ambienti Accoppiati:** Ogni `\begin{ambiente}` deve avere un corrispondente `\end{ambiente}` (es. `\begin{itemize}` e `\end{itemize}`, `\begin{equation}` e `\end{equation}`).
+                * **Delimitatori Matematici:**
+                    * Equazioni inline: Usare sempre singoli dollari `$` per iniziare e terminare (es. `Un vettore $v$`).
+                    * Blocchi di equazioni (display mode): Usare doppi dollari `$$` o ambienti specifici come `\begin{equation}` / `\end{equation}` o `\begin{align*}` / `\end{align*}`.
+                * **Comandi Non Definiti:** Assicurati che tutti i comandi (`\cmd`) e gli ambienti siano definiti dai pacchetti inclusi (`amsmath`, `amsfonts`, `amssymb`, `enumitem`, `fancyhdr`, `hyperref`, `xcolor`, `courier`, `listings`). Non introdurre nuovi comandi o ambienti senza i pacchetti necessari.
+                * **Caratteri Speciali:** I caratteri speciali LaTeX (es. `#`, `$`, `%`, `&`, `_`, `{{`, `}}`, `~`, `^`, `\\`, `<`, `>`) devono essere preceduti da un backslash (`\\`) se devono apparire come testo normale, a meno che non siano usati per il loro scopo LaTeX.
+                * **Bilanciamento delle Parentesi:** Tutte le parentesi tonde, quadre e graffe (specialmente quelle usate in comandi o ambienti LaTeX) devono essere correttamente bilanciate.
+                * **Evitare `[ ]` per Testo in Linea:** Non utilizzare `[` e `]` per racchiudere testo normale, a meno che non si tratti di un argomento opzionale di un comando LaTeX.
+                * **Testo non Matematico in Ambienti Matematici:** Il testo normale all'interno di ambienti matematici (`$` o `$$`) deve essere racchiuso in `\\text{}` o `\\mbox{}` per garantire la corretta formattazione del font (es. `$ \\text{{dove}} x > 0 $`).
+                * **Errore Comune: Parentesi Graffe Mancanti/Sbagliate:** L'errore più comune, soprattutto negli esercizi generati, è l'uso errato o la mancanza di parentesi graffe `}`. Spesso, viene usato un carattere come `>` al posto di `}` per chiudere un comando o un ambiente LaTeX. Controlla attentamente che tutte le parentesi graffe siano presenti e posizionate correttamente.
+
+                Forniscimi una versione valida e compilabile del codice LaTeX.
+                Mantieni esattamente il formato LaTeX richiesto nel prompt originale: solo il corpo del documento, senza `\documentclass`, `\usepackage`, `\begin{document}` e `\end{document}`, e senza introduzioni, saluti o spiegazioni.
+            """,
+            "prompt_elaborate_single_pdf_structured": r""" 
+                 **Ruolo:** Sei un assistente AI esperto nell'elaborazione di documenti accademici. La tua specializzazione è l'analisi e la ristrutturazione di contenuti tecnici, per qualsiasi materia. 
+
+                 Sto analizzando un documento PDF contenente materiale didattico (lezioni, appunti, dispense) relativo a "**[subject]**". Ho bisogno di creare un documento strutturato in LaTeX che riassuma i concetti chiave, estragga gli esercizi presentati e generi nuovi esercizi. 
+
+                 1.  Analizza attentamente il testo del documento PDF che ti verrà fornito. 
+                 2.  **Identifica e estrai l'intestazione del documento, se presente, come il titolo principale, l'autore e la data.**                 
+                 3.  **Identifica e estrai tutti i teoremi o principi/leggi presentati.** Per ogni teorema, dovrai includere il suo enunciato completo e, se presente, il suo numero (es. Teorema 1.1, Legge di Ohm). **Non devi fornire la dimostrazione del teorema, ma richiedi al lettore di farlo.**
+                 4.  **Identifica e estrai le definizioni dei concetti chiave.** Per ogni concetto, dovrai indicare il termine da definire richiedendo poi al lettore di dare la definizione e aggiungendo il numero della definizione. **È fondamentale che l'ordine di presentazione dei teoremi e delle definizioni nel documento LaTeX rispecchi l'ordine in cui appaiono nel PDF originale.**
+                 5.  **Identifica e estrai gli esercizi presentati.** Per ogni esercizio, dovrai includere il testo completo dell'esercizio. **Se il testo dell'esercizio originale non è esplicitamente presente ma è solo un riferimento (es. "Esercizio 1"), l'AI dovrà generare un testo dell'esercizio rappresentativo basandosi sul contesto circostante o sul tipo di problema tipico di quell'argomento.** **Non devi fornire la soluzione dell'esercizio.**
+                 6.  **Genera 1 esercizio aggiuntivo per ciascun esercizio estratto.** Questi esercizi generati dall'AI devono richiedere gli stessi strumenti concettuali per la risoluzione degli esercizi originali, ma devono presentare dati, contesti o scenari diversi in modo da essere concettualmente distinti. Assicurati che siano coerenti con il livello di difficoltà e gli argomenti trattati nel documento originale.
+                 7.  Ignora completamente: 
+                     * Dimostrazioni complete di teoremi. 
+                     * Commenti o spiegazioni aggiuntive che non rientrano nelle categorie sopra menzionate (teoremi, definizioni, esercizi). 
+                     * Griglie di valutazione o punteggi. 
+                     * **Contenuto completo del libro o sezioni esplicative approfondite che non siano teoremi, definizioni o esercizi.**                     
+                     * **ISBN o qualsiasi altro dato editoriale.**
+                * Compila i campi JSON richiesti, non scrivere un documento LaTeX: il documento viene costruito automaticamente a partire da essi.
+                * `title` e `author` contengono l'intestazione estratta, oppure sono vuoti se non è presente.
+                * `statements` contiene teoremi e definizioni nell'ordine esatto in cui sono stati trovati nel documento originale:
+                    * `kind` è `theorem` per teoremi, principi e leggi, `definition` per le definizioni.
+                    * `label` è il nome con il suo numero, es. `Teorema 1.1`, `Legge di Ohm`, `Definizione 2.3`.
+                    * `text` è l'enunciato completo per i teoremi, e solo il concetto da definire per le definizioni.
+                * `exercises` contiene gli esercizi originali, con `label` (es. `Esercizio 1.4`) e il `text` completo.
+                * `generated_exercises` contiene il testo degli esercizi generati dall'AI.
+                * Ogni campo di testo è un frammento LaTeX senza ambienti per la struttura del documento:
+                    * Il **grassetto** deve essere `\textbf{testo}`, il `monospace` per il codice in linea deve essere `\texttt{codice}`.
+                    * Includi le espressioni matematiche in linea tra `$ $` e i blocchi di equazioni tra `$$ $$` o in ambienti come `equation*` o `align*`.
+                    * Usa solo i comandi dei pacchetti `amsmath`, `amsfonts`, `amssymb`, `enumitem` e `listings`.
+""",
+            "prompt_skip_list": r"""
+
+                **Già estratti:** i seguenti teoremi e definizioni sono già stati estratti dai capitoli precedenti dello stesso libro. Non estrarli di nuovo, anche se vengono riportati in questo documento; estrai solo quelli nuovi.
+**[items]**
+""",
         },
     }
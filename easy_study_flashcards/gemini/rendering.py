@@ -0,0 +1,87 @@
+import re
+from typing import Dict, List
+
+from easy_study_flashcards.gemini.models import ChapterFlashcards, StatementKind
+
+# Words of the rendered document, in the languages of the prompts
+RENDERING_STRINGS: Dict[str, Dict[str, str]] = {
+    "en": {
+        "extracted_content": "Extracted Content",
+        "original_exercises": "Original Exercises",
+        "generated_exercises": "AI-Generated Exercises",
+        "proof": "Proof:",
+        "define": "Define",
+    },
+    "it": {
+        "extracted_content": "Contenuti Estratti",
+        "original_exercises": "Esercizi Originali",
+        "generated_exercises": "Esercizi Generati dall'AI",
+        "proof": "Dimostrazione:",
+        "define": "Definire",
+    },
+}
+
+# % would comment out the rest of the item and # is only valid in macro definitions
+UNESCAPED_SPECIAL_CHARACTERS = re.compile(r"(?<!\\)([%#])")
+
+
+def sanitize_fragment(text: str) -> str:
+    """Makes a LaTeX fragment written by the model safe to put inside an \\item."""
+    return UNESCAPED_SPECIAL_CHARACTERS.sub(r"\\\1", text.strip())
+
+
+def _enumerate(items: List[str]) -> List[str]:
+    return ["\\begin{enumerate}", *(f"    \\item {item}" for item in items), "\\end{enumerate}"]
+
+
+def render_flashcards_body(flashcards: ChapterFlashcards, lang: str) -> str:
+    """
+    Renders the structured flashcards of a chapter to the body of a LaTeX
+    document, in the same layout the full document prompts ask for.
+    Empty sections are left out, since an empty enumerate doesn't compile.
+    """
+    assert lang in RENDERING_STRINGS, "Invalid language provided to render_flashcards_body"
+    strings: Dict[str, str] = RENDERING_STRINGS[lang]
+    lines: List[str] = []
+
+    if flashcards.title.strip():
+        lines.append(f"\\title{{{sanitize_fragment(flashcards.title)}}}")
+        lines.append(f"\\author{{{sanitize_fragment(flashcards.author)}}}")
+        lines.append("\\date{}")
+        lines.append("\\maketitle")
+        lines.append("")
+
+    if flashcards.statements:
+        items: List[str] = []
+        for statement in flashcards.statements:
+            label: str = sanitize_fragment(statement.label)
+            text: str = sanitize_fragment(statement.text)
+            if statement.kind == StatementKind.THEOREM:
+                items.append(f"\\textbf{{{label}:}} {text} \\par \\textbf{{{strings['proof']}}}")
+            else:
+                items.append(f"\\textbf{{{label}:}} {strings['define']} {text.rstrip('.')}.")
+        lines.append(f"\\section*{{{strings['extracted_content']}}}")
+        lines.extend(_enumerate(items))
+        lines.append("")
+
+    if flashcards.exercises:
+        lines.append(f"\\section*{{{strings['original_exercises']}}}")
+        lines.extend(
+            _enumerate(
+                [
+                    f"\\textbf{{{sanitize_fragment(exercise.label)}:}} {sanitize_fragment(exercise.text)}"
+                    for exercise in flashcards.exercises
+                ]
+            )
+        )
+        lines.append("")
+
+    generated_exercises: List[str] = [
+        sanitize_fragment(text) for text in flashcards.generated_exercises if text.strip()
+    ]
+    if generated_exercises:
+        lines.append(f"\\section*{{{strings['generated_exercises']}}}")
+        lines.extend(_enumerate(generated_exercises))
+        lines.append("")
+
+    return "\n".join(lines).strip()
@@ -0,0 +1,180 @@
+import json
+import threading
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Optional
+
+from loguru import logger
+from stockholm import Money
+
+from easy_study_flashcards.utils.localization import localizer as _
+
+
+class Stage(Enum):
+    """The kinds of requests of a run."""
+
+    CHAPTER_DETECTION = "chapter_detection"
+    FIRST_CHAPTER_PAGE = "first_chapter_page"  # Answered with a single integer
+    GENERATION = "generation"
+    CORRECTION = "correction"
+
+
+@dataclass
+class ModelProfile:
+    """Prices in USD per 1M tokens, latency of a chapter-sized request in seconds."""
+
+    input_price: float
+    output_price: float
+    latency_seconds: float
+
+
+# Check the latest prices on the official Google AI for Developers site,
+# or override them with --model-table
+DEFAULT_MODEL_PROFILES: Dict[str, ModelProfile] = {
+    "gemini-2.5-pro": ModelProfile(input_price=1.25, output_price=10.00, latency_seconds=45.0),
+    "gemini-2.5-flash": ModelProfile(input_price=0.30, output_price=2.50, latency_seconds=25.0),
+    "gemini-2.5-flash-lite": ModelProfile(input_price=0.10, output_price=0.40, latency_seconds=8.0),
+    "gemini-2.0-flash": ModelProfile(input_price=0.10, output_price=0.40, latency_seconds=10.0),
+    "gemini-2.0-flash-lite": ModelProfile(input_price=0.075, output_price=0.30, latency_seconds=7.0),
+    "gemini-1.5-flash": ModelProfile(input_price=0.075, output_price=0.15, latency_seconds=10.0),
+}
+
+
+def load_model_profiles(path: str) -> Dict[str, ModelProfile]:
+    """
+    Reads a JSON table {"model": {"input_price": .., "output_price": .., "latency_seconds": ..}}.
+    Its models are added to the default ones, or replace them.
+    """
+    with open(path, "r", encoding="utf-8") as table_file:
+        table: Dict[str, Dict[str, float]] = json.load(table_file)
+    profiles: Dict[str, ModelProfile] = dict(DEFAULT_MODEL_PROFILES)
+    for model_name, values in table.items():
+        profiles[model_name] = ModelProfile(**values)
+    return profiles
+
+
+@dataclass
+class RoutingPolicy:
+    """
+    Chooses the model of every request. Without a light model every stage
+    uses its own model; with one, integer lookups, small chapters and the
+    first corrections go to the light model and only the rest to the
+    stage model.
+    """
+
+    stage_models: Dict[Stage, str]
+    light_model: Optional[str] = None
+    small_chapter_pages: int = 8
+    small_chapter_tokens: int = 8000
+    # Corrections up to this retry use the light model, the later ones the stage model
+    light_correction_retries: int = 1
+
+    @classmethod
+    def from_models(
+        cls, chapters_model: str, generation_model: str, light_model: Optional[str] = None, **kwargs
+    ) -> "RoutingPolicy":
+        return cls(
+            stage_models={
+                Stage.CHAPTER_DETECTION: chapters_model,
+                Stage.FIRST_CHAPTER_PAGE: generation_model,
+                Stage.GENERATION: generation_model,
+                Stage.CORRECTION: generation_model,
+            },
+            light_model=light_model,
+            **kwargs,
+        )
+
+    def is_small_chapter(self, pages: Optional[int], tokens: Optional[int]) -> bool:
+        """
+        Small when every size given is within its limit: a chapter of few pages
+        can still be long, e.g. dense text sent as text layer.
+        """
+        if pages is None and tokens is None:
+            return False
+        return (pages is None or pages <= self.small_chapter_pages) and (
+            tokens is None or tokens <= self.small_chapter_tokens
+        )
+
+    def choose_model(
+        self,
+        stage: Stage,
+        pages: Optional[int] = None,
+        tokens: Optional[int] = None,
+        retry: int = 0,
+    ) -> str:
+        model: str = self.stage_models[stage]
+        if self.light_model is None:
+            return model
+        if stage == Stage.FIRST_CHAPTER_PAGE:
+            return self.light_model
+        if stage == Stage.GENERATION and self.is_small_chapter(pages, tokens):
+            return self.light_model
+        if stage == Stage.CORRECTION and retry <= self.light_correction_retries:
+            return self.light_model
+        return model
+
+
+@dataclass
+class ModelUsage:
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost: Money = field(default_factory=lambda: Money(0))
+    latency_seconds: float = 0.0
+
+    @property
+    def average_latency(self) -> float:
+        return self.latency_seconds / self.requests if self.requests else 0.0
+
+
+class UsageReport:
+    """Requests, tokens, cost and latency of a run, split by model. Shared by the clients of a pool."""
+
+    def __init__(self, profiles: Optional[Dict[str, ModelProfile]] = None):
+        self.profiles: Dict[str, ModelProfile] = profiles or DEFAULT_MODEL_PROFILES
+        self.by_model: Dict[str, ModelUsage] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def cost_of(self, model_name: str, input_tokens: int, output_tokens: int) -> Optional[Money]:
+        profile: Optional[ModelProfile] = self.profiles.get(model_name)
+        if profile is None:
+            return None
+        return (Money(input_tokens) / 1_000_000) * profile.input_price + (
+            Money(output_tokens) / 1_000_000
+        ) * profile.output_price
+
+    def record(
+        self, model_name: str, input_tokens: int, output_tokens: int, latency_seconds: float
+    ) -> Optional[Money]:
+        """Adds a request to the report. Returns its cost, None if the model has no price."""
+        cost: Optional[Money] = self.cost_of(model_name, input_tokens, output_tokens)
+        with self._lock:
+            usage: ModelUsage = self.by_model.setdefault(model_name, ModelUsage())
+            usage.requests += 1
+            usage.input_tokens += input_tokens
+            usage.output_tokens += output_tokens
+            usage.latency_seconds += latency_seconds
+            if cost is not None:
+                usage.cost += cost
+        return cost
+
+    @property
+    def total_cost(self) -> Money:
+        return sum((usage.cost for usage in self.by_model.values()), Money(0))
+
+    def log_summary(self) -> None:
+        for model_name, usage in sorted(self.by_model.items()):
+            logger.info(
+                _.get_string(
+                    "model_usage",
+                    model=model_name,
+                    requests=usage.requests,
+                    input_tokens=usage.input_tokens,
+                    output_tokens=usage.output_tokens,
+                    cost=usage.cost.amount_as_string(),
+                    latency=f"{usage.latency_seconds:.1f}",
+                    average_latency=f"{usage.average_latency:.1f}",
+                )
+            )
+        if self.by_model:
+            logger.info(_.get_string("total_cost", cost=self.total_cost.amount_as_string()))
@@ -0,0 +1,90 @@
+import statistics
+from enum import Enum
+from typing import Callable, List, Optional, Tuple
+
+from loguru import logger
+
+from easy_study_flashcards.gemini.models import BookStructure
+from easy_study_flashcards.utils.localization import localizer as _
+
+# First window of the adaptive scan, doubled while the chapter list looks incomplete
+ADAPTIVE_START_PAGES: int = 12
+ADAPTIVE_MAX_PAGES: int = 80
+# A chapter starting this close to the end of the window may be followed by unseen ones
+WINDOW_END_MARGIN: int = 2
+# A jump between chapter starts this many times the median one suggests missing chapters
+MAX_GAP_TO_MEDIAN: float = 4.0
+MIN_SUSPICIOUS_GAP: int = 20
+# The chapters must reach at least this fraction of the book
+MIN_BOOK_COVERAGE: float = 0.5
+
+
+class IncompleteReason(Enum):
+    NO_CHAPTERS = "no_chapters"
+    FIRST_CHAPTER_OUTSIDE_WINDOW = "first_chapter_outside_window"
+    LAST_CHAPTER_AT_WINDOW_END = "last_chapter_at_window_end"
+    PAGE_GAP = "page_gap"
+    BOOK_NOT_COVERED = "book_not_covered"
+
+
+def find_incompleteness(
+    structure: BookStructure, pages_scanned: int, total_pages: int
+) -> Optional[IncompleteReason]:
+    """
+    Why the chapter list detected from the first pages_scanned pages looks
+    incomplete, None if it looks complete. A window that covers the whole
+    document can't be grown, so its list is taken as it is.
+    """
+    if pages_scanned >= total_pages:
+        return None
+    if not structure.chapters:
+        return IncompleteReason.NO_CHAPTERS
+    if structure.first_chapter_physical_page > pages_scanned - WINDOW_END_MARGIN:
+        return IncompleteReason.FIRST_CHAPTER_OUTSIDE_WINDOW
+
+    offset: int = structure.first_chapter_physical_page - 1
+    starts: List[int] = sorted(offset + chapter.start_page for chapter in structure.chapters)
+    # Chapters listed from the headings of the scanned pages rather than from a table of contents
+    if pages_scanned - WINDOW_END_MARGIN < starts[-1] <= pages_scanned + WINDOW_END_MARGIN:
+        return IncompleteReason.LAST_CHAPTER_AT_WINDOW_END
+    gaps: List[int] = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    if len(gaps) >= 2:
+        median_gap: float = statistics.median(gaps)
+        if any(gap >= MIN_SUSPICIOUS_GAP and gap > MAX_GAP_TO_MEDIAN * median_gap for gap in gaps):
+            return IncompleteReason.PAGE_GAP
+    if starts[-1] < MIN_BOOK_COVERAGE * total_pages:
+        return IncompleteReason.BOOK_NOT_COVERED
+    return None
+
+
+def detect_with_adaptive_window(
+    detect: Callable[[int], Optional[BookStructure]],
+    total_pages: int,
+    filename: str,
+    start_pages: int = ADAPTIVE_START_PAGES,
+    max_pages: int = ADAPTIVE_MAX_PAGES,
+) -> Tuple[Optional[BookStructure], int]:
+    """
+    Runs detect on the first start_pages pages, doubling the window while
+    the result looks incomplete, up to max_pages (or the whole document).
+    Returns the last structure detected and the pages of the window it came from.
+    """
+    limit: int = min(max_pages, total_pages)
+    window: int = min(start_pages, limit)
+    while True:
+        structure: Optional[BookStructure] = detect(window)
+        reason: Optional[IncompleteReason] = (
+            find_incompleteness(structure, window, total_pages)
+            if structure is not None
+            else IncompleteReason.NO_CHAPTERS
+        )
+        if reason is None or window >= limit:
+            logger.info(_.get_string("scan_window_used", filename=filename, pages=window, total=total_pages))
+            return structure, window
+        next_window: int = min(window * 2, limit)
+        logger.info(
+            _.get_string(
+                "scan_window_grown", filename=filename, reason=reason.value, pages=window, next_pages=next_window
+            )
+        )
+        window = next_window
@@ -0,0 +1,266 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+
+from easy_study_flashcards.utils.localization import localizer as _
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS chapter_jobs (
+    id INTEGER PRIMARY KEY,
+    chapter_path TEXT NOT NULL UNIQUE,
+    book TEXT NOT NULL,
+    subject_matter TEXT,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS chapter_jobs_status ON chapter_jobs (status, lease_expires_at);
+"""
+
+# A worker that doesn't renew its lease for this long is considered dead
+DEFAULT_LEASE_SECONDS: float = 120.0
+# Jobs reclaimed this many times are failed instead of handed out again
+DEFAULT_MAX_ATTEMPTS: int = 3
+# Seconds SQLite waits for the lock held by another worker
+LOCK_TIMEOUT_SECONDS: float = 30.0
+
+
+class JobStatus(Enum):
+    """Status of the books of the service and of the chapters of the queue."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass
+class ChapterQueueJob:
+    id: int
+    chapter_path: str
+    book: str
+    subject_matter: Optional[str]
+    attempts: int
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of chapter jobs shared by the workers of one or more
+    hosts. A worker takes a job with a lease that it renews with heartbeats;
+    the jobs of workers whose lease expired are handed out again.
+    The journal is kept in the default rollback mode: WAL needs shared memory,
+    which network filesystems don't provide.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path: str = path
+        self.lease_seconds: float = lease_seconds
+        self.max_attempts: int = max_attempts
+        self._clock: Callable[[], float] = clock
+        # Transactions are opened explicitly, so that taking a job is atomic between processes
+        self.connection: sqlite3.Connection = sqlite3.connect(
+            path, timeout=LOCK_TIMEOUT_SECONDS, isolation_level=None, check_same_thread=False
+        )
+        self.connection.row_factory = sqlite3.Row
+        self._lock: threading.Lock = threading.Lock()
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def enqueue(self, chapter_path: str, book: str, subject_matter: Optional[str] = None) -> bool:
+        """
+        Adds a chapter, or queues it again if it already finished. Chapters still
+        queued or running are left alone. Returns whether it was (re)queued.
+        """
+        with self._lock:
+            cursor = self.connection.execute(
+                "INSERT INTO chapter_jobs (chapter_path, book, subject_matter, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (chapter_path) DO UPDATE SET book = excluded.book, "
+                "subject_matter = excluded.subject_matter, status = excluded.status, worker = NULL, "
+                "lease_expires_at = NULL, attempts = 0, error = NULL, finished_at = NULL "
+                "WHERE status IN (?, ?)",
+                (
+                    os.path.abspath(chapter_path),
+                    book,
+                    subject_matter,
+                    JobStatus.QUEUED.value,
+                    self._clock(),
+                    JobStatus.DONE.value,
+                    JobStatus.FAILED.value,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def claim(self, worker: str) -> Optional[ChapterQueueJob]:
+        """
+        Leases the oldest queued job to the worker, or a running job whose
+        lease expired. Expired jobs that used up their attempts are failed.
+        """
+        with self._lock:
+            now: float = self._clock()
+            # IMMEDIATE takes the write lock now: two workers can't select the same job
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.connection.execute(
+                    "UPDATE chapter_jobs SET status = ?, error = ?, finished_at = ? "
+                    "WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                    (
+                        JobStatus.FAILED.value,
+                        "lease expired too many times",
+                        now,
+                        JobStatus.RUNNING.value,
+                        now,
+                        self.max_attempts,
+                    ),
+                )
+                row: Optional[sqlite3.Row] = self.connection.execute(
+                    "SELECT * FROM chapter_jobs "
+                    "WHERE status = ? OR (status = ? AND lease_expires_at < ?) "
+                    "ORDER BY id LIMIT 1",
+                    (JobStatus.QUEUED.value, JobStatus.RUNNING.value, now),
+                ).fetchone()
+                if row is None:
+                    self.connection.execute("COMMIT")
+                    return None
+                if row["status"] == JobStatus.RUNNING.value:
+                    logger.warning(_.get_string("queue_job_reclaimed", path=row["chapter_path"], worker=row["worker"]))
+                self.connection.execute(
+                    "UPDATE chapter_jobs SET status = ?, worker = ?, lease_expires_at = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (JobStatus.RUNNING.value, worker, now + self.lease_seconds, row["id"]),
+                )
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+        return ChapterQueueJob(
+            row["id"], row["chapter_path"], row["book"], row["subject_matter"], row["attempts"] + 1
+        )
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """Renews the lease of a job. Returns False if the worker lost it."""
+        with self._lock:
+            cursor = self.connection.execute(
+                "UPDATE chapter_jobs SET lease_expires_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (self._clock() + self.lease_seconds, job_id, worker, JobStatus.RUNNING.value),
+            )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: int, worker: str, succeeded: bool, error: Optional[str] = None) -> bool:
+        """Marks a job done or failed. Ignored (returns False) if the job was reclaimed meanwhile."""
+        with self._lock:
+            cursor = self.connection.execute(
+                "UPDATE chapter_jobs SET status = ?, error = ?, finished_at = ?, lease_expires_at = NULL "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (
+                    (JobStatus.DONE if succeeded else JobStatus.FAILED).value,
+                    error,
+                    self._clock(),
+                    job_id,
+                    worker,
+                    JobStatus.RUNNING.value,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT status, COUNT(*) AS jobs FROM chapter_jobs GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["jobs"] for row in rows}
+
+    def is_drained(self) -> bool:
+        """Whether no job is queued or running."""
+        counts: Dict[str, int] = self.counts()
+        return not counts.get(JobStatus.QUEUED.value) and not counts.get(JobStatus.RUNNING.value)
+
+
+class QueueWorker:
+    """
+    Takes jobs from the queue and runs process_job on them, renewing the lease
+    from a background thread while a job runs. process_job returns whether the
+    chapter succeeded; exceptions fail the job.
+    """
+
+    def __init__(
+        self,
+        job_queue: JobQueue,
+        process_job: Callable[[ChapterQueueJob], bool],
+        worker_id: Optional[str] = None,
+        poll_interval_seconds: float = 5.0,
+    ):
+        self.job_queue: JobQueue = job_queue
+        self.process_job: Callable[[ChapterQueueJob], bool] = process_job
+        self.worker_id: str = worker_id or default_worker_id()
+        self.poll_interval_seconds: float = poll_interval_seconds
+        self.stop_event: threading.Event = threading.Event()
+        self.processed: int = 0
+
+    def _keep_lease(self, job: ChapterQueueJob, finished: threading.Event) -> None:
+        # Three heartbeats per lease, so a late one doesn't lose the job
+        while not finished.wait(self.job_queue.lease_seconds / 3):
+            if not self.job_queue.heartbeat(job.id, self.worker_id):
+                logger.warning(_.get_string("queue_lease_lost", path=job.chapter_path))
+                return
+
+    def run_one(self) -> bool:
+        """Processes a single job. Returns False if there was none to take."""
+        job: Optional[ChapterQueueJob] = self.job_queue.claim(self.worker_id)
+        if job is None:
+            return False
+
+        logger.info(_.get_string("queue_job_started", path=job.chapter_path, worker=self.worker_id, attempt=job.attempts))
+        finished: threading.Event = threading.Event()
+        heartbeat: threading.Thread = threading.Thread(target=self._keep_lease, args=(job, finished), daemon=True)
+        heartbeat.start()
+        error: Optional[str] = None
+        try:
+            succeeded: bool = self.process_job(job)
+        except Exception as e:
+            logger.error(_.get_string("queue_job_error", path=job.chapter_path, error=str(e)))
+            succeeded, error = False, str(e)
+        finally:
+            finished.set()
+            heartbeat.join()
+        self.job_queue.finish(job.id, self.worker_id, succeeded, error)
+        self.processed += 1
+        return True
+
+    def run(self, exit_when_drained: bool = False) -> None:
+        """Takes jobs until stopped, or until the queue is drained if exit_when_drained."""
+        while not self.stop_event.is_set():
+            if self.run_one():
+                continue
+            if exit_when_drained and self.job_queue.is_drained():
+                return
+            self.stop_event.wait(self.poll_interval_seconds)
@@ -0,0 +1,145 @@
+import io
+import math
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from pypdf import PageObject, PdfWriter
+from loguru import logger
+
+from easy_study_flashcards.utils.localization import localizer as _
+
+POINTS_PER_INCH: int = 72
+
+
+@dataclass
+class CompactionOptions:
+    """Settings of the compaction stage applied to PDFs before they are uploaded."""
+
+    # Images displayed at a higher resolution than this are downsampled
+    target_dpi: int = 150
+    jpeg_quality: int = 75
+    compress_content_streams: bool = True
+    deduplicate_objects: bool = True
+
+
+@dataclass
+class CompactionResult:
+    data: bytes
+    original_size: int
+    images_downsampled: int = 0
+
+    @property
+    def compacted_size(self) -> int:
+        return len(self.data)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_size - self.compacted_size
+
+
+def _image_display_sizes(page: PageObject) -> Dict[str, Tuple[float, float]]:
+    """
+    Maps the name of every image XObject drawn on the page to the largest size
+    (width, height in points) it is painted at, read from the CTM of each 'Do'.
+    """
+    sizes: Dict[str, Tuple[float, float]] = {}
+
+    def visitor(operator, operands, cm, tm) -> None:
+        if operator != b"Do" or not operands:
+            return
+        width: float = math.hypot(cm[0], cm[1])
+        height: float = math.hypot(cm[2], cm[3])
+        name: str = str(operands[0])
+        previous = sizes.get(name, (0.0, 0.0))
+        sizes[name] = (max(previous[0], width), max(previous[1], height))
+
+    try:
+        page.extract_text(visitor_operand_before=visitor)
+    except Exception:
+        pass
+    return sizes
+
+
+def _has_image_xobjects(page: PageObject) -> bool:
+    """Cheap check on the page resources, without parsing the content stream."""
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    if not xobjects:
+        return False
+    return any(
+        xobject.get_object().get("/Subtype") == "/Image"
+        for xobject in xobjects.get_object().values()
+    )
+
+
+def _downsample_page_images(page: PageObject, options: CompactionOptions) -> int:
+    """
+    Downsamples the images of a page that exceed the target DPI.
+    Needs Pillow; without it images are left untouched.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return 0
+
+    if not _has_image_xobjects(page):
+        return 0  # Avoids parsing the content stream of text-only pages
+
+    display_sizes = _image_display_sizes(page)
+    downsampled: int = 0
+
+    for image_file in page.images:
+        name: str = "/" + image_file.name.rsplit(".", 1)[0].lstrip("/")
+        if name not in display_sizes or image_file.indirect_reference is None:
+            continue
+        xobject = image_file.indirect_reference.get_object()
+        if "/SMask" in xobject or "/Mask" in xobject:
+            continue  # Transparency would be lost when re-encoding as JPEG
+
+        pil_image = image_file.image
+        if pil_image is None or pil_image.mode not in ("RGB", "L", "CMYK"):
+            continue
+
+        width_pt, height_pt = display_sizes[name]
+        if width_pt <= 0 or height_pt <= 0:
+            continue
+        target_width: int = math.ceil(width_pt / POINTS_PER_INCH * options.target_dpi)
+        target_height: int = math.ceil(height_pt / POINTS_PER_INCH * options.target_dpi)
+        if pil_image.width <= target_width or pil_image.height <= target_height:
+            continue
+
+        resized = pil_image.resize((target_width, target_height), Image.LANCZOS)
+        image_file.replace(resized, quality=options.jpeg_quality)
+        downsampled += 1
+
+    return downsampled
+
+
+def compact_pdf_bytes(pdf_bytes: bytes, options: CompactionOptions) -> CompactionResult:
+    """
+    Compacts a PDF: downsamples images above the target DPI, compresses the
+    content streams and merges identical objects (fonts, resources) while
+    dropping the ones no page references anymore.
+    If compaction fails or doesn't make the file smaller, the original is kept.
+    """
+    result: CompactionResult = CompactionResult(data=pdf_bytes, original_size=len(pdf_bytes))
+
+    try:
+        writer: PdfWriter = PdfWriter(clone_from=io.BytesIO(pdf_bytes))
+        for page in writer.pages:
+            result.images_downsampled += _downsample_page_images(page, options)
+            if options.compress_content_streams:
+                page.compress_content_streams()
+
+        if options.deduplicate_objects:
+            writer.compress_identical_objects()
+
+        buffer: io.BytesIO = io.BytesIO()
+        writer.write(buffer)
+    except Exception as e:
+        logger.warning(_.get_string("compaction_error", error=str(e)))
+        return result
+
+    if len(buffer.getvalue()) < result.original_size:
+        result.data = buffer.getvalue()
+    return result
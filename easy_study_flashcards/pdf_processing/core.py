@@ -1,6 +1,7 @@
 import io
 import os
 import pathlib
+import shutil
 import subprocess
 from typing import List, Optional, Tuple
 
@@ -8,10 +9,21 @@ from pypdf import PdfReader, PdfWriter
 from loguru import logger
 
 from easy_study_flashcards.utils.latex import get_xelatex_path
+from easy_study_flashcards.utils.latex_format import (
+    discard_format,
+    get_or_build_format,
+    is_format_failure,
+    split_preamble,
+)
+from easy_study_flashcards.utils.latex_log import LatexError, parse_latex_log
 from easy_study_flashcards.utils.colors import Colors
 from easy_study_flashcards.utils.localization import localizer as _
 
 
+# Wall-clock limit of a single xelatex run on a chapter document
+COMPILE_TIMEOUT_SECONDS: float = 120.0
+
+
 class PDFProcessor:
     @staticmethod
     def extract_pdf_pages_to_bytes(
@@ -64,14 +76,48 @@ class PDFProcessor:
             )
             return None
 
+    @staticmethod
+    def extract_pdf_page_list_to_bytes(
+        reader: PdfReader, page_indices: List[int]
+    ) -> Optional[io.BytesIO]:
+        """
+        Copies an arbitrary list of pages (0-indexed, in the given order) from an
+        already opened PdfReader into a new PDF and returns it as BytesIO.
+        """
+        total_pdf_pages: int = len(reader.pages)
+        writer: PdfWriter = PdfWriter()
+        for i in page_indices:
+            if 0 <= i < total_pdf_pages:
+                writer.add_page(reader.pages[i])
+
+        if len(writer.pages) == 0:
+            return None
+
+        buffer: io.BytesIO = io.BytesIO()
+        writer.write(buffer)
+        buffer.seek(0)
+        return buffer
+
     @staticmethod
     def validate_and_compile_latex_to_pdf(
-        latex_content: str, output_directory: str, output_file_name_base: str
+        latex_content: str,
+        output_directory: str,
+        output_file_name_base: str,
+        use_precompiled_preamble: bool = False,
+        timeout_seconds: float = COMPILE_TIMEOUT_SECONDS,
+        produce_pdf: bool = True,
     ) -> Tuple[bool, str]:
         """
         Saves the LaTeX content to a temporary file and attempts to compile it with xelatex.
         If successful, it converts to PDF and returns (True, "").
         If compilation fails, it returns (False, error_message).
+        With use_precompiled_preamble the document is compiled against a cached
+        format file that already contains its preamble, so packages aren't loaded again.
+        The compile stops at the first error and is killed after timeout_seconds;
+        the error, with its line and source context, is read from the log as a stream.
+        With produce_pdf=False the document is only typeset (xelatex -no-pdf): the
+        .xdv output is left for convert_xdv_to_pdf, which writes the PDF of the
+        accepted version without typesetting it again.
         """
         temp_file_name: str = output_file_name_base + ".tex"
         temp_file_path: str = os.path.join(output_directory, temp_file_name)
@@ -88,24 +134,42 @@ class PDFProcessor:
 
         xelatex_exe = get_xelatex_path()
 
-        # Command for xelatex to compile and generate PDF
+        format_options: List[str] = []
+        format_path: Optional[str] = None
+        if use_precompiled_preamble:
+            split_document = split_preamble(latex_content)
+            if split_document is not None:
+                format_path = get_or_build_format(split_document[0], xelatex_exe)
+                if format_path is not None:
+                    format_options = [f"-fmt={format_path}"]
+
+        # Command for xelatex to compile and generate PDF (or only the .xdv)
         compile_command: List[str] = [
             xelatex_exe,
+            *format_options,
             "-interaction=nonstopmode",
+            "-halt-on-error",
             "-c-style-errors",
+            *([] if produce_pdf else ["-no-pdf"]),
             "-output-directory",
             output_directory,
             temp_file_path,
         ]
 
         error_message: str = ""
+        # Only the .xdv of a successful validation is left for convert_xdv_to_pdf
+        keep_xdv: bool = False
         try:
+            # The terminal output repeats the log: it isn't kept in memory, the log is parsed instead
             result: subprocess.CompletedProcess = subprocess.run(
                 compile_command,
                 check=False,
-                capture_output=True,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
                 text=True,
                 errors="ignore",
+                timeout=timeout_seconds,
             )
 
             if result.returncode != 0:
@@ -113,25 +177,26 @@ class PDFProcessor:
                     _.get_string('latex_compilation_error', filename=temp_file_name)
                 )
                 if os.path.exists(temp_log_file):
-                    with open(
-                        temp_log_file, "r", encoding="utf-8", errors="ignore"
-                    ) as log_f:
-                        log_content: str = log_f.read()
-                        error_lines: List[str] = [
-                            line
-                            for line in log_content.splitlines()
-                            if line.startswith("!")
-                            or "fatal error" in line.lower()
-                            or "undefined control sequence" in line.lower()
-                            or "missing" in line.lower()
-                            or "runaway argument" in line.lower()
-                        ]
-                        if error_lines:
-                            error_message = "\n".join(error_lines[:10])
-                        else:
-                            error_message = result.stderr + "\n" + result.stdout
+                    latex_errors: List[LatexError] = parse_latex_log(
+                        temp_log_file, source_file=temp_file_path
+                    )
+                    error_message = "\n".join(str(error) for error in latex_errors)
+                if not error_message and format_path is not None and is_format_failure(temp_log_file):
+                    # A format dumped by another xelatex installation stops the compile before any error is logged
+                    logger.warning(_.get_string('latex_format_discarded', name=os.path.basename(format_path)))
+                    discard_format(format_path)
+                    retried: Tuple[bool, str] = PDFProcessor.validate_and_compile_latex_to_pdf(
+                        latex_content,
+                        output_directory,
+                        output_file_name_base,
+                        use_precompiled_preamble=False,
+                        timeout_seconds=timeout_seconds,
+                        produce_pdf=produce_pdf,
+                    )
+                    keep_xdv = retried[0] and not produce_pdf
+                    return retried
                 if not error_message:
-                    error_message = result.stderr + "\n" + result.stdout
+                    error_message = result.stderr or f"xelatex exited with code {result.returncode}"
 
                 logger.error(
                     _.get_string('latex_compilation_error_details', message=error_message)
@@ -141,7 +206,13 @@ class PDFProcessor:
                 logger.success(
                     _.get_string('latex_compilation_success', filename=temp_file_name)
                 )
+                keep_xdv = not produce_pdf
                 return True, ""
+        except subprocess.TimeoutExpired:
+            logger.error(
+                _.get_string('latex_compilation_timeout', filename=temp_file_name, seconds=timeout_seconds)
+            )
+            return False, f"Compilation stopped after {timeout_seconds:g} seconds: the document doesn't terminate."
         except FileNotFoundError:
             logger.error(_.get_string('latex_not_found'))
             return False, "xelatex_not_found"
@@ -152,9 +223,60 @@ class PDFProcessor:
             return False, f"Unexpected error: {e}"
         finally:
             # Clean up temporary files except the final PDF and tex file
-            for ext in [".aux", ".log", ".out", ".fls", ".fdb_latexmk"]:
+            for ext in [".aux", ".log", ".out", ".fls", ".fdb_latexmk", *([] if keep_xdv else [".xdv"])]:
                 temp_path_to_clean: str = os.path.join(
                     output_directory, output_file_name_base + ext
                 )
                 if os.path.exists(temp_path_to_clean):
                     os.remove(temp_path_to_clean)
+
+    @staticmethod
+    def convert_xdv_to_pdf(
+        output_directory: str,
+        output_file_name_base: str,
+        timeout_seconds: float = COMPILE_TIMEOUT_SECONDS,
+    ) -> bool:
+        """
+        Writes the PDF of a document validated with produce_pdf=False, running
+        only the xdvipdfmx driver (fonts and images embedding) on its .xdv.
+        Returns False if the driver isn't available or fails; the caller then
+        compiles the document to PDF again.
+        """
+        xdv_path: str = os.path.join(output_directory, output_file_name_base + ".xdv")
+        if not os.path.exists(xdv_path):
+            return False
+
+        # The driver is installed next to xelatex
+        driver_exe: Optional[str] = shutil.which(
+            "xdvipdfmx", path=os.path.dirname(get_xelatex_path())
+        ) or shutil.which("xdvipdfmx")
+        try:
+            if driver_exe is None:
+                return False
+            result: subprocess.CompletedProcess = subprocess.run(
+                [
+                    driver_exe,
+                    "-q",
+                    "-o",
+                    os.path.join(output_directory, output_file_name_base + ".pdf"),
+                    xdv_path,
+                ],
+                check=False,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors="ignore",
+                timeout=timeout_seconds,
+            )
+            if result.returncode != 0:
+                logger.warning(
+                    _.get_string('xdv_conversion_error', filename=xdv_path, error=result.stderr.strip())
+                )
+                return False
+            return True
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(_.get_string('xdv_conversion_error', filename=xdv_path, error=str(e)))
+            return False
+        finally:
+            os.remove(xdv_path)
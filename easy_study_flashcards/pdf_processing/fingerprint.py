@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import pathlib
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, Optional
+
+from pypdf import PageObject, PdfReader
+from pypdf.generic import DictionaryObject
+
+MANIFEST_FILE_NAME: str = "manifest.json"
+MANIFEST_VERSION: int = 1
+
+
+def page_fingerprint(page: PageObject) -> str:
+    """
+    Hash of what a page draws: its decoded content stream and the data of the
+    images and forms it places. Unlike the file bytes, it doesn't change when
+    the PDF is saved again, compressed differently or its metadata is edited.
+    """
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+
+    # A replaced figure keeps the content stream that places it
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources is not None else None
+    if isinstance(xobjects, DictionaryObject):
+        for name in sorted(xobjects):
+            xobject = xobjects[name].get_object()
+            digest.update(name.encode("utf-8"))
+            try:
+                digest.update(xobject.get_data())
+            except Exception:
+                digest.update(repr(sorted(xobject.keys())).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def pages_fingerprint(reader: PdfReader, page_indices: Iterable[int]) -> str:
+    digest = hashlib.sha256()
+    for page_index in page_indices:
+        digest.update(page_fingerprint(reader.pages[page_index]).encode("ascii"))
+    return digest.hexdigest()
+
+
+def pdf_fingerprint(pdf_path: str | pathlib.Path) -> str:
+    reader: PdfReader = PdfReader(pdf_path)
+    return pages_fingerprint(reader, range(len(reader.pages)))
+
+
+@dataclass
+class BookManifest:
+    """
+    What a previous run produced from a book, kept in its chapter folder:
+    the structure detected from the first pages, and for every chapter file
+    the fingerprint of the content its results were generated from.
+    scan_pages is the window the last adaptive detection ended with.
+    """
+
+    total_pages: Optional[int] = None
+    detection_fingerprint: Optional[str] = None
+    structure: Optional[dict] = None  # BookStructure, after the offset verification
+    chapters: Dict[str, str] = field(default_factory=dict)
+    scan_pages: Optional[int] = None
+    version: int = MANIFEST_VERSION
+
+    @staticmethod
+    def path_in(chapter_folder: str) -> str:
+        return os.path.join(chapter_folder, MANIFEST_FILE_NAME)
+
+    @classmethod
+    def load(cls, chapter_folder: str) -> "BookManifest":
+        """The manifest of the folder, an empty one if it is missing, unreadable or of another version."""
+        try:
+            with open(cls.path_in(chapter_folder), "r", encoding="utf-8") as manifest_file:
+                data: dict = json.load(manifest_file)
+            if data.get("version") == MANIFEST_VERSION:
+                return cls(**data)
+        except (OSError, ValueError, TypeError):
+            pass
+        return cls()
+
+    def save(self, chapter_folder: str) -> None:
+        os.makedirs(chapter_folder, exist_ok=True)
+        path: str = self.path_in(chapter_folder)
+        # Written aside and moved, so a crash never leaves half a manifest
+        with open(path + ".tmp", "w", encoding="utf-8") as manifest_file:
+            json.dump(asdict(self), manifest_file, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def reusable_structure(self, total_pages: int, detection_fingerprint: str) -> Optional[dict]:
+        """The stored structure, if the pages it was detected from didn't change."""
+        if self.total_pages == total_pages and self.detection_fingerprint == detection_fingerprint:
+            return self.structure
+        return None
+
+    def is_up_to_date(self, chapter_file: str, fingerprint: str) -> bool:
+        return self.chapters.get(chapter_file) == fingerprint
@@ -0,0 +1,185 @@
+import re
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, List, Optional, Set
+
+from pypdf import PdfReader
+
+from easy_study_flashcards.gemini.models import ChapterInfo
+from easy_study_flashcards.pdf_processing.toc_locator import is_toc_page
+
+# Pages searched on each side of the predicted start of a chapter
+SEARCH_RADIUS: int = 6
+# Characters of normalized text kept per page: chapter headings are at the top
+PAGE_HEAD_CHARS: int = 400
+# Fraction of the words of a title that must appear in the head of a page
+MIN_TITLE_MATCH: float = 0.8
+# Words at the top of a page where a heading or a running header is
+HEADING_WORDS: int = 8
+# Shorter titles ("Groups", "Sets") are common words: they only match as a heading
+MIN_WORDS_ANYWHERE: int = 2
+# Below this fraction of matched chapters the detected structure is not trusted
+MIN_MATCHED_RATIO: float = 0.5
+# A wrong offset shifts every chapter by the same amount, give or take a blank page
+MAX_SHIFT_SPREAD: int = 2
+
+NON_WORD_PATTERN = re.compile(r"[^\w]+")
+# "Chapter 3", "Capitolo 3", bare numbers: the same for every chapter, or just the numbering
+TITLE_NOISE_WORDS: Set[str] = {"chapter", "capitolo", "unit", "unità", "lesson", "lezione", "part", "parte"}
+
+
+class OffsetCheck(Enum):
+    VERIFIED = "verified"  # The title is on the predicted page
+    CORRECTED = "corrected"  # The title is on a nearby page, start_page was moved there
+    UNMATCHED = "unmatched"  # The title isn't near the predicted page
+    NO_TEXT = "no_text"  # No text layer around the predicted page, nothing to check
+
+
+@dataclass
+class ChapterOffsetResult:
+    chapter: ChapterInfo
+    check: OffsetCheck
+    predicted_page: int  # 0-based physical page
+    shift: int = 0
+
+
+@dataclass
+class OffsetReport:
+    chapters: List[ChapterInfo] = field(default_factory=list)
+    results: List[ChapterOffsetResult] = field(default_factory=list)
+
+    def count(self, check: OffsetCheck) -> int:
+        return sum(result.check == check for result in self.results)
+
+    @property
+    def reliable(self) -> bool:
+        """
+        False when most of the chapters that could be checked weren't found
+        near their predicted page, or when the shifts of the ones found don't
+        agree with each other. Books without a text layer are trusted.
+        """
+        checked: int = len(self.results) - self.count(OffsetCheck.NO_TEXT)
+        if checked == 0:
+            return True
+        shifts: List[int] = [
+            result.shift
+            for result in self.results
+            if result.check in (OffsetCheck.VERIFIED, OffsetCheck.CORRECTED)
+        ]
+        if len(shifts) / checked < MIN_MATCHED_RATIO:
+            return False
+        return max(shifts) - min(shifts) <= MAX_SHIFT_SPREAD
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(NON_WORD_PATTERN.sub(" ", text.lower()).split())
+
+
+def title_words(title: str) -> List[str]:
+    return [
+        word
+        for word in normalize_text(title).split()
+        if word not in TITLE_NOISE_WORDS and not word.isdigit()
+    ]
+
+
+class PageTextIndex:
+    """
+    The normalized head of the pages of a book, extracted only for the
+    pages that are looked up and kept for the following lookups.
+    Table of contents pages have an empty head: they list every title.
+    """
+
+    def __init__(self, reader: PdfReader, head_chars: int = PAGE_HEAD_CHARS):
+        self.reader: PdfReader = reader
+        self.head_chars: int = head_chars
+        self._heads: Dict[int, str] = {}
+        self.has_text: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.reader.pages)
+
+    def head(self, page_index: int) -> str:
+        if page_index not in self._heads:
+            try:
+                text: str = self.reader.pages[page_index].extract_text() or ""
+            except Exception:
+                text = ""
+            if text.strip():
+                self.has_text.add(page_index)
+            self._heads[page_index] = "" if is_toc_page(text) else normalize_text(text)[: self.head_chars]
+        return self._heads[page_index]
+
+    def matches(self, words: List[str], page_index: int) -> bool:
+        if len(words) < MIN_WORDS_ANYWHERE:
+            return self.matches_heading(words, page_index)
+        return 0 <= page_index < len(self) and title_match_score(words, self.head(page_index)) >= MIN_TITLE_MATCH
+
+    def matches_heading(self, words: List[str], page_index: int) -> bool:
+        """Whether the title is among the first words of the page, as a heading or a running header."""
+        if not 0 <= page_index < len(self):
+            return False
+        heading: str = " ".join(self.head(page_index).split()[:HEADING_WORDS])
+        return title_match_score(words, heading) >= MIN_TITLE_MATCH
+
+
+def title_match_score(words: List[str], page_head: str) -> float:
+    """Fraction of the words of a title that appear in the head of a page."""
+    if not words:
+        return 0.0
+    head_words: Set[str] = set(page_head.split())
+    return sum(word in head_words for word in words) / len(words)
+
+
+def verify_chapter_offsets(
+    index: PageTextIndex,
+    chapters: List[ChapterInfo],
+    first_numbered_page_in_doc: int,
+    search_radius: int = SEARCH_RADIUS,
+) -> OffsetReport:
+    """
+    Looks for the title of every chapter around the physical page the detected
+    structure predicts for it. Running headers repeat the title at the top of
+    the pages of the chapter, so the pages headed by it form runs: the chapter
+    starts at the beginning of the run nearest to the prediction, and
+    start_page is moved there. Mentions of the title in the text of the
+    pages before don't extend the run, and titles of a single word only
+    match as headings. Returns the corrected chapters and the outcome
+    for each one.
+    """
+    offset: int = first_numbered_page_in_doc - 1
+    report: OffsetReport = OffsetReport()
+
+    for chapter in sorted(chapters, key=lambda chap: chap.start_page):
+        predicted: int = offset + chapter.start_page - 1
+        words: List[str] = title_words(chapter.title)
+        window: range = range(max(0, predicted - search_radius), min(len(index), predicted + search_radius + 1))
+
+        matching: List[int] = [page for page in window if index.matches(words, page)]
+        if not words or not any(page in index.has_text for page in window):
+            report.results.append(ChapterOffsetResult(chapter, OffsetCheck.NO_TEXT, predicted))
+            report.chapters.append(chapter)
+            continue
+
+        matching_page: Optional[int] = None
+        if matching:
+            nearest: int = min(matching, key=lambda page: abs(page - predicted))
+            # Back to the first page of its run, even outside the window. Only pages headed
+            # by the title extend the run: mentions of it in the text don't move the chapter
+            matching_page = nearest
+            while nearest - matching_page < 2 * search_radius and index.matches_heading(words, matching_page - 1):
+                matching_page -= 1
+
+        if matching_page is None:
+            report.results.append(ChapterOffsetResult(chapter, OffsetCheck.UNMATCHED, predicted))
+            report.chapters.append(chapter)
+        elif matching_page == predicted:
+            report.results.append(ChapterOffsetResult(chapter, OffsetCheck.VERIFIED, predicted))
+            report.chapters.append(chapter)
+        else:
+            shift: int = matching_page - predicted
+            corrected: ChapterInfo = chapter.model_copy(update={"start_page": chapter.start_page + shift})
+            report.results.append(ChapterOffsetResult(corrected, OffsetCheck.CORRECTED, predicted, shift))
+            report.chapters.append(corrected)
+
+    return report
@@ -0,0 +1,199 @@
+import re
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import List, Set, Tuple
+
+from pypdf import PageObject, PdfReader
+from loguru import logger
+
+from easy_study_flashcards.utils.localization import localizer as _
+
+
+class PageKind(Enum):
+    """What a page of a chapter contains, as far as flashcards are concerned."""
+
+    CONTENT = "content"
+    BLANK = "blank"
+    FIGURE = "figure"  # Full-page figures, plates, photos
+    BIBLIOGRAPHY = "bibliography"
+    INDEX = "index"
+
+
+BIBLIOGRAPHY_HEADINGS: Tuple[str, ...] = (
+    "references",
+    "bibliography",
+    "further reading",
+    "bibliografia",
+    "riferimenti bibliografici",
+)
+INDEX_HEADINGS: Tuple[str, ...] = ("index", "subject index", "indice analitico")
+
+# "Equivalence relation, 4" / "Free basis, 72, 78, 79-83"
+INDEX_LINE_PATTERN: re.Pattern = re.compile(r"^\D.{0,80}?,\s*\d+(\s*[,–-]\s*\d+)*\.?$")
+# "[12] A. Author, Title, Publisher, 1998." / "Lang, S. (2002). Algebra"
+# An unnumbered line needs both an initial and a year where a citation puts it,
+# exercises and tables full of numbers like 1998 are content
+CITATION_LINE_PATTERN: re.Pattern = re.compile(
+    r"^\[\d+\]"
+    r"|^(?=.*\b[A-Z]\.[\s,])(?=.*(?:,\s*(?:1[89]|20)\d\d[a-z]?\.?\s*$|\((?:1[89]|20)\d\d[a-z]?\)))"
+)
+
+
+@dataclass
+class PageFilterPolicy:
+    """
+    Decides which pages are dropped before a chapter is sent to Gemini.
+    Every threshold can be tuned; kinds not listed in drop_kinds are always kept.
+    """
+
+    drop_kinds: Set[PageKind] = field(
+        default_factory=lambda: {
+            PageKind.BLANK,
+            PageKind.FIGURE,
+            PageKind.BIBLIOGRAPHY,
+            PageKind.INDEX,
+        }
+    )
+    # Pages with less text than this (and no images) are blank
+    blank_max_chars: int = 40
+    # Pages mostly covered by images and with little text are figures
+    figure_min_image_coverage: float = 0.5
+    figure_max_chars: int = 400
+    # Share of non-empty lines that must look like index entries / citations
+    index_min_line_ratio: float = 0.6
+    bibliography_min_line_ratio: float = 0.5
+    min_lines_for_ratio: int = 8
+
+
+@dataclass
+class PageClassification:
+    page_index: int
+    kind: PageKind
+    text_chars: int
+    image_coverage: float
+
+
+def _heading_of(lines: List[str]) -> str:
+    """The first line that is not a bare page number or running header number."""
+    for line in lines[:3]:
+        candidate = re.sub(r"^\d+\s+|\s+\d+$", "", line).strip().lower()
+        if candidate:
+            return candidate
+    return ""
+
+
+def classify_page_features(
+    text: str, image_coverage: float, policy: PageFilterPolicy
+) -> PageKind:
+    """Classifies a page from its extracted text and the share of its area covered by images."""
+    lines: List[str] = [line.strip() for line in text.splitlines() if line.strip()]
+    text_chars: int = sum(len(line) for line in lines)
+
+    if text_chars <= policy.blank_max_chars and image_coverage == 0:
+        return PageKind.BLANK
+
+    if (
+        image_coverage >= policy.figure_min_image_coverage
+        and text_chars <= policy.figure_max_chars
+    ):
+        return PageKind.FIGURE
+
+    heading: str = _heading_of(lines)
+    if heading in INDEX_HEADINGS:
+        return PageKind.INDEX
+    if heading in BIBLIOGRAPHY_HEADINGS:
+        return PageKind.BIBLIOGRAPHY
+
+    if len(lines) >= policy.min_lines_for_ratio:
+        # Citations often end with ", <year>." and would look like index entries
+        citation_lines: int = sum(1 for line in lines if CITATION_LINE_PATTERN.search(line))
+        if citation_lines / len(lines) >= policy.bibliography_min_line_ratio:
+            return PageKind.BIBLIOGRAPHY
+
+        index_lines: int = sum(1 for line in lines if INDEX_LINE_PATTERN.match(line))
+        if index_lines / len(lines) >= policy.index_min_line_ratio:
+            return PageKind.INDEX
+
+    return PageKind.CONTENT
+
+
+def _extract_text_and_image_coverage(page: PageObject) -> Tuple[str, float]:
+    """
+    Extracts the text of a page and, in the same pass over the content stream,
+    measures the area painted by image XObjects (the unit square mapped by the CTM).
+    """
+    page_area: float = abs(float(page.mediabox.width) * float(page.mediabox.height))
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    xobjects = xobjects.get_object() if xobjects else {}
+    image_area: float = 0.0
+
+    def visitor(operator, operands, cm, tm) -> None:
+        nonlocal image_area
+        if operator != b"Do" or not operands:
+            return
+        xobject = xobjects.get(operands[0])
+        if xobject is None or xobject.get_object().get("/Subtype") != "/Image":
+            return
+        image_area += abs(cm[0] * cm[3] - cm[1] * cm[2])
+
+    try:
+        text: str = page.extract_text(visitor_operand_before=visitor) or ""
+    except Exception:
+        text = ""
+
+    if page_area == 0:
+        return text, 0.0
+    return text, min(image_area / page_area, 1.0)
+
+
+def classify_page(page: PageObject, page_index: int, policy: PageFilterPolicy) -> PageClassification:
+    text, image_coverage = _extract_text_and_image_coverage(page)
+    return PageClassification(
+        page_index=page_index,
+        kind=classify_page_features(text, image_coverage, policy),
+        text_chars=len("".join(text.split())),
+        image_coverage=image_coverage,
+    )
+
+
+def filter_pages(
+    reader: PdfReader,
+    page_indices: List[int],
+    policy: PageFilterPolicy,
+    filename: str,
+) -> List[int]:
+    """
+    Returns the pages of page_indices that must be sent to Gemini according
+    to the policy, logging every dropped page and the reason.
+    """
+    kept: List[int] = []
+    dropped: List[PageClassification] = []
+
+    for page_index in page_indices:
+        classification = classify_page(reader.pages[page_index], page_index, policy)
+        if classification.kind in policy.drop_kinds:
+            dropped.append(classification)
+        else:
+            kept.append(page_index)
+
+    for classification in dropped:
+        logger.info(
+            _.get_string(
+                "page_dropped",
+                filename=filename,
+                page=classification.page_index + 1,
+                kind=classification.kind.value,
+            )
+        )
+    if dropped:
+        logger.info(
+            _.get_string(
+                "pages_dropped_summary",
+                filename=filename,
+                dropped=len(dropped),
+                total=len(page_indices),
+            )
+        )
+
+    return kept
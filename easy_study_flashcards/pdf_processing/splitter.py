@@ -1,26 +1,91 @@
 import os
 import pathlib
-from pypdf import PdfReader, PdfWriter
-from typing import List
+import re
+from pypdf import PageObject, PdfReader, PdfWriter
+from pypdf.generic import DictionaryObject, NameObject
+from typing import List, Set, Tuple
 from easy_study_flashcards.gemini.models import ChapterInfo
 from easy_study_flashcards.utils.colors import Colors
 from easy_study_flashcards.utils.localization import localizer as _
 from loguru import logger
 
 
+# Resource categories whose entries are used by name in the content stream
+NAMED_RESOURCE_CATEGORIES: List[str] = [
+    "/Font", "/XObject", "/ExtGState", "/ColorSpace", "/Pattern", "/Shading", "/Properties",
+]
+CONTENT_NAME_PATTERN = re.compile(rb"/([^\s/\[\]()<>{}%]+)")
+# "/F#31" in a content stream is the resource "/F1"
+NAME_ESCAPE_PATTERN = re.compile(rb"#([0-9A-Fa-f]{2})")
+
+
+def _used_resource_names(contents: bytes) -> Set[str]:
+    """
+    The names used in a content stream, with their #xx escapes decoded. Both
+    decodings pypdf may have used for the resource keys are kept: an extra
+    entry only keeps a resource, a missing one would break the page.
+    """
+    names: Set[str] = set()
+    for raw_name in CONTENT_NAME_PATTERN.findall(contents):
+        name: bytes = NAME_ESCAPE_PATTERN.sub(lambda match: bytes([int(match.group(1), 16)]), raw_name)
+        names.add(name.decode("utf-8", errors="replace"))
+        names.add(name.decode("latin-1"))
+    return names
+
+
+def with_used_resources(page: PageObject) -> Tuple[PageObject, int]:
+    """
+    Returns a copy of a page whose resources only list the fonts, images and
+    other named resources its content stream uses, and the number of entries
+    left out. Books often share one resource dictionary between all pages:
+    without this every chapter file gets every image and font of the book.
+    The page of the reader isn't changed.
+    """
+    resources = page.get("/Resources")
+    if resources is None:
+        return page, 0
+    resources = resources.get_object()
+
+    contents = page.get_contents()
+    used_names: Set[str] = _used_resource_names(contents.get_data()) if contents is not None else set()
+
+    pruned: DictionaryObject = DictionaryObject()
+    removed: int = 0
+    for key, value in resources.items():
+        if key not in NAMED_RESOURCE_CATEGORIES:
+            pruned[NameObject(key)] = value
+            continue
+        category = value.get_object()
+        kept: DictionaryObject = DictionaryObject(
+            {NameObject(name): entry for name, entry in category.items() if name[1:] in used_names}
+        )
+        removed += len(category) - len(kept)
+        if kept:
+            pruned[NameObject(key)] = kept
+
+    pruned_page: PageObject = PageObject(pdf=page.pdf)
+    pruned_page.update(page)
+    pruned_page[NameObject("/Resources")] = pruned
+    return pruned_page, removed
+
+
 def split_pdf_by_chapters(
     pdf_path: pathlib.Path,
     chapters: List[ChapterInfo],
     first_numbered_page_in_doc: int,  # This is the physical page number (1-based) where logical page 1 starts
     output_folder: str,
-) -> None:
+    prune_resources: bool = False,
+) -> List[str]:
     """
     Splits a PDF file into multiple files, one for each chapter, based on
     logical page numbers and the physical offset of the first numbered page.
+    With prune_resources, every page keeps only the resources it references
+    and identical objects are stored once in each chapter file.
+    Returns the names of the chapter files written.
     """
     if not chapters:
         logger.warning(_.get_string('no_chapters'))
-        return
+        return []
 
     reader: PdfReader = PdfReader(pdf_path)
     total_pages: int = len(reader.pages)
@@ -38,6 +103,7 @@ def split_pdf_by_chapters(
 
     # Create the output folder if it doesn't exist
     os.makedirs(output_folder, exist_ok=True)
+    written_files: List[str] = []
 
     logger.info(
         _.get_string('splitting_pdf', filename=pdf_path.name)
@@ -84,7 +150,11 @@ def split_pdf_by_chapters(
         # Add pages to the writer
         for page_num in range(start_physical_page_index, end_physical_page_index):
             if page_num < total_pages:  # Ensure the page exists
-                writer.add_page(reader.pages[page_num])
+                page: PageObject = reader.pages[page_num]
+                if prune_resources:
+                    # Pruned before the copy to the writer, so unused resources are never copied
+                    page, _removed = with_used_resources(page)
+                writer.add_page(page)
             else:
                 break  # No more pages to add
 
@@ -100,8 +170,12 @@ def split_pdf_by_chapters(
             output_filename: str = f"Chapter_{i+1}-{safe_chapter_name}.pdf"
             output_filepath: str = os.path.join(output_folder, output_filename)
 
+            if prune_resources:
+                writer.compress_identical_objects()
+
             with open(output_filepath, "wb") as output_pdf:
                 writer.write(output_pdf)
+            written_files.append(output_filename)
             logger.success(
                 _.get_string(
                     'chapter_saved',
@@ -114,3 +188,5 @@ def split_pdf_by_chapters(
             logger.warning(
                 _.get_string('no_pages_in_chapter', title=chapter_info.title)
             )
+
+    return written_files
@@ -0,0 +1,158 @@
+import pathlib
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import List, Optional
+
+from pypdf import PdfReader
+from loguru import logger
+
+from easy_study_flashcards.pdf_processing.core import PDFProcessor
+from easy_study_flashcards.utils.localization import localizer as _
+
+# Gemini bills every page of an attached PDF as a fixed amount of input tokens,
+# regardless of how much text it contains.
+PDF_PAGE_TOKEN_COST: int = 258
+# Rough average for Latin-script text, good enough for estimates.
+CHARS_PER_TOKEN: int = 4
+# Pages with fewer meaningful characters than this are sent as PDF.
+MIN_USABLE_CHARS_PER_PAGE: int = 200
+
+
+class InputMode(Enum):
+    """How a document is handed to the Gemini models."""
+
+    PDF = "pdf"  # The pages are attached as a PDF part
+    TEXT_LAYER = "text_layer"  # The local text layer is sent, PDF only as fallback
+
+
+@dataclass
+class TextLayerPayload:
+    """
+    The content of a page range, ready to be sent to Gemini.
+    Each segment is either a string (extracted text of consecutive pages)
+    or bytes (a PDF with consecutive pages that have no usable text).
+    """
+
+    segments: List[str | bytes] = field(default_factory=list)
+    text_pages: int = 0
+    pdf_pages: int = 0
+    estimated_tokens: int = 0
+
+    @property
+    def total_pages(self) -> int:
+        return self.text_pages + self.pdf_pages
+
+    @property
+    def estimated_pdf_tokens(self) -> int:
+        """Tokens the same pages would cost if sent entirely as PDF."""
+        return self.total_pages * PDF_PAGE_TOKEN_COST
+
+    @property
+    def estimated_saved_tokens(self) -> int:
+        return self.estimated_pdf_tokens - self.estimated_tokens
+
+
+def estimate_text_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def has_usable_text(text: str, min_chars: int = MIN_USABLE_CHARS_PER_PAGE) -> bool:
+    """
+    Tells whether the extracted text of a page can replace the page itself.
+    Scanned pages have no text layer at all, while pages with broken font
+    encodings produce mostly non printable characters.
+    """
+    stripped: str = "".join(text.split())
+    if len(stripped) < min_chars:
+        return False
+
+    readable: int = sum(1 for c in stripped if c.isprintable() and c != "�")
+    return readable / len(stripped) >= 0.9
+
+
+def build_text_layer_payload(
+    pdf_path: pathlib.Path,
+    start_page_index: int = 0,
+    end_page_index: Optional[int] = None,
+    min_chars: int = MIN_USABLE_CHARS_PER_PAGE,
+) -> Optional[TextLayerPayload]:
+    """
+    Extracts the text layer of the pages in [start_page_index, end_page_index)
+    and groups consecutive pages by kind: text for born-digital pages, PDF bytes
+    for pages without usable text (e.g. scanned pages).
+    """
+    try:
+        reader: PdfReader = PdfReader(pdf_path)
+    except Exception as e:
+        logger.error(_.get_string("pdf_pages_extraction_error", error=str(e)))
+        return None
+
+    total_pdf_pages: int = len(reader.pages)
+    if end_page_index is None or end_page_index > total_pdf_pages:
+        end_page_index = total_pdf_pages
+
+    if start_page_index < 0 or start_page_index >= end_page_index:
+        logger.error(
+            _.get_string(
+                "pdf_invalid_page_indices",
+                start=start_page_index,
+                end=end_page_index,
+                total=total_pdf_pages,
+            )
+        )
+        return None
+
+    return build_text_layer_payload_from_reader(
+        reader, list(range(start_page_index, end_page_index)), min_chars
+    )
+
+
+def build_text_layer_payload_from_reader(
+    reader: PdfReader,
+    page_indices: List[int],
+    min_chars: int = MIN_USABLE_CHARS_PER_PAGE,
+    relative_page_markers: bool = False,
+) -> TextLayerPayload:
+    """
+    Same as build_text_layer_payload, for an already opened reader and an
+    explicit list of pages. Page markers keep the physical (1-based) numbering,
+    or count the pages of the list with relative_page_markers.
+    """
+    payload: TextLayerPayload = TextLayerPayload()
+    text_run: List[str] = []
+    pdf_run: List[int] = []
+
+    def flush_text_run() -> None:
+        if text_run:
+            segment: str = "\n\n".join(text_run)
+            payload.segments.append(segment)
+            payload.estimated_tokens += estimate_text_tokens(segment)
+            text_run.clear()
+
+    def flush_pdf_run() -> None:
+        if pdf_run:
+            pdf_bytes = PDFProcessor.extract_pdf_page_list_to_bytes(reader, pdf_run)
+            if pdf_bytes is not None:
+                payload.segments.append(pdf_bytes.getvalue())
+                payload.estimated_tokens += len(pdf_run) * PDF_PAGE_TOKEN_COST
+            pdf_run.clear()
+
+    for position, page_index in enumerate(page_indices):
+        try:
+            text: str = reader.pages[page_index].extract_text() or ""
+        except Exception:
+            text = ""
+
+        if has_usable_text(text, min_chars):
+            flush_pdf_run()
+            page_number: int = position + 1 if relative_page_markers else page_index + 1
+            text_run.append(f"--- Page {page_number} ---\n{text.strip()}")
+            payload.text_pages += 1
+        else:
+            flush_text_run()
+            pdf_run.append(page_index)
+            payload.pdf_pages += 1
+
+    flush_text_run()
+    flush_pdf_run()
+    return payload
@@ -0,0 +1,113 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from pypdf import PdfReader
+
+# Pages scanned when looking for the table of contents
+DEFAULT_SCAN_PAGES: int = 40
+# Pages sent around the probable start of the first chapter
+PAGES_BEFORE_FIRST_CHAPTER: int = 2
+PAGES_AFTER_FIRST_CHAPTER: int = 3
+# A page is part of the table of contents when enough of its lines are entries
+MIN_TOC_ENTRIES: int = 4
+MIN_TOC_ENTRY_RATIO: float = 0.35
+
+TOC_HEADING_PATTERN = re.compile(
+    r"^\s*(?:table of contents|contents|outline|indice(?: generale)?|sommario)\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# "Groups, cosets .......... 21", "Sets, Cartesian products 1", "Preface xi"
+TOC_ENTRY_PATTERN = re.compile(
+    r"^\s*\S.*?[\s.…]+(?:\d{1,4}|[ivxlcdm]{1,7})\s*$", re.IGNORECASE | re.MULTILINE
+)
+DOT_LEADER_PATTERN = re.compile(r"(?:\.\s?){4,}|…{2,}")
+CHAPTER_ONE_PATTERN = re.compile(
+    r"^\s*(?:chapter|capitolo|unit|unità|lesson|lezione|part|parte)\s+(?:1|one|uno|i)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class TocLocation:
+    """Pages (0-based) of the table of contents and of the probable first chapter."""
+
+    toc_pages: List[int] = field(default_factory=list)
+    first_chapter_page: Optional[int] = None
+
+    def pages_to_send(
+        self,
+        total_pages: int,
+        pages_before: int = PAGES_BEFORE_FIRST_CHAPTER,
+        pages_after: int = PAGES_AFTER_FIRST_CHAPTER,
+    ) -> List[int]:
+        """
+        The table of contents and a window around the first chapter.
+        Without a first chapter, the window starts right after the table of contents.
+        """
+        center: int = (
+            self.first_chapter_page
+            if self.first_chapter_page is not None
+            else self.toc_pages[-1] + 1 + pages_before
+        )
+        window: range = range(max(0, center - pages_before), min(total_pages, center + pages_after + 1))
+        return sorted(set(self.toc_pages) | set(window))
+
+
+def is_toc_page(text: str) -> bool:
+    lines: List[str] = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return False
+    entries: int = len(TOC_ENTRY_PATTERN.findall(text))
+    if TOC_HEADING_PATTERN.search(text) is not None or DOT_LEADER_PATTERN.search(text) is not None:
+        return entries >= MIN_TOC_ENTRIES // 2
+    return entries >= MIN_TOC_ENTRIES and entries / len(lines) >= MIN_TOC_ENTRY_RATIO
+
+
+def starts_first_chapter(text: str) -> bool:
+    """Whether one of the first lines of a page is a "Chapter 1" heading."""
+    first_lines: List[str] = [line for line in text.splitlines() if line.strip()][:3]
+    return any(CHAPTER_ONE_PATTERN.match(line) for line in first_lines)
+
+
+def locate_table_of_contents(
+    reader: PdfReader, max_pages: int = DEFAULT_SCAN_PAGES
+) -> Optional[TocLocation]:
+    """
+    Finds the table of contents in the text layer of the first pages of a book
+    (headings, dot leaders, lines ending with a page number), and the first page
+    after it that opens the first chapter. Returns None if there is no table of
+    contents, e.g. in scanned books without a text layer.
+    """
+    texts: List[str] = []
+    for page_index in range(min(max_pages, len(reader.pages))):
+        try:
+            texts.append(reader.pages[page_index].extract_text() or "")
+        except Exception:
+            texts.append("")
+
+    toc_start: Optional[int] = next(
+        (i for i, text in enumerate(texts) if is_toc_page(text)), None
+    )
+    if toc_start is None:
+        return None
+
+    toc_end: int = toc_start
+    while toc_end + 1 < len(texts) and is_toc_page(texts[toc_end + 1]):
+        toc_end += 1
+    location = TocLocation(toc_pages=list(range(toc_start, toc_end + 1)))
+
+    location.first_chapter_page = next(
+        (i for i in range(toc_end + 1, len(texts)) if starts_first_chapter(texts[i])), None
+    )
+    return location
+
+
+def map_sent_page_to_physical(position: int, sent_pages: List[int]) -> Optional[int]:
+    """
+    The physical page (1-based) of the book for a 1-based position in the
+    pages that were sent, or None if the position is outside them.
+    """
+    if not 1 <= position <= len(sent_pages):
+        return None
+    return sent_pages[position - 1] + 1
@@ -0,0 +1,420 @@
+import dataclasses
+import os
+import pathlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+from pypdf import PdfReader
+
+from easy_study_flashcards.cards.store import CardStore
+from easy_study_flashcards.gemini.chapter_scheduler import SchedulePolicy, natural_sort_key
+from easy_study_flashcards.gemini.client import (
+    GeminiClientManager,
+    get_chapters_from_gemini,
+    process_pdfs_with_gemini_sdk,
+)
+from easy_study_flashcards.gemini.client_pool import GeminiClientPool
+from easy_study_flashcards.gemini.hedging import HedgedClient
+from easy_study_flashcards.gemini.models import BookStructure, ChapterInfo
+from easy_study_flashcards.gemini.prompts import GenerationMode
+from easy_study_flashcards.gemini.routing import RoutingPolicy, Stage
+from easy_study_flashcards.gemini.scan_window import (
+    ADAPTIVE_MAX_PAGES,
+    ADAPTIVE_START_PAGES,
+    detect_with_adaptive_window,
+)
+from easy_study_flashcards.job_queue import ChapterQueueJob, JobQueue
+from easy_study_flashcards.pdf_processing.compaction import CompactionOptions
+from easy_study_flashcards.pdf_processing.fingerprint import BookManifest, pages_fingerprint, pdf_fingerprint
+from easy_study_flashcards.pdf_processing.offset_verifier import (
+    OffsetCheck,
+    OffsetReport,
+    PageTextIndex,
+    verify_chapter_offsets,
+)
+from easy_study_flashcards.pdf_processing.page_filter import PageFilterPolicy
+from easy_study_flashcards.pdf_processing.splitter import split_pdf_by_chapters
+from easy_study_flashcards.pdf_processing.text_layer import InputMode
+from easy_study_flashcards.pdf_processing.toc_locator import DEFAULT_SCAN_PAGES
+from easy_study_flashcards.utils.localization import localizer as _
+
+
+@dataclass
+class PipelineSettings:
+    """Everything that stays the same between the books of a run."""
+
+    subject_matter: str
+    lang: str
+    model_name_chapters: str = "gemini-2.0-flash"
+    model_name_generation: str = "gemini-2.5-flash"
+    # Cheaper model for integer lookups, small chapters and first corrections
+    light_model: Optional[str] = None
+    small_chapter_pages: int = 8
+    pages_to_analyze_for_chapters: int = 30
+    pages_to_analyze_for_first_chapter_physical_page: int = 40
+    # Start the detection from a small window, grown while the chapter list looks incomplete
+    adaptive_scan: bool = False
+    adaptive_scan_start_pages: int = ADAPTIVE_START_PAGES
+    adaptive_scan_max_pages: int = ADAPTIVE_MAX_PAGES
+    input_mode: InputMode = InputMode.PDF
+    locate_toc: bool = False
+    single_call_detection: bool = False
+    verify_offsets: bool = False
+    page_filter_policy: Optional[PageFilterPolicy] = None
+    compaction_options: Optional[CompactionOptions] = None
+    precompiled_preamble: bool = False
+    generation_mode: GenerationMode = GenerationMode.FULL_DOCUMENT
+    card_store_path: Optional[str] = None
+    deduplicate: bool = False
+    prune_split_resources: bool = False
+    schedule_policy: SchedulePolicy = SchedulePolicy.FILE_ORDER
+    chapter_priorities: Optional[List[str]] = None
+    # When set, books are only detected and split, their chapters go to this queue
+    job_queue_path: Optional[str] = None
+    # Reuse the structure and the flashcards of the chapters that didn't change
+    incremental: bool = False
+
+    def routing_policy(self) -> RoutingPolicy:
+        return RoutingPolicy.from_models(
+            self.model_name_chapters,
+            self.model_name_generation,
+            self.light_model,
+            small_chapter_pages=self.small_chapter_pages,
+        )
+
+
+def get_chapter_folder(pdf_path: pathlib.Path) -> str:
+    """The folder where the chapters of a book (and their results/) are written."""
+    return os.path.join(
+        os.path.dirname(pdf_path), f"{os.path.splitext(pdf_path.name)[0]}_chapters"
+    )
+
+
+def result_pdf_path(chapter_folder: str, chapter_file: str) -> str:
+    """The flashcards PDF of a chapter, as process_pdfs_with_gemini_sdk writes it."""
+    return os.path.join(chapter_folder, "results", f"{os.path.splitext(chapter_file)[0]}-domande.pdf")
+
+
+def remove_stale_chapter_files(
+    chapter_folder: str, chapter_files: List[str], manifest: Optional[BookManifest] = None
+) -> List[str]:
+    """
+    Deletes the chapter PDFs of an earlier split that the last split didn't
+    write, with their manifest entries: otherwise they would be taken for
+    chapters of the book and generated again. Returns the files removed.
+    """
+    kept: set[str] = set(chapter_files)
+    stale_files: List[str] = [
+        f for f in os.listdir(chapter_folder) if f.lower().endswith(".pdf") and f not in kept
+    ]
+    for chapter_file in stale_files:
+        os.remove(os.path.join(chapter_folder, chapter_file))
+        if manifest is not None:
+            manifest.chapters.pop(chapter_file, None)
+    return stale_files
+
+
+def detection_fingerprint(reader: PdfReader, settings: PipelineSettings) -> str:
+    """Fingerprint of the pages the chapter detection can look at."""
+    scanned_pages: int = max(
+        settings.pages_to_analyze_for_chapters,
+        settings.pages_to_analyze_for_first_chapter_physical_page,
+        DEFAULT_SCAN_PAGES if settings.locate_toc else 0,
+        settings.adaptive_scan_max_pages if settings.adaptive_scan else 0,
+    )
+    return pages_fingerprint(reader, range(min(len(reader.pages), scanned_pages)))
+
+
+def detect_book_structure(
+    pdf_path: pathlib.Path,
+    client: GeminiClientManager | GeminiClientPool | HedgedClient,
+    settings: PipelineSettings,
+) -> Tuple[Optional[BookStructure], int]:
+    """
+    Detects the chapters of a book and the physical page of the first one,
+    verifying their offsets against the text if asked to.
+    Returns None if the structure couldn't be detected or isn't reliable,
+    together with the number of first pages the detection looked at.
+    """
+    routing_policy: RoutingPolicy = settings.routing_policy()
+    total_pages: int = len(PdfReader(pdf_path).pages)
+
+    def detect(pages_to_process_chapters: int, pages_to_process_physical_page: int) -> Optional[BookStructure]:
+        return get_chapters_from_gemini(
+            pdf_path,
+            routing_policy.choose_model(Stage.CHAPTER_DETECTION),
+            # The single call answers the chapters too, it isn't just an integer lookup
+            routing_policy.stage_models[Stage.FIRST_CHAPTER_PAGE]
+            if settings.single_call_detection
+            else routing_policy.choose_model(Stage.FIRST_CHAPTER_PAGE),
+            client,
+            lang=settings.lang,
+            pages_to_process_chapters=pages_to_process_chapters,
+            pages_to_process_physical_page=pages_to_process_physical_page,
+            input_mode=settings.input_mode,
+            locate_toc=settings.locate_toc,
+            single_call=settings.single_call_detection,
+        )
+
+    book_structure: Optional[BookStructure]
+    scanned_pages: int
+    if settings.adaptive_scan:
+        # Both questions look at the same window, the first chapter must be inside it anyway
+        book_structure, scanned_pages = detect_with_adaptive_window(
+            lambda window: detect(window, window),
+            total_pages,
+            pdf_path.name,
+            settings.adaptive_scan_start_pages,
+            settings.adaptive_scan_max_pages,
+        )
+    else:
+        book_structure = detect(
+            settings.pages_to_analyze_for_chapters,
+            settings.pages_to_analyze_for_first_chapter_physical_page,
+        )
+        scanned_pages = min(
+            total_pages,
+            max(
+                settings.pages_to_analyze_for_chapters,
+                settings.pages_to_analyze_for_first_chapter_physical_page,
+            ),
+        )
+
+    if not book_structure:
+        logger.error(
+            _.get_string(
+                'chapter_info_error',
+                model=settings.model_name_chapters,
+                error='No structure returned'
+            )
+        )
+        return None, scanned_pages
+
+    chapters_info: List[ChapterInfo] = book_structure.chapters
+    first_numbered_page: int = book_structure.first_chapter_physical_page
+
+    logger.info(
+        _.get_string(
+            'chapter_start_index',
+            index=first_numbered_page
+        )
+    )
+
+    if settings.verify_offsets:
+        report: OffsetReport = verify_chapter_offsets(
+            PageTextIndex(PdfReader(pdf_path)), chapters_info, first_numbered_page
+        )
+        for result in report.results:
+            if result.check == OffsetCheck.CORRECTED:
+                logger.info(
+                    _.get_string(
+                        'chapter_offset_corrected',
+                        title=result.chapter.title,
+                        shift=f"{result.shift:+d}",
+                    )
+                )
+        logger.info(
+            _.get_string(
+                'offset_verification',
+                filename=pdf_path.name,
+                verified=report.count(OffsetCheck.VERIFIED),
+                corrected=report.count(OffsetCheck.CORRECTED),
+                unmatched=report.count(OffsetCheck.UNMATCHED),
+                unchecked=report.count(OffsetCheck.NO_TEXT),
+            )
+        )
+        if not report.reliable:
+            # Generating on shifted chapters would be paid for nothing
+            logger.error(_.get_string('offset_unreliable', filename=pdf_path.name))
+            return None, scanned_pages
+        chapters_info = report.chapters
+
+    return BookStructure(chapters=chapters_info, first_chapter_physical_page=first_numbered_page), scanned_pages
+
+
+def process_book(
+    pdf_path: pathlib.Path,
+    client: GeminiClientManager | GeminiClientPool | HedgedClient,
+    settings: PipelineSettings,
+) -> bool:
+    """
+    Runs the whole pipeline on a single book: chapter detection, split
+    and flashcard generation for every chapter.
+    With settings.incremental, the structure of the previous run is reused if the
+    first pages of the book didn't change, and only the chapters whose content
+    changed (or whose flashcards are missing) are generated again.
+    With settings.adaptive_scan, the pages the detection needed are recorded
+    in the manifest of the book.
+    Returns False if the structure of the book couldn't be detected.
+    """
+    output_chapter_folder: str = get_chapter_folder(pdf_path)
+    manifest: Optional[BookManifest] = (
+        BookManifest.load(output_chapter_folder) if settings.incremental else None
+    )
+
+    book_structure: Optional[BookStructure] = None
+    if manifest is not None:
+        reader: PdfReader = PdfReader(pdf_path)
+        current_detection_fingerprint: str = detection_fingerprint(reader, settings)
+        stored_structure: Optional[dict] = manifest.reusable_structure(
+            len(reader.pages), current_detection_fingerprint
+        )
+        if stored_structure is not None:
+            book_structure = BookStructure.model_validate(stored_structure)
+            logger.info(_.get_string('structure_reused', filename=pdf_path.name))
+    if book_structure is None:
+        scanned_pages: int
+        book_structure, scanned_pages = detect_book_structure(pdf_path, client, settings)
+        if settings.adaptive_scan:
+            # Kept with the book, for the plans of the next runs
+            scan_record: BookManifest = (
+                manifest if manifest is not None else BookManifest.load(output_chapter_folder)
+            )
+            scan_record.scan_pages = scanned_pages
+            scan_record.save(output_chapter_folder)
+        if book_structure is None:
+            return False
+        if manifest is not None:
+            manifest.total_pages = len(reader.pages)
+            manifest.detection_fingerprint = current_detection_fingerprint
+            manifest.structure = book_structure.model_dump()
+
+    written_files: List[str] = split_pdf_by_chapters(
+        pdf_path,
+        book_structure.chapters,
+        book_structure.first_chapter_physical_page,
+        output_chapter_folder,
+        prune_resources=settings.prune_split_resources,
+    )
+    stale_files: List[str] = remove_stale_chapter_files(output_chapter_folder, written_files, manifest)
+    if stale_files:
+        logger.info(_.get_string('stale_chapters_removed', count=len(stale_files), filename=pdf_path.name))
+    chapter_files: List[str] = sorted(written_files, key=natural_sort_key)
+
+    fingerprints: Dict[str, str] = {}
+    if manifest is not None:
+        fingerprints = {
+            chapter_file: pdf_fingerprint(os.path.join(output_chapter_folder, chapter_file))
+            for chapter_file in chapter_files
+        }
+        chapter_files = [
+            chapter_file
+            for chapter_file in chapter_files
+            if not manifest.is_up_to_date(chapter_file, fingerprints[chapter_file])
+            or not os.path.exists(result_pdf_path(output_chapter_folder, chapter_file))
+        ]
+        logger.info(
+            _.get_string(
+                'incremental_chapters',
+                filename=pdf_path.name,
+                changed=len(chapter_files),
+                reused=len(fingerprints) - len(chapter_files),
+            )
+        )
+        manifest.save(output_chapter_folder)
+        if not chapter_files:
+            return True
+
+    if settings.job_queue_path:
+        # The workers generate the chapters
+        with JobQueue(settings.job_queue_path) as job_queue:
+            queued: int = sum(
+                job_queue.enqueue(
+                    os.path.join(output_chapter_folder, chapter_file), pdf_path.stem, settings.subject_matter
+                )
+                for chapter_file in chapter_files
+            )
+        logger.info(_.get_string('queue_chapters_added', count=queued, filename=pdf_path.name))
+        return True
+
+    valid_chapters: List[str] = generate_chapters(
+        output_chapter_folder,
+        client,
+        settings,
+        pdf_path.stem,
+        chapter_files if manifest is not None else None,
+    )
+    if manifest is not None:
+        record_generated_chapters(output_chapter_folder, valid_chapters, fingerprints)
+    return True
+
+
+def record_generated_chapters(
+    chapter_folder: str, chapter_files: List[str], fingerprints: Optional[Dict[str, str]] = None
+) -> None:
+    """
+    Stores in the manifest the fingerprints the results of the chapters were
+    generated from. Workers of the job queue update it concurrently: a lost
+    update only means that a chapter is generated again by the next run.
+    """
+    if not chapter_files:
+        return
+    manifest: BookManifest = BookManifest.load(chapter_folder)
+    for chapter_file in chapter_files:
+        manifest.chapters[chapter_file] = (fingerprints or {}).get(chapter_file) or pdf_fingerprint(
+            os.path.join(chapter_folder, chapter_file)
+        )
+    manifest.save(chapter_folder)
+
+
+def generate_chapters(
+    chapter_folder: str,
+    client: GeminiClientManager | GeminiClientPool | HedgedClient,
+    settings: PipelineSettings,
+    book_name: str,
+    chapter_files: Optional[List[str]] = None,
+) -> List[str]:
+    """
+    Generates the flashcards of the chapters of a folder (only of chapter_files
+    if given). Returns the files of the chapters whose LaTeX is valid.
+    """
+    # Opened per call: in service and worker mode chapters are processed on other threads
+    card_store: Optional[CardStore] = (
+        CardStore(settings.card_store_path) if settings.card_store_path else None
+    )
+    try:
+        return process_pdfs_with_gemini_sdk(
+            chapter_folder,
+            settings.model_name_generation,
+            client,
+            lang=settings.lang,
+            subject_matter=settings.subject_matter,
+            input_mode=settings.input_mode,
+            page_filter_policy=settings.page_filter_policy,
+            compaction_options=settings.compaction_options,
+            precompiled_preamble=settings.precompiled_preamble,
+            generation_mode=settings.generation_mode,
+            card_store=card_store,
+            book_name=book_name,
+            deduplicate=settings.deduplicate,
+            routing_policy=settings.routing_policy(),
+            schedule_policy=settings.schedule_policy,
+            chapter_priorities=settings.chapter_priorities,
+            chapter_files=chapter_files,
+        )
+    finally:
+        if card_store is not None:
+            card_store.close()
+
+
+def process_queued_chapter(
+    job: ChapterQueueJob,
+    client: GeminiClientManager | GeminiClientPool | HedgedClient,
+    settings: PipelineSettings,
+) -> bool:
+    """Worker side of the job queue: generates and compiles a single chapter."""
+    if job.subject_matter:
+        settings = dataclasses.replace(settings, subject_matter=job.subject_matter)
+    chapter_folder: str = os.path.dirname(job.chapter_path)
+    valid_chapters: List[str] = generate_chapters(
+        chapter_folder,
+        client,
+        settings,
+        job.book,
+        chapter_files=[os.path.basename(job.chapter_path)],
+    )
+    # The book was queued by an incremental run
+    if os.path.exists(BookManifest.path_in(chapter_folder)):
+        record_generated_chapters(chapter_folder, valid_chapters)
+    return len(valid_chapters) == 1
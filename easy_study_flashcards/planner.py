@@ -0,0 +1,306 @@
+import math
+import os
+import pathlib
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Set, Tuple
+
+from loguru import logger
+from pypdf import PdfReader
+from stockholm import Money
+
+from easy_study_flashcards.gemini.chapter_scheduler import format_duration, natural_sort_key
+from easy_study_flashcards.gemini.prompts import PromptsForGemini
+from easy_study_flashcards.gemini.routing import ModelProfile, RoutingPolicy, Stage, UsageReport
+from easy_study_flashcards.pdf_processing.fingerprint import BookManifest
+from easy_study_flashcards.pdf_processing.page_filter import filter_pages
+from easy_study_flashcards.pdf_processing.text_layer import (
+    PDF_PAGE_TOKEN_COST,
+    InputMode,
+    estimate_text_tokens,
+    has_usable_text,
+)
+from easy_study_flashcards.pdf_processing.toc_locator import TocLocation, locate_table_of_contents
+from easy_study_flashcards.pipeline import PipelineSettings, get_chapter_folder
+from easy_study_flashcards.utils.localization import localizer as _
+
+# Rough averages of past runs, the estimates are only as good as these
+OUTPUT_TOKENS_PER_PAGE: int = 250
+DETECTION_OUTPUT_TOKENS: int = 1000
+CORRECTIONS_PER_CHAPTER: float = 0.5
+# Books that weren't split yet are assumed to have chapters of this many pages
+PAGES_PER_CHAPTER: int = 20
+# Used for models missing from the table
+DEFAULT_LATENCY_SECONDS: float = 30.0
+
+# Input tokens of a batch of PDF files for a model, None if they couldn't be counted
+TokenCounter = Callable[[List[pathlib.Path], str], Optional[int]]
+
+
+@dataclass
+class RequestEstimate:
+    model: str
+    requests: float
+    input_tokens: float
+    output_tokens: float
+
+
+@dataclass
+class ChapterEstimate:
+    name: str
+    pages: int
+    input_tokens: int  # Of the pages sent, without the prompt
+
+
+@dataclass
+class BookPlan:
+    book: str
+    pages: int
+    chapters: List[ChapterEstimate] = field(default_factory=list)
+    # False when the book wasn't split yet and the chapters are a guess
+    chapters_known: bool = False
+    # The chapter files, or the book itself when it wasn't split
+    source_files: List[pathlib.Path] = field(default_factory=list)
+    estimates: List[RequestEstimate] = field(default_factory=list)
+    cost: Money = field(default_factory=lambda: Money(0))
+    latency_seconds: float = 0.0
+
+    @property
+    def requests(self) -> float:
+        return sum(estimate.requests for estimate in self.estimates)
+
+    @property
+    def input_tokens(self) -> int:
+        return round(sum(estimate.input_tokens for estimate in self.estimates))
+
+    @property
+    def output_tokens(self) -> int:
+        return round(sum(estimate.output_tokens for estimate in self.estimates))
+
+
+def estimate_page_tokens(reader: PdfReader, page_indices: List[int], input_mode: InputMode) -> int:
+    """Input tokens of a list of pages, sent as PDF or as text layer with the PDF fallback."""
+    if input_mode == InputMode.PDF:
+        return len(page_indices) * PDF_PAGE_TOKEN_COST
+    tokens: int = 0
+    for page_index in page_indices:
+        try:
+            text: str = reader.pages[page_index].extract_text() or ""
+        except Exception:
+            text = ""
+        tokens += estimate_text_tokens(text) if has_usable_text(text) else PDF_PAGE_TOKEN_COST
+    return tokens
+
+
+def _detection_pages(reader: PdfReader, settings: PipelineSettings, pdf_path: pathlib.Path) -> List[List[int]]:
+    """
+    The pages sent by each chapter detection request, as get_chapters_from_gemini chooses them.
+    In adaptive mode, the window recorded by the previous run, else the first one tried.
+    """
+    total_pages: int = len(reader.pages)
+    chapters_pages: int = settings.pages_to_analyze_for_chapters
+    first_page_pages: int = settings.pages_to_analyze_for_first_chapter_physical_page
+    if settings.adaptive_scan:
+        recorded: Optional[int] = BookManifest.load(get_chapter_folder(pdf_path)).scan_pages
+        chapters_pages = first_page_pages = recorded or settings.adaptive_scan_start_pages
+    if settings.locate_toc:
+        location: Optional[TocLocation] = locate_table_of_contents(reader, max(chapters_pages, first_page_pages))
+        if location is not None:
+            located: List[int] = location.pages_to_send(total_pages)
+            return [located] if settings.single_call_detection else [located, located]
+    chapters_window: List[int] = list(range(min(chapters_pages, total_pages)))
+    first_page_window: List[int] = list(range(min(first_page_pages, total_pages)))
+    if settings.single_call_detection:
+        return [max(chapters_window, first_page_window, key=len)]
+    return [chapters_window, first_page_window]
+
+
+def _chapter_estimates(
+    pdf_path: pathlib.Path, reader: PdfReader, settings: PipelineSettings
+) -> Tuple[List[ChapterEstimate], List[pathlib.Path]]:
+    """
+    The chapters of the split of a previous run if there is one, otherwise
+    the pages of the book cut into chapters of PAGES_PER_CHAPTER pages.
+    """
+    chapter_folder: str = get_chapter_folder(pdf_path)
+    chapter_files: List[str] = (
+        sorted((f for f in os.listdir(chapter_folder) if f.lower().endswith(".pdf")), key=natural_sort_key)
+        if os.path.isdir(chapter_folder)
+        else []
+    )
+    chapters: List[ChapterEstimate] = []
+    for chapter_file in chapter_files:
+        chapter_reader: PdfReader = PdfReader(os.path.join(chapter_folder, chapter_file))
+        page_indices: List[int] = list(range(len(chapter_reader.pages)))
+        if settings.page_filter_policy is not None:
+            page_indices = filter_pages(chapter_reader, page_indices, settings.page_filter_policy, chapter_file)
+        chapters.append(
+            ChapterEstimate(
+                os.path.splitext(chapter_file)[0],
+                len(chapter_reader.pages),
+                estimate_page_tokens(chapter_reader, page_indices, settings.input_mode),
+            )
+        )
+    if chapters:
+        return chapters, [pathlib.Path(os.path.join(chapter_folder, f)) for f in chapter_files]
+
+    total_pages: int = len(reader.pages)
+    # Filtered like the chapters of a split book, and like the pages count_tokens is given
+    sent_pages: Set[int] = set(
+        filter_pages(reader, list(range(total_pages)), settings.page_filter_policy, pdf_path.name)
+        if settings.page_filter_policy is not None
+        else range(total_pages)
+    )
+    for start in range(0, total_pages, PAGES_PER_CHAPTER):
+        page_indices = list(range(start, min(start + PAGES_PER_CHAPTER, total_pages)))
+        chapters.append(
+            ChapterEstimate(
+                f"pages {start + 1}-{page_indices[-1] + 1}",
+                len(page_indices),
+                estimate_page_tokens(
+                    reader, [page for page in page_indices if page in sent_pages], settings.input_mode
+                ),
+            )
+        )
+    return chapters, [pdf_path]
+
+
+def plan_book(
+    pdf_path: pathlib.Path,
+    settings: PipelineSettings,
+    usage: Optional[UsageReport] = None,
+    count_tokens: Optional[TokenCounter] = None,
+) -> BookPlan:
+    """
+    Estimates the requests, tokens, cost and latency of running the pipeline
+    on a book, without sending anything to generate. With count_tokens, the
+    files of the book are counted in one batch and the local estimates of the
+    chapters are scaled to match the count.
+    """
+    usage = usage if usage is not None else UsageReport()
+    reader: PdfReader = PdfReader(pdf_path)
+    chapters, source_files = _chapter_estimates(pdf_path, reader, settings)
+    plan: BookPlan = BookPlan(
+        pdf_path.name, len(reader.pages), chapters, source_files != [pdf_path], source_files
+    )
+    routing_policy: RoutingPolicy = settings.routing_policy()
+
+    if count_tokens is not None:
+        counted: Optional[int] = count_tokens(
+            source_files, routing_policy.stage_models[Stage.GENERATION]
+        )
+        local: int = sum(chapter.input_tokens for chapter in chapters)
+        if counted and local:
+            for chapter in chapters:
+                chapter.input_tokens = round(chapter.input_tokens * counted / local)
+
+    detection_models: List[str] = (
+        [routing_policy.stage_models[Stage.FIRST_CHAPTER_PAGE]]
+        if settings.single_call_detection
+        else [
+            routing_policy.choose_model(Stage.CHAPTER_DETECTION),
+            routing_policy.choose_model(Stage.FIRST_CHAPTER_PAGE),
+        ]
+    )
+    for detection_model, pages in zip(detection_models, _detection_pages(reader, settings, pdf_path)):
+        plan.estimates.append(
+            RequestEstimate(
+                detection_model,
+                1,
+                estimate_page_tokens(reader, pages, settings.input_mode),
+                DETECTION_OUTPUT_TOKENS,
+            )
+        )
+
+    prompt_tokens: int = estimate_text_tokens(
+        PromptsForGemini.get_prompt_to_elaborate_single_pdf(
+            settings.lang, settings.subject_matter, settings.generation_mode
+        )
+    )
+    for chapter in chapters:
+        output_tokens: int = chapter.pages * OUTPUT_TOKENS_PER_PAGE
+        plan.estimates.append(
+            RequestEstimate(
+                routing_policy.choose_model(Stage.GENERATION, pages=chapter.pages, tokens=chapter.input_tokens),
+                1,
+                chapter.input_tokens + prompt_tokens,
+                output_tokens,
+            )
+        )
+        # A correction sends the chapter and the previous output back
+        plan.estimates.append(
+            RequestEstimate(
+                routing_policy.choose_model(Stage.CORRECTION, pages=chapter.pages, retry=1),
+                CORRECTIONS_PER_CHAPTER,
+                CORRECTIONS_PER_CHAPTER * (chapter.input_tokens + output_tokens),
+                CORRECTIONS_PER_CHAPTER * output_tokens,
+            )
+        )
+
+    for estimate in plan.estimates:
+        cost: Optional[Money] = usage.cost_of(
+            estimate.model, round(estimate.input_tokens), round(estimate.output_tokens)
+        )
+        if cost is not None:
+            plan.cost += cost
+        profile: Optional[ModelProfile] = usage.profiles.get(estimate.model)
+        plan.latency_seconds += estimate.requests * (
+            profile.latency_seconds if profile is not None else DEFAULT_LATENCY_SECONDS
+        )
+    return plan
+
+
+def wall_seconds(plan: BookPlan, requests_per_minute: int) -> float:
+    """The requests of a book are sent one after the other, within the rate limit."""
+    return max(plan.latency_seconds, math.ceil(plan.requests) * 60 / requests_per_minute)
+
+
+def plan_folder(
+    pdf_folder: str,
+    settings: PipelineSettings,
+    requests_per_minute: int,
+    usage: Optional[UsageReport] = None,
+    count_tokens: Optional[TokenCounter] = None,
+) -> List[BookPlan]:
+    """
+    Logs the projected requests, tokens, cost and wall time of every book of
+    a folder and of the whole run. requests_per_minute is the limit of all
+    the API keys together.
+    """
+    plans: List[BookPlan] = []
+    for pdf_file in sorted(f for f in os.listdir(pdf_folder) if f.lower().endswith(".pdf")):
+        try:
+            plan: BookPlan = plan_book(
+                pathlib.Path(os.path.join(pdf_folder, pdf_file)), settings, usage, count_tokens
+            )
+        except Exception as e:
+            logger.warning(_.get_string("plan_book_error", filename=pdf_file, error=e))
+            continue
+        plans.append(plan)
+        logger.info(
+            _.get_string(
+                "plan_book",
+                filename=plan.book,
+                pages=plan.pages,
+                chapters=len(plan.chapters),
+                chapters_source=_.get_string("plan_chapters_split" if plan.chapters_known else "plan_chapters_guessed"),
+                requests=math.ceil(plan.requests),
+                input_tokens=plan.input_tokens,
+                output_tokens=plan.output_tokens,
+                cost=plan.cost.amount_as_string(),
+                wall_time=format_duration(wall_seconds(plan, requests_per_minute)),
+            )
+        )
+
+    if plans:
+        logger.info(
+            _.get_string(
+                "plan_total",
+                books=len(plans),
+                requests=sum(math.ceil(plan.requests) for plan in plans),
+                input_tokens=sum(plan.input_tokens for plan in plans),
+                output_tokens=sum(plan.output_tokens for plan in plans),
+                cost=sum((plan.cost for plan in plans), Money(0)).amount_as_string(),
+                wall_time=format_duration(sum(wall_seconds(plan, requests_per_minute) for plan in plans)),
+            )
+        )
+    return plans
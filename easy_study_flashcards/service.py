@@ -0,0 +1,250 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from easy_study_flashcards.job_queue import JobStatus
+from easy_study_flashcards.utils.localization import localizer as _
+
+
+@dataclass
+class Job:
+    """A book submitted to the service, through the watched folder or over HTTP."""
+
+    pdf_path: str
+    subject_matter: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: JobStatus = JobStatus.QUEUED
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "pdf_path": self.pdf_path,
+            "subject_matter": self.subject_matter,
+            "status": self.status.value,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class FlashcardService:
+    """
+    Long-running service that keeps the expensive state (interpreter, SDK,
+    Gemini client, xelatex path) warm and processes books one after the other.
+    Jobs come from a watched folder and from a small local HTTP API:
+
+        POST /jobs        {"pdf_path": "...", "subject_matter": "..."}
+        GET  /jobs        all the jobs with their status
+        GET  /jobs/<id>   a single job
+        GET  /health      service status and queue length
+
+    The actual work is done by process_job, so the service knows nothing about Gemini.
+    """
+
+    def __init__(
+        self,
+        process_job: Callable[[Job], bool],
+        watch_folder: Optional[str] = None,
+        poll_interval_seconds: float = 5.0,
+    ):
+        self.process_job = process_job
+        self.watch_folder = watch_folder
+        self.poll_interval_seconds = poll_interval_seconds
+
+        self.jobs: Dict[str, Job] = {}
+        self._jobs_lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._http_server: Optional[ThreadingHTTPServer] = None
+        # Watched files already queued, and sizes seen at the last poll
+        self._seen_files: set[str] = set()
+        self._pending_sizes: Dict[str, int] = {}
+
+    # --- Jobs ---
+
+    def submit(self, pdf_path: str, subject_matter: Optional[str] = None) -> Job:
+        job = Job(pdf_path=os.path.abspath(pdf_path), subject_matter=subject_matter)
+        with self._jobs_lock:
+            self.jobs[job.id] = job
+        self._queue.put(job)
+        logger.info(_.get_string("service_job_queued", id=job.id, path=job.pdf_path))
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        with self._jobs_lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Job]:
+        with self._jobs_lock:
+            return sorted(self.jobs.values(), key=lambda job: job.created_at)
+
+    def _worker_loop(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:  # Sentinel sent by stop()
+                return
+
+            job.status = JobStatus.RUNNING
+            job.started_at = time.time()
+            logger.info(_.get_string("service_job_started", id=job.id, path=job.pdf_path))
+            try:
+                succeeded: bool = self.process_job(job)
+                job.status = JobStatus.DONE if succeeded else JobStatus.FAILED
+            # SystemExit too: this is the only worker, it must outlive any job
+            except BaseException as e:
+                error: str = str(e) or type(e).__name__
+                logger.error(_.get_string("service_job_error", id=job.id, error=error))
+                job.status = JobStatus.FAILED
+                job.error = error
+            job.finished_at = time.time()
+            logger.info(_.get_string("service_job_finished", id=job.id, status=job.status.value))
+
+    # --- Watched folder ---
+
+    def scan_watch_folder(self) -> List[Job]:
+        """
+        Queues the PDFs that appeared in the watched folder. A file is queued only
+        once its size didn't change between two scans, so that files still being
+        copied are not picked up. Books that already have a chapter folder are skipped.
+        """
+        if self.watch_folder is None or not os.path.isdir(self.watch_folder):
+            return []
+
+        queued: List[Job] = []
+        for file_name in sorted(os.listdir(self.watch_folder)):
+            if not file_name.lower().endswith(".pdf"):
+                continue
+            path: str = os.path.abspath(os.path.join(self.watch_folder, file_name))
+            if path in self._seen_files:
+                continue
+            chapter_folder: str = os.path.splitext(path)[0] + "_chapters"
+            if os.path.isdir(chapter_folder):
+                self._seen_files.add(path)
+                continue
+
+            size: int = os.path.getsize(path)
+            if self._pending_sizes.get(path) != size:
+                self._pending_sizes[path] = size
+                continue
+
+            del self._pending_sizes[path]
+            self._seen_files.add(path)
+            queued.append(self.submit(path))
+        return queued
+
+    def _watch_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.scan_watch_folder()
+            except OSError as e:
+                logger.warning(_.get_string("service_watch_error", error=str(e)))
+            self._stop_event.wait(self.poll_interval_seconds)
+
+    # --- HTTP API ---
+
+    def _handle_request(self, method: str, path: str, body: bytes) -> Tuple[int, object]:
+        parts: List[str] = [part for part in path.split("?")[0].split("/") if part]
+
+        if method == "GET" and parts == ["health"]:
+            return 200, {"status": "ok", "queued": self._queue.qsize()}
+        if method == "GET" and parts == ["jobs"]:
+            return 200, [job.to_dict() for job in self.list_jobs()]
+        if method == "GET" and len(parts) == 2 and parts[0] == "jobs":
+            job = self.get_job(parts[1])
+            if job is None:
+                return 404, {"error": "job not found"}
+            return 200, job.to_dict()
+        if method == "POST" and parts == ["jobs"]:
+            try:
+                request: dict = json.loads(body or b"{}")
+            except json.JSONDecodeError:
+                return 400, {"error": "invalid JSON body"}
+            pdf_path = request.get("pdf_path")
+            if not isinstance(pdf_path, str) or not pdf_path.lower().endswith(".pdf"):
+                return 400, {"error": "pdf_path must be the path of a PDF file"}
+            if not os.path.isfile(pdf_path):
+                return 400, {"error": f"file not found: {pdf_path}"}
+            job = self.submit(pdf_path, request.get("subject_matter"))
+            return 202, job.to_dict()
+
+        return 404, {"error": "not found"}
+
+    def _make_handler(self) -> type:
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, method: str) -> None:
+                length: int = int(self.headers.get("Content-Length") or 0)
+                body: bytes = self.rfile.read(length) if length else b""
+                status, payload = service._handle_request(method, self.path, body)
+                data: bytes = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                self._respond("GET")
+
+            def do_POST(self) -> None:
+                self._respond("POST")
+
+            def log_message(self, format: str, *args) -> None:
+                logger.debug(format % args)
+
+        return Handler
+
+    # --- Lifecycle ---
+
+    def start(self, host: str = "127.0.0.1", port: Optional[int] = 8765) -> None:
+        """Starts the worker, the folder watcher and (unless port is None) the HTTP API."""
+        self._threads.append(threading.Thread(target=self._worker_loop, daemon=True))
+        if self.watch_folder is not None:
+            self._threads.append(threading.Thread(target=self._watch_loop, daemon=True))
+        if port is not None:
+            self._http_server = ThreadingHTTPServer((host, port), self._make_handler())
+            self._threads.append(
+                threading.Thread(target=self._http_server.serve_forever, daemon=True)
+            )
+            logger.info(_.get_string("service_listening", host=host, port=self.port))
+
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def port(self) -> Optional[int]:
+        return self._http_server.server_address[1] if self._http_server else None
+
+    def wait_until_idle(self, timeout_seconds: Optional[float] = None) -> bool:
+        """Waits until every submitted job is finished. Returns False on timeout."""
+        deadline: Optional[float] = time.time() + timeout_seconds if timeout_seconds else None
+        while any(job.status in (JobStatus.QUEUED, JobStatus.RUNNING) for job in self.list_jobs()):
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._http_server is not None:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+        self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads.clear()
@@ -1,11 +1,11 @@
 from enum import Enum
+import functools
 import shutil
-import sys
-import requests
 import subprocess
 import tempfile
 import zipfile
 from pathlib import Path
+from easy_study_flashcards.utils.latex_rules import ERROR_LINE_PATTERN, default_rule_engine
 from easy_study_flashcards.utils.localization import localizer as _
 from loguru import logger
 import os
@@ -19,6 +19,8 @@ class MikTexInstallationResult(Enum):
 
 def download_and_install_miktex() -> MikTexInstallationResult:
     """Downloads and installs miktex."""
+    import requests  # Only needed on Windows machines without a LaTeX installation
+
     MIKTEX_SETUP_URL = "https://miktex.org/download/win/miktexsetup-x64.zip"
 
     try:
@@ -89,19 +91,87 @@ def download_and_install_miktex() -> MikTexInstallationResult:
 def fix_common_generated_latex_erros(latex_text: str) -> str:
     """
     Dato del testo latex generato da AI, questa funzione risolve alcuni errori comuni presenti nel testo.
+    Le regole sono in latex_rules.TEXT_RULES e vengono applicate in un solo passaggio.
+    """
+    return default_rule_engine.apply_text_rules(latex_text)
+
+
+# Preamble attached locally to the bodies generated in GenerationMode.BODY_ONLY,
+# the same one the full document prompts ask the model to write
+LATEX_PREAMBLE: str = r"""\documentclass{article}
+\usepackage[utf8]{inputenc}
+\usepackage{amsmath} % For advanced math equations
+\usepackage{amsfonts} % For additional math symbols
+\usepackage{amssymb} % For additional math symbols
+\usepackage{enumitem} % For customizing lists
+\usepackage{fancyhdr} % For headers/footers
+\usepackage{hyperref} % For links
+\usepackage{xcolor} % For colors
+\usepackage{courier} % For monospaced text
+\usepackage{listings} % For code blocks and pseudocode
+\lstset{
+    basicstyle=\ttfamily,
+    columns=fullflexible,
+    breaklines=true,
+    frame=single,
+    showstringspaces=false
+}
+
+\pagestyle{plain}
+
+\begin{document}
+"""
+LATEX_END_DOCUMENT: str = "\\end{document}\n"
+
+
+def wrap_latex_body(body: str) -> str:
+    """Builds the full document to compile from a generated body."""
+    return LATEX_PREAMBLE + body.strip() + "\n" + LATEX_END_DOCUMENT
+
+
+def extract_latex_body(latex_text: str) -> str:
+    """
+    Returns the body of a generated text. If the model wrote a whole document
+    anyway, only what's between \\begin{document} and \\end{document} is kept.
+    """
+    begin_index: int = latex_text.find(r"\begin{document}")
+    if begin_index != -1:
+        latex_text = latex_text[begin_index + len(r"\begin{document}"):]
+        end_index: int = latex_text.rfind(r"\end{document}")
+        if end_index != -1:
+            latex_text = latex_text[:end_index]
+    return latex_text.strip()
+
+
+def is_latex_body(latex_text: str) -> bool:
+    """A body is non-empty and doesn't contain preamble-only commands."""
+    stripped: str = latex_text.strip()
+    return bool(stripped) and not any(
+        command in stripped for command in (r"\documentclass", r"\usepackage")
+    )
+
+
+def shift_error_line_numbers(error_message: str, line_offset: int) -> str:
+    """
+    Makes the line numbers of xelatex errors relative to the body, so the
+    model can find the lines in the text it actually wrote.
     """
-    latex_text = latex_text.replace(r"\begin{enumerate>", r"\begin{enumerate}")
-    latex_text = latex_text.replace(r"\end{enumerate>", r"\end{enumerate}")
+    return ERROR_LINE_PATTERN.sub(
+        lambda match: f"{match.group(1)}:{max(int(match.group(2)) - line_offset, 1)}:",
+        error_message,
+    )
 
-    if latex_text.startswith("```latex\n"):
-        latex_text = latex_text.replace("```latex\n", "", 1)
-    if latex_text.endswith("```"):
-        latex_text = latex_text.replace("```", "")
 
-    return latex_text
+class XelatexNotFoundError(RuntimeError):
+    """No xelatex to validate the generated LaTeX: every chapter would fail the same way."""
 
 
+@functools.lru_cache(maxsize=None)
 def get_xelatex_path() -> str:
+    """
+    Returns the path of the xelatex executable, installing MiKTeX on Windows if needed.
+    The result is cached, so the lookup is done once per process.
+    """
     executable_path: str | None = shutil.which("xelatex")
 
     if executable_path is None:
@@ -113,10 +183,11 @@ def get_xelatex_path() -> str:
 
             if result != MikTexInstallationResult.OK:
                 logger.error(_.get_string('miktex_install_failed'))
-                sys.exit(1)
+                raise XelatexNotFoundError(_.get_string('miktex_install_failed'))
                 
             executable_path = shutil.which("xelatex")
-        
-        assert executable_path is not None
+
+        if executable_path is None:
+            raise XelatexNotFoundError(_.get_string('latex_not_found'))
 
     return executable_path
\ No newline at end of file
@@ -0,0 +1,164 @@
+import functools
+import hashlib
+import os
+import pathlib
+import re
+import shutil
+import subprocess
+import tempfile
+from typing import Optional, Set, Tuple
+
+from loguru import logger
+
+from easy_study_flashcards.utils.localization import localizer as _
+
+BEGIN_DOCUMENT: str = r"\begin{document}"
+FORMAT_ERROR_PATTERN = re.compile(r"Fatal format file error|can't find the format file|made by different executable")
+
+# Formats that couldn't be built or loaded during this run
+_failed_formats: Set[str] = set()
+
+
+def get_format_cache_dir() -> pathlib.Path:
+    """Per-machine folder where the precompiled formats are stored."""
+    if os.name == "nt":
+        base: str = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return pathlib.Path(base) / "easy_study_flashcards" / "xelatex_formats"
+
+
+def split_preamble(latex_content: str) -> Optional[Tuple[str, str]]:
+    """Splits a document in (preamble, rest starting at \\begin{document})."""
+    index: int = latex_content.find(BEGIN_DOCUMENT)
+    if index <= 0:
+        return None
+    return latex_content[:index], latex_content[index:]
+
+
+def normalize_preamble(preamble: str) -> str:
+    """Drops comments, blank lines and indentation, which don't change the format."""
+    lines = []
+    for line in preamble.splitlines():
+        line = re.sub(r"(?<!\\)%.*$", "", line).strip()
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def preamble_hash(preamble: str) -> str:
+    return hashlib.sha256(normalize_preamble(preamble).encode("utf-8")).hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=None)
+def engine_identity(xelatex_exe: str) -> str:
+    """
+    What a format depends on besides the preamble: the xelatex executable, its
+    version and the base format of the TeX distribution. A format dumped by
+    another installation can't be loaded, so an update changes the format name.
+    """
+    parts = [os.path.realpath(shutil.which(xelatex_exe) or xelatex_exe)]
+    for command in ([xelatex_exe, "--version"], ["kpsewhich", "-engine=xetex", "xelatex.fmt"]):
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, errors="ignore", check=False)
+            output: str = result.stdout.strip().splitlines()[0] if result.stdout.strip() else ""
+        except OSError:
+            output = ""
+        parts.append(output)
+    # The base format is rebuilt by tlmgr updates without a new version of the executable
+    base_format: str = parts[-1]
+    if base_format and os.path.exists(base_format):
+        parts.append(str(os.path.getmtime(base_format)))
+    return "\n".join(parts)
+
+
+def format_name_for(preamble: str, xelatex_exe: str) -> str:
+    engine_hash: str = hashlib.sha256(engine_identity(xelatex_exe).encode("utf-8")).hexdigest()[:8]
+    return f"preamble-{preamble_hash(preamble)}-{engine_hash}"
+
+
+def discard_format(format_path: str) -> None:
+    """Deletes a format that couldn't be loaded; it isn't built again during this run."""
+    _failed_formats.add(os.path.basename(format_path))
+    try:
+        os.remove(format_path + ".fmt")
+    except OSError:
+        pass
+
+
+def is_format_failure(log_path: str) -> bool:
+    """
+    Whether a compile that logged no error failed loading its format: TeX
+    stops before opening the log, or writes only the format error to it.
+    """
+    if not os.path.exists(log_path):
+        return True
+    with open(log_path, "r", encoding="utf-8", errors="ignore") as log_file:
+        return any(FORMAT_ERROR_PATTERN.search(line) for line in log_file)
+
+
+def get_or_build_format(
+    preamble: str,
+    xelatex_exe: str,
+    cache_dir: Optional[pathlib.Path] = None,
+) -> Optional[str]:
+    """
+    Returns the path (without the .fmt extension, as -fmt expects it) of a
+    format file with the given preamble already loaded, dumping it with
+    mylatexformat the first time a preamble is seen on this machine with
+    this xelatex installation.
+    Returns None if the format can't be built; the caller compiles normally.
+    """
+    cache_dir = cache_dir or get_format_cache_dir()
+    format_name: str = format_name_for(preamble, xelatex_exe)
+    format_base: pathlib.Path = cache_dir / format_name
+
+    if format_base.with_suffix(".fmt").exists():
+        return str(format_base)
+    if format_name in _failed_formats:
+        return None
+
+    logger.info(_.get_string("latex_format_building", name=format_name))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source_path: str = os.path.join(temp_dir, format_name + ".tex")
+        with open(source_path, "w", encoding="utf-8") as f:
+            f.write(normalize_preamble(preamble) + "\n" + BEGIN_DOCUMENT + "\n")
+
+        try:
+            result = subprocess.run(
+                [
+                    xelatex_exe,
+                    "-ini",
+                    "-interaction=nonstopmode",
+                    f"-jobname={format_name}",
+                    "&xelatex",
+                    "mylatexformat.ltx",
+                    source_path,
+                ],
+                cwd=temp_dir,
+                capture_output=True,
+                text=True,
+                errors="ignore",
+                check=False,
+            )
+        except OSError as e:
+            result = None
+            logger.warning(_.get_string("latex_format_error", name=format_name, error=str(e)))
+
+        built_format: str = os.path.join(temp_dir, format_name + ".fmt")
+        if result is None or result.returncode != 0 or not os.path.exists(built_format):
+            if result is not None:
+                logger.warning(
+                    _.get_string("latex_format_error", name=format_name, error=result.stdout[-500:])
+                )
+            _failed_formats.add(format_name)
+            return None
+
+        # Another process could be building the same format: the replace is atomic
+        staged: str = str(format_base) + f".{os.getpid()}.tmp"
+        shutil.copyfile(built_format, staged)
+        os.replace(staged, format_base.with_suffix(".fmt"))
+
+    return str(format_base)
@@ -0,0 +1,87 @@
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional
+
+C_STYLE_ERROR_PATTERN = re.compile(r"^(.*?\.tex):(\d+): (.*)$")
+TEX_ERROR_PATTERN = re.compile(r"^! (.*)$")
+# "l.12 Let $x \in \R" followed by a line with the rest of the source line
+CONTEXT_PATTERN = re.compile(r"^l\.(\d+) ?(.*)$")
+# Lines that only say that the compile stopped, after the real error
+NOISE_MESSAGES = ("==> Fatal error occurred", "Emergency stop", "job aborted")
+
+
+@dataclass
+class LatexError:
+    message: str
+    file: Optional[str] = None
+    line: Optional[int] = None
+    context: List[str] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        header: str = (
+            f"{self.file}:{self.line}: {self.message}"
+            if self.file is not None and self.line is not None
+            else f"! {self.message}"
+        )
+        return "\n".join([header, *(f"    {line}" for line in self.context)])
+
+
+def iter_latex_errors(
+    log_lines: Iterable[str], source_file: Optional[str] = None
+) -> Iterator[LatexError]:
+    """
+    Reads the errors of a xelatex log line by line: the message, the file and
+    line of the error and the source text TeX shows around it.
+    Errors reported without a file are attributed to source_file.
+    """
+    current: Optional[LatexError] = None
+    context_lines_left: int = 0
+
+    for raw_line in log_lines:
+        line: str = raw_line.rstrip("\n")
+
+        if context_lines_left > 0 and current is not None:
+            if line.strip():
+                current.context.append(line.strip())
+            context_lines_left -= 1
+            continue
+
+        c_style = C_STYLE_ERROR_PATTERN.match(line)
+        tex_style = TEX_ERROR_PATTERN.match(line) if c_style is None else None
+        if c_style is not None or tex_style is not None:
+            if current is not None:
+                yield current
+            message: str = c_style.group(3) if c_style is not None else tex_style.group(1)
+            if any(noise in message for noise in NOISE_MESSAGES):
+                current = None
+                continue
+            current = (
+                LatexError(message, file=c_style.group(1), line=int(c_style.group(2)))
+                if c_style is not None
+                else LatexError(message, file=source_file)
+            )
+            continue
+
+        context = CONTEXT_PATTERN.match(line)
+        if context is not None and current is not None:
+            if current.line is None:
+                current.line = int(context.group(1))
+            current.context.append(context.group(2).strip())
+            # TeX prints the rest of the source line on the next line
+            context_lines_left = 1
+
+    if current is not None:
+        yield current
+
+
+def parse_latex_log(
+    log_path: str, source_file: Optional[str] = None, max_errors: int = 10
+) -> List[LatexError]:
+    """The first errors of a log file, without reading the whole log into memory."""
+    errors: List[LatexError] = []
+    with open(log_path, "r", encoding="utf-8", errors="ignore") as log_file:
+        for error in iter_latex_errors(log_file, source_file):
+            errors.append(error)
+            if len(errors) >= max_errors:
+                break
+    return errors
@@ -0,0 +1,178 @@
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+# xelatex -c-style-errors reports errors as "file.tex:<line>: message"
+ERROR_LINE_PATTERN = re.compile(r"^(.*?\.tex):(\d+):", re.MULTILINE)
+ERROR_PATTERN = re.compile(r"^.*?\.tex:(\d+):\s*(.*)$", re.MULTILINE)
+
+NUMBER_SET_PATTERN = re.compile(r"\\([NZQRC])(?![a-zA-Z])")
+# TeX breaks the context line right after the undefined control sequence
+UNDEFINED_SEQUENCE_PATTERN = re.compile(r"\\([a-zA-Z]+)\s*$")
+CONTEXT_LINE_PATTERN = re.compile(r"^\s+(.*)$")
+UNLOCATED_ERROR_PATTERN = re.compile(r"^! (.*)$")
+BEGIN_DOCUMENT: str = "\\begin{document}"
+UNESCAPED_DOLLAR_PATTERN = re.compile(r"(?<!\\)\$")
+UNESCAPED_AMPERSAND_PATTERN = re.compile(r"(?<!\\)&")
+UNESCAPED_SCRIPT_PATTERN = re.compile(r"(?<!\\)[_^]")
+
+
+@dataclass
+class TextRule:
+    """A fix applied to every generated text. replacement gets the matched text."""
+
+    name: str
+    pattern: str
+    replacement: Callable[[str], str]
+
+
+@dataclass
+class ErrorPatch:
+    """
+    A fix applied only when xelatex reports an error matching signature.
+    apply gets the document, the line of the error (1-based, None if
+    unknown) and the source text the log shows for it, and returns the
+    patched document, or None if it can't help.
+    """
+
+    name: str
+    signature: re.Pattern
+    apply: Callable[[str, Optional[int], List[str]], Optional[str]]
+
+
+def _patch_line(document: str, line_number: Optional[int], patch: Callable[[str], str]) -> Optional[str]:
+    lines: List[str] = document.split("\n")
+    if line_number is None or not 1 <= line_number <= len(lines):
+        return None
+    patched_line: str = patch(lines[line_number - 1])
+    if patched_line == lines[line_number - 1]:
+        return None
+    lines[line_number - 1] = patched_line
+    return "\n".join(lines)
+
+
+def _outside_math(line: str, patch: Callable[[str], str]) -> str:
+    """Applies patch to the parts of a line outside $...$ (even segments of a split on $)."""
+    parts: List[str] = UNESCAPED_DOLLAR_PATTERN.split(line)
+    return "$".join(patch(part) if i % 2 == 0 else part for i, part in enumerate(parts))
+
+
+def _define_number_sets(document: str, line_number: Optional[int], context: List[str]) -> Optional[str]:
+    """
+    Writes \\R and the other number sets as \\mathbb{R}, only when the log names
+    one of them as the undefined control sequence. Only the reported line is
+    patched, or the body of the document if the line is unknown: the preamble
+    may define them with \\newcommand.
+    """
+    undefined = UNDEFINED_SEQUENCE_PATTERN.search(context[0]) if context else None
+    if undefined is None or not NUMBER_SET_PATTERN.fullmatch("\\" + undefined.group(1)):
+        return None
+
+    def patch(line: str) -> str:
+        return NUMBER_SET_PATTERN.sub(r"\\mathbb{\1}", line)
+
+    if line_number is not None:
+        return _patch_line(document, line_number, patch)
+    body_start: int = document.find(BEGIN_DOCUMENT)
+    body_start = 0 if body_start == -1 else body_start
+    patched: str = document[:body_start] + patch(document[body_start:])
+    return patched if patched != document else None
+
+
+def _close_or_escape_math(document: str, line_number: Optional[int], context: List[str]) -> Optional[str]:
+    def patch(line: str) -> str:
+        if len(UNESCAPED_DOLLAR_PATTERN.findall(line)) % 2 == 1:
+            return line + "$"
+        return _outside_math(line, lambda part: UNESCAPED_SCRIPT_PATTERN.sub(r"\\\g<0>{}", part))
+
+    return _patch_line(document, line_number, patch)
+
+
+def _escape_ampersand(document: str, line_number: Optional[int], context: List[str]) -> Optional[str]:
+    return _patch_line(
+        document, line_number, lambda line: UNESCAPED_AMPERSAND_PATTERN.sub(r"\\&", line)
+    )
+
+
+TEXT_RULES: List[TextRule] = [
+    TextRule(
+        "enumerate_typo",
+        r"\\(?:begin|end)\{(?:enumerate|itemize|description)>",
+        lambda text: text[:-1] + "}",
+    ),
+    TextRule("code_fence_start", r"\A\s*```[a-zA-Z]*[ \t]*\n", lambda text: ""),
+    TextRule("code_fence_end", r"\n?```\s*\Z", lambda text: ""),
+    # "50%" is always a percentage, never the start of a comment
+    TextRule("percent_after_number", r"(?<=\d)%", lambda text: "\\%"),
+]
+
+ERROR_PATCHES: List[ErrorPatch] = [
+    ErrorPatch("undefined_number_set", re.compile(r"Undefined control sequence"), _define_number_sets),
+    ErrorPatch("missing_dollar", re.compile(r"Missing \$ inserted"), _close_or_escape_math),
+    ErrorPatch(
+        "misplaced_ampersand", re.compile(r"Misplaced alignment tab character &"), _escape_ampersand
+    ),
+]
+
+
+def _split_errors(error_message: str) -> List[Tuple[Optional[int], str, List[str]]]:
+    """The line, message and indented context lines of every error of a compile, as LatexError prints them."""
+    errors: List[Tuple[Optional[int], str, List[str]]] = []
+    for line in error_message.split("\n"):
+        error = ERROR_PATTERN.match(line)
+        unlocated_error = UNLOCATED_ERROR_PATTERN.match(line)
+        context = CONTEXT_LINE_PATTERN.match(line)
+        if error is not None:
+            errors.append((int(error.group(1)), error.group(2), []))
+        elif unlocated_error is not None:
+            errors.append((None, unlocated_error.group(1), []))
+        elif context is not None and errors:
+            errors[-1][2].append(context.group(1))
+    return errors or [(None, error_message, [])]
+
+
+class LatexRuleEngine:
+    """
+    Deterministic fixes of generated LaTeX: text rules, compiled into a single
+    pattern and applied in one pass to every output, and error patches tried
+    locally when a compile fails, before asking the model for a correction.
+    Counts how many times every rule was applied.
+    """
+
+    def __init__(self, text_rules: List[TextRule], error_patches: List[ErrorPatch]):
+        self.text_rules: List[TextRule] = text_rules
+        self.error_patches: List[ErrorPatch] = error_patches
+        self.hits: Counter = Counter()
+        self._combined_pattern = re.compile(
+            "|".join(f"(?P<rule{i}>{rule.pattern})" for i, rule in enumerate(text_rules))
+        )
+
+    def _replace(self, match: re.Match) -> str:
+        rule: TextRule = self.text_rules[int(match.lastgroup[len("rule"):])]
+        self.hits[rule.name] += 1
+        return rule.replacement(match.group(0))
+
+    def apply_text_rules(self, latex_text: str) -> str:
+        return self._combined_pattern.sub(self._replace, latex_text)
+
+    def patch_errors(self, document: str, error_message: str) -> Tuple[Optional[str], List[str]]:
+        """
+        Applies the patches matching the errors of a failed compile.
+        Returns the patched document (None if no patch applied) and the applied patches.
+        """
+        applied: List[str] = []
+        for line_number, message, context in _split_errors(error_message):
+            for patch in self.error_patches:
+                if not patch.signature.search(message):
+                    continue
+                patched: Optional[str] = patch.apply(document, line_number, context)
+                if patched is not None:
+                    document = patched
+                    self.hits[patch.name] += 1
+                    applied.append(patch.name)
+
+        return (document if applied else None), applied
+
+
+default_rule_engine: LatexRuleEngine = LatexRuleEngine(TEXT_RULES, ERROR_PATCHES)
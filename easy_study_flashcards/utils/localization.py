@@ -37,7 +37,9 @@ class LocalizedStrings:
             "miktex_success": "MiKTeX installation completed successfully",
             # API Messages
             "rate_limit": "Request limit reached. Waiting for {seconds:.2f} seconds...",
-            "api_key_missing": "Error: The 'GEMINI_API_KEY' environment variable is not set. Please set it before running the script.",
+            "server_unavailable": "Gemini server is being overused, waiting {seconds:.0f} seconds",
+            "request_cancelled": "Request to {model} abandoned, it is not sent again",
+            "api_key_missing": "Error: The 'GEMINI_API_KEY' (or 'GEMINI_API_KEYS') environment variable is not set. Please set it before running the script.",
             # Input Messages
             "subject_prompt": "What subject do you want to generate study cards for? (e.g., 'Linear Algebra', 'Roman History', 'Quantum Physics'): ",
             "no_subject": "No subject specified. Using 'generic subject'.",
@@ -56,6 +58,87 @@ class LocalizedStrings:
             "miktex_install_failed": "Couldn't install MikTex, aborting...",
             "miktex_download_error": "Failed to download MiKTeX setup: {error}",
             "miktex_install_error": "Unexpected error during MiKTeX installation: {error}",
+            # Text layer Messages
+            "text_layer_savings": "'{filename}': {text_pages}/{total_pages} pages sent as text, ~{tokens} input tokens instead of ~{pdf_tokens} (~{saved} saved)",
+            # Page filter Messages
+            "page_dropped": "'{filename}': page {page} dropped ({kind})",
+            "pages_dropped_summary": "'{filename}': {dropped}/{total} pages will not be sent to Gemini",
+            "all_pages_dropped": "'{filename}': no content pages left after filtering. Skipping this file.",
+            # Compaction Messages
+            "compaction_saved": "'{filename}': PDF payload compacted from {original} to {compacted} bytes ({saved} bytes saved, {images} images downsampled)",
+            "compaction_error": "PDF compaction failed, sending the original file: {error}",
+            # Service Messages
+            "service_listening": "Service listening on http://{host}:{port}",
+            "service_job_queued": "Job {id} queued: '{path}'",
+            "service_job_started": "Job {id} started: '{path}'",
+            "service_job_finished": "Job {id} finished with status '{status}'",
+            "service_job_error": "Job {id} failed: {error}",
+            "service_watch_error": "Couldn't scan the watched folder: {error}",
+            "service_stopping": "Stopping the service...",
+            # LaTeX format Messages
+            "latex_format_building": "Precompiling the LaTeX preamble into the format '{name}'...",
+            "latex_format_error": "Couldn't precompile the format '{name}', compiling without it: {error}",
+            # Generation Messages
+            "generation_summary": "Generation ({mode}): {chapters} chapters, {retries_per_chapter} correction retries and {tokens_per_chapter} output tokens per chapter",
+            # Card Store Messages
+            "cards_stored": "Stored {new} new cards of {total} for chapter {chapter}",
+            "cards_none_found": "No cards found",
+            "card_reviewed": "Card {id} reviewed, next review in {days:g} days",
+            "cards_exported": "Exported {count} cards to {file}",
+            "cards_invalid_query": "Invalid search query '{query}': {error}",
+            # Deduplication Messages
+            "duplicates_dropped": "Dropped {count} theorems/definitions of {filename} already extracted from other chapters",
+            # LaTeX Rule Messages
+            "latex_local_patch": "Applied local LaTeX patches ({patches}) to {filename}, compiling again",
+            "latex_rule_hits": "LaTeX rules applied: {hits}",
+            # LaTeX Timeout Messages
+            "latex_compilation_timeout": "Compilation of {filename} stopped after {seconds:g} seconds",
+            # PDF Output Messages
+            "xdv_conversion_error": "Could not convert {filename} to PDF: {error}",
+            "validation_saving": "Validated {filename} in {attempts} compiles without PDF output; writing the PDF took {seconds:.2f}s, saved on each rejected attempt",
+            # Table Of Contents Messages
+            "toc_located": "{filename}: table of contents on pages {toc_pages}, first chapter on page {first_chapter}. Sending {pages} pages instead of {original_pages} for the chapter detection (~{saved} tokens saved)",
+            "toc_not_found": "{filename}: no table of contents found, sending the first pages for the chapter detection",
+            # Offset Verification Messages
+            "offset_verification": "{filename}: chapter pages checked against the text: {verified} verified, {corrected} corrected, {unmatched} not found, {unchecked} without text",
+            "chapter_offset_corrected": "Chapter '{title}' moved by {shift} pages, to where its title is",
+            "offset_unreliable": "{filename}: the detected chapter pages don't match the text of the book, skipping it before the generation",
+            # Client Pool Messages
+            "api_key_unavailable": "API {key_name} failed ({error}), out of rotation for {seconds:.0f} seconds",
+            # Routing Messages
+            "model_usage": "{model}: {requests} requests, {input_tokens} input and {output_tokens} output tokens, ${cost}, {latency}s in total ({average_latency}s per request)",
+            "total_cost": "Total cost of the run: ${cost}",
+            # Scheduler Messages
+            "chapter_progress": "Progress: {done}/{total} chapters, {done_pages}/{total_pages} pages, {tokens_per_second} tokens/s, {requests_per_minute} requests/min, ETA {eta}",
+            "chapters_scheduled": "{count} chapters scheduled ({policy})",
+            # Planner Messages
+            "plan_book": "Plan for '{filename}': {pages} pages, {chapters} chapters ({chapters_source}), {requests} requests, {input_tokens} input and {output_tokens} output tokens, ${cost}, about {wall_time}",
+            "plan_chapters_split": "from the previous split",
+            "plan_chapters_guessed": "estimated",
+            "plan_total": "Plan for {books} books: {requests} requests, {input_tokens} input and {output_tokens} output tokens, ${cost}, about {wall_time}. Nothing was generated.",
+            "plan_book_error": "Couldn't plan '{filename}': {error}",
+            "count_tokens_error": "Couldn't count the tokens with the API, using the local estimate: {error}",
+            # Hedging Messages
+            "hedge_summary": "Requests: {issued} hedges issued, {won} won by the hedge, {deadlines} deadlines exceeded, {abandoned} abandoned while running (still billed)",
+            "request_deadline": "A {stage} request didn't answer within {seconds:.0f} seconds, it was abandoned",
+            "request_hedged": "A {stage} request is still running after {seconds:.1f} seconds, sending a duplicate",
+            # Job Queue Messages
+            "queue_chapters_added": "{count} chapters of '{filename}' added to the job queue",
+            "queue_worker_started": "Worker {worker} taking chapters from {path}",
+            "queue_worker_finished": "Worker {worker} stopped after {jobs} chapters",
+            "queue_job_started": "Worker {worker} processing '{path}' (attempt {attempt})",
+            "queue_job_error": "Error processing queued chapter '{path}': {error}",
+            "queue_job_reclaimed": "The lease of '{path}' held by {worker} expired, the chapter is handed out again",
+            "queue_lease_lost": "The lease of '{path}' was lost, another worker may be processing it",
+            # Incremental Messages
+            "structure_reused": "The first pages of '{filename}' didn't change, reusing its chapters from the previous run",
+            "incremental_chapters": "'{filename}': {changed} chapters to generate, {reused} unchanged chapters reused",
+            "stale_chapters_removed": "'{filename}': removed {count} chapter files of an earlier split",
+            # Scan Window Messages
+            "scan_window_grown": "The chapters of '{filename}' found in the first {pages} pages look incomplete ({reason}), scanning {next_pages} pages",
+            "scan_window_used": "Chapter detection of '{filename}' used the first {pages} of {total} pages",
+            # Latex Format Messages
+            "latex_format_discarded": "The precompiled format '{name}' can't be loaded by this xelatex, it was deleted: compiling without it",
         },
         Language.IT: {
             # PDF Processing Messages
@@ -83,7 +166,9 @@ class LocalizedStrings:
             "miktex_success": "Installazione MiKTeX completata con successo",
             # API Messages
             "rate_limit": "Limite di richieste raggiunto. Attesa di {seconds:.2f} secondi...",
-            "api_key_missing": "Errore: La variabile d'ambiente 'GEMINI_API_KEY' non è impostata. Si prega di impostarla prima di eseguire lo script.",
+            "server_unavailable": "Server Gemini sovraccarico, attesa di {seconds:.0f} secondi",
+            "request_cancelled": "Richiesta a {model} abbandonata, non viene inviata di nuovo",
+            "api_key_missing": "Errore: La variabile d'ambiente 'GEMINI_API_KEY' (o 'GEMINI_API_KEYS') non è impostata. Si prega di impostarla prima di eseguire lo script.",
             # Input Messages
             "subject_prompt": "Per quale materia vuoi generare le schede di studio? (es. 'Algebra Lineare', 'Storia Romana', 'Fisica Quantistica'): ",
             "no_subject": "Nessuna materia specificata. Utilizzo 'materia generica'.",
@@ -102,6 +187,87 @@ class LocalizedStrings:
             "miktex_install_failed": "Impossibile installare MikTex, annullamento in corso...",
             "miktex_download_error": "Errore durante il download del setup MiKTeX: {error}",
             "miktex_install_error": "Errore inatteso durante l'installazione di MiKTeX: {error}",
+            # Text layer Messages
+            "text_layer_savings": "'{filename}': {text_pages}/{total_pages} pagine inviate come testo, ~{tokens} token di input invece di ~{pdf_tokens} (~{saved} risparmiati)",
+            # Page filter Messages
+            "page_dropped": "'{filename}': pagina {page} esclusa ({kind})",
+            "pages_dropped_summary": "'{filename}': {dropped}/{total} pagine non verranno inviate a Gemini",
+            "all_pages_dropped": "'{filename}': nessuna pagina di contenuto rimasta dopo il filtro. File saltato.",
+            # Compaction Messages
+            "compaction_saved": "'{filename}': PDF compattato da {original} a {compacted} byte ({saved} byte risparmiati, {images} immagini ridimensionate)",
+            "compaction_error": "Compattazione del PDF fallita, verrà inviato il file originale: {error}",
+            # Service Messages
+            "service_listening": "Servizio in ascolto su http://{host}:{port}",
+            "service_job_queued": "Job {id} in coda: '{path}'",
+            "service_job_started": "Job {id} avviato: '{path}'",
+            "service_job_finished": "Job {id} terminato con stato '{status}'",
+            "service_job_error": "Job {id} fallito: {error}",
+            "service_watch_error": "Impossibile analizzare la cartella monitorata: {error}",
+            "service_stopping": "Arresto del servizio...",
+            # LaTeX format Messages
+            "latex_format_building": "Precompilazione del preambolo LaTeX nel formato '{name}'...",
+            "latex_format_error": "Impossibile precompilare il formato '{name}', compilazione senza formato: {error}",
+            # Generation Messages
+            "generation_summary": "Generazione ({mode}): {chapters} capitoli, {retries_per_chapter} tentativi di correzione e {tokens_per_chapter} token di output per capitolo",
+            # Card Store Messages
+            "cards_stored": "Memorizzate {new} nuove carte su {total} per il capitolo {chapter}",
+            "cards_none_found": "Nessuna carta trovata",
+            "card_reviewed": "Carta {id} ripassata, prossimo ripasso tra {days:g} giorni",
+            "cards_exported": "Esportate {count} carte in {file}",
+            "cards_invalid_query": "Query di ricerca non valida '{query}': {error}",
+            # Deduplication Messages
+            "duplicates_dropped": "Scartati {count} teoremi/definizioni di {filename} già estratti da altri capitoli",
+            # LaTeX Rule Messages
+            "latex_local_patch": "Applicate correzioni LaTeX locali ({patches}) a {filename}, nuova compilazione",
+            "latex_rule_hits": "Regole LaTeX applicate: {hits}",
+            # LaTeX Timeout Messages
+            "latex_compilation_timeout": "Compilazione di {filename} interrotta dopo {seconds:g} secondi",
+            # PDF Output Messages
+            "xdv_conversion_error": "Impossibile convertire {filename} in PDF: {error}",
+            "validation_saving": "Validato {filename} in {attempts} compilazioni senza PDF; la scrittura del PDF ha richiesto {seconds:.2f}s, risparmiati per ogni tentativo scartato",
+            # Table Of Contents Messages
+            "toc_located": "{filename}: indice alle pagine {toc_pages}, primo capitolo a pagina {first_chapter}. Invio di {pages} pagine invece di {original_pages} per il rilevamento dei capitoli (~{saved} token risparmiati)",
+            "toc_not_found": "{filename}: nessun indice trovato, invio delle prime pagine per il rilevamento dei capitoli",
+            # Offset Verification Messages
+            "offset_verification": "{filename}: pagine dei capitoli confrontate con il testo: {verified} verificate, {corrected} corrette, {unmatched} non trovate, {unchecked} senza testo",
+            "chapter_offset_corrected": "Capitolo '{title}' spostato di {shift} pagine, dove si trova il suo titolo",
+            "offset_unreliable": "{filename}: le pagine dei capitoli rilevate non corrispondono al testo del libro, viene saltato prima della generazione",
+            # Client Pool Messages
+            "api_key_unavailable": "API {key_name} in errore ({error}), esclusa dalla rotazione per {seconds:.0f} secondi",
+            # Routing Messages
+            "model_usage": "{model}: {requests} richieste, {input_tokens} token in input e {output_tokens} in output, ${cost}, {latency}s in totale ({average_latency}s per richiesta)",
+            "total_cost": "Costo totale dell'esecuzione: ${cost}",
+            # Scheduler Messages
+            "chapter_progress": "Avanzamento: {done}/{total} capitoli, {done_pages}/{total_pages} pagine, {tokens_per_second} token/s, {requests_per_minute} richieste/min, tempo stimato {eta}",
+            "chapters_scheduled": "{count} capitoli pianificati ({policy})",
+            # Planner Messages
+            "plan_book": "Piano per '{filename}': {pages} pagine, {chapters} capitoli ({chapters_source}), {requests} richieste, {input_tokens} token di input e {output_tokens} di output, ${cost}, circa {wall_time}",
+            "plan_chapters_split": "dalla divisione precedente",
+            "plan_chapters_guessed": "stimati",
+            "plan_total": "Piano per {books} libri: {requests} richieste, {input_tokens} token di input e {output_tokens} di output, ${cost}, circa {wall_time}. Non è stato generato nulla.",
+            "plan_book_error": "Impossibile pianificare '{filename}': {error}",
+            "count_tokens_error": "Impossibile contare i token con l'API, uso la stima locale: {error}",
+            # Hedging Messages
+            "hedge_summary": "Richieste: {issued} duplicati inviati, {won} vinti dal duplicato, {deadlines} scadenze superate, {abandoned} abbandonate mentre erano in corso (comunque addebitate)",
+            "request_deadline": "Una richiesta {stage} non ha risposto entro {seconds:.0f} secondi ed è stata abbandonata",
+            "request_hedged": "Una richiesta {stage} è ancora in corso dopo {seconds:.1f} secondi, invio un duplicato",
+            # Job Queue Messages
+            "queue_chapters_added": "{count} capitoli di '{filename}' aggiunti alla coda dei lavori",
+            "queue_worker_started": "Il worker {worker} prende i capitoli da {path}",
+            "queue_worker_finished": "Il worker {worker} si è fermato dopo {jobs} capitoli",
+            "queue_job_started": "Il worker {worker} elabora '{path}' (tentativo {attempt})",
+            "queue_job_error": "Errore durante l'elaborazione del capitolo in coda '{path}': {error}",
+            "queue_job_reclaimed": "Il lease di '{path}' del worker {worker} è scaduto, il capitolo viene riassegnato",
+            "queue_lease_lost": "Il lease di '{path}' è stato perso, un altro worker potrebbe elaborarlo",
+            # Incremental Messages
+            "structure_reused": "Le prime pagine di '{filename}' non sono cambiate, riuso i capitoli dell'esecuzione precedente",
+            "incremental_chapters": "'{filename}': {changed} capitoli da generare, {reused} capitoli invariati riutilizzati",
+            "stale_chapters_removed": "'{filename}': rimossi {count} file di capitoli di una divisione precedente",
+            # Scan Window Messages
+            "scan_window_grown": "I capitoli di '{filename}' trovati nelle prime {pages} pagine sembrano incompleti ({reason}), analizzo {next_pages} pagine",
+            "scan_window_used": "Il rilevamento dei capitoli di '{filename}' ha usato le prime {pages} pagine su {total}",
+            # Latex Format Messages
+            "latex_format_discarded": "Il formato precompilato '{name}' non può essere caricato da questo xelatex ed è stato eliminato: compilazione senza formato",
         },
     }
 
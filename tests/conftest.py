@@ -1,11 +1,19 @@
 import pytest
 import os
+import pathlib
 
 @pytest.fixture(scope="session")
 def test_assets_dir():
     """Return the path to the test assets directory"""
     return os.path.join(os.path.dirname(__file__), 'assets')
 
+@pytest.fixture(scope="session")
+def algebra_pdf(test_assets_dir):
+    """Return the path to the born-digital algebra book used by most tests"""
+    return pathlib.Path(
+        os.path.join(test_assets_dir, "Elements of Abstract and Linear Algebra - E. H. Connell.pdf")
+    )
+
 @pytest.fixture(scope="session")
 def test_pdfs():
     assets_dir = os.path.join(os.path.dirname(__file__), "assets")
@@ -0,0 +1,61 @@
+from easy_study_flashcards.cards.dedup import DuplicateIndex, normalize_statement
+from easy_study_flashcards.cards.extraction import CardKind, ExtractedCard, drop_cards, extract_cards
+from easy_study_flashcards.utils.latex import wrap_latex_body
+
+LAGRANGE = (
+    r"\textbf{Theorem 2.5:} If $H$ is a subgroup of a finite group $G$, then the order of $H$ "
+    r"divides the order of $G$. \par \textbf{Proof:}"
+)
+
+
+def _theorem(front):
+    return ExtractedCard(kind=CardKind.THEOREM, front=front)
+
+
+def test_normalization_ignores_labels_and_formatting():
+    assert normalize_statement(r"\textbf{Definition 1.2:} Define \emph{group}.") == "group"
+    assert normalize_statement(LAGRANGE) == normalize_statement(
+        LAGRANGE.replace("Theorem 2.5", "Theorem 6.1").replace(", then", " then")
+    )
+
+
+def test_restated_statements_of_other_chapters_are_found():
+    index = DuplicateIndex()
+    index.add("Chapter_2", _theorem(LAGRANGE))
+    index.add("Chapter_2", ExtractedCard(kind=CardKind.EXERCISE, front="Compute $2 + 2$."))
+
+    # Same statement with another number and a small rewording
+    restated = LAGRANGE.replace("Theorem 2.5", "Theorem 4.1").replace("finite group", "finite group of order $n$")
+    assert index.find_duplicate("Chapter_4", _theorem(restated)).chapter == "Chapter_2"
+    # Items of the same chapter are never duplicates of themselves
+    assert index.find_duplicate("Chapter_2", _theorem(LAGRANGE)) is None
+    # Different statements and exercises are kept
+    assert index.find_duplicate("Chapter_4", _theorem(r"\textbf{Theorem 4.2:} Every ring has a unit.")) is None
+    assert index.find_duplicate("Chapter_4", ExtractedCard(kind=CardKind.EXERCISE, front="Compute $2 + 2$.")) is None
+    assert len(index) == 1
+
+
+def test_dropping_duplicates_keeps_the_document_valid():
+    index = DuplicateIndex()
+    index.add("Chapter_2", _theorem(LAGRANGE))
+    body = "\n".join(
+        [
+            r"\section*{Extracted Content}",
+            r"\begin{enumerate}",
+            r"    \item " + LAGRANGE.replace("2.5", "4.1"),
+            r"\end{enumerate}",
+            r"\section*{Original Exercises}",
+            r"\begin{enumerate}",
+            r"    \item \textbf{Exercise 4.3:} Find the subgroups of $\mathbb{Z}_6$.",
+            r"\end{enumerate}",
+        ]
+    )
+
+    document, dropped = drop_cards(
+        wrap_latex_body(body), lambda card: index.find_duplicate("Chapter_4", card) is not None
+    )
+    assert len(dropped) == 1
+    # The section left without items is removed, the rest of the document is untouched
+    assert "Extracted Content" not in document
+    assert document.rstrip().endswith(r"\end{document}")
+    assert [card.kind for card in extract_cards(document)] == [CardKind.EXERCISE]
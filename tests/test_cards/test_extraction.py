@@ -0,0 +1,60 @@
+from easy_study_flashcards.cards.extraction import CardKind, extract_cards
+from easy_study_flashcards.gemini.models import ChapterFlashcards, Exercise, Statement, StatementKind
+from easy_study_flashcards.gemini.rendering import render_flashcards_body
+
+GENERATED_BODY = r"""\title{Groups}
+\maketitle
+\section*{Contenuti Estratti}
+\begin{enumerate}
+    \item \textbf{Definizione 2.1:} Definire gruppo.
+    \item \textbf{Teorema 2.2:} L'identità è unica. \par \textbf{Dimostrazione:}
+\end{enumerate}
+\section*{Esercizi Originali}
+\begin{enumerate}
+    \item \textbf{Esercizio 2.3:} Dimostra che:
+    \begin{enumerate}
+        \item $S_3$ non è abeliano;
+        \item $\mathbb{Z}$ è un gruppo.
+    \end{enumerate}
+\end{enumerate}
+\section*{Note}
+\begin{enumerate}
+    \item Not a card.
+\end{enumerate}
+"""
+
+
+def test_extract_cards_from_generated_latex():
+    cards = extract_cards(GENERATED_BODY)
+
+    assert [card.kind for card in cards] == [
+        CardKind.DEFINITION,
+        CardKind.THEOREM,
+        CardKind.EXERCISE,
+    ]
+    assert cards[0].front == r"\textbf{Definizione 2.1:} Definire gruppo."
+    # Nested lists stay inside their exercise
+    assert cards[2].front.count(r"\item") == 2
+    assert cards[2].front.rstrip().endswith(r"\end{enumerate}")
+
+
+def test_extract_cards_from_rendered_flashcards():
+    flashcards = ChapterFlashcards(
+        title="",
+        author="",
+        statements=[
+            Statement(kind=StatementKind.THEOREM, label="Theorem 1", text="$1 + 1 = 2$."),
+            Statement(kind=StatementKind.DEFINITION, label="Definition 2", text="ring"),
+        ],
+        exercises=[Exercise(label="Exercise 3", text="Compute $2 + 2$.")],
+        generated_exercises=["Compute $3 + 3$."],
+    )
+
+    cards = extract_cards(render_flashcards_body(flashcards, "en"))
+    assert [card.kind for card in cards] == [
+        CardKind.THEOREM,
+        CardKind.DEFINITION,
+        CardKind.EXERCISE,
+        CardKind.GENERATED_EXERCISE,
+    ]
+    assert cards[3].front == "Compute $3 + 3$."
@@ -0,0 +1,117 @@
+import io
+import sqlite3
+import time
+
+import pytest
+
+from easy_study_flashcards.cards.export import export_anki, export_csv
+from easy_study_flashcards.cards.extraction import CardKind, ExtractedCard
+from easy_study_flashcards.cards.scheduler import SECONDS_PER_DAY, ReviewState, schedule_review
+from easy_study_flashcards.cards.store import CardStore
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def store(tmp_path):
+    with CardStore(str(tmp_path / "cards.sqlite3")) as store:
+        yield store
+
+
+def _cards(*fronts):
+    return [ExtractedCard(kind=CardKind.DEFINITION, front=front) for front in fronts]
+
+
+def test_rerun_of_a_chapter_keeps_review_history(store):
+    assert store.add_chapter_cards("Algebra", "Chapter 1", _cards("Define group.", "Define ring."), now=NOW) == 2
+    group = store.search("group")[0]
+    store.review(group.id, 5, now=NOW)
+
+    # The chapter is generated again: one card changed, one is the same
+    assert store.add_chapter_cards("Algebra", "Chapter 1", _cards("Define group.", "Define field."), now=NOW) == 1
+    assert store.count() == 2
+    assert store.get_card(group.id).state.repetitions == 1
+    assert store.search("ring") == []
+    assert [card.front for card in store.search("field")] == ["Define field."]
+
+
+def test_search_treats_the_query_as_plain_words(store):
+    store.add_chapter_cards(
+        "Algebra", "Chapter 2", _cards("State the group-theory version of Lagrange.", r"Define $\mathbb{Z}$."), now=NOW
+    )
+    assert [card.front for card in store.search("group-theory")] == ["State the group-theory version of Lagrange."]
+    assert [card.front for card in store.search(r"\mathbb")] == [r"Define $\mathbb{Z}$."]
+    assert store.search('"unbalanced') == []
+    assert store.search("   ") == []
+
+    assert len(store.search("lagrange OR mathbb", fts_syntax=True)) == 2
+    with pytest.raises(sqlite3.OperationalError):
+        store.search("group-theory", fts_syntax=True)
+
+
+def test_sm2_schedule():
+    state = ReviewState()
+    intervals = []
+    for quality in (5, 5, 4):
+        state = schedule_review(state, quality)
+        intervals.append(state.interval_days)
+    assert intervals == [1.0, 6.0, 16.0]
+
+    lapsed = schedule_review(state, 1)
+    assert (lapsed.interval_days, lapsed.repetitions, lapsed.lapses) == (1.0, 0, 1)
+    assert lapsed.ease >= 1.3
+
+
+def test_due_queue(store):
+    store.add_chapter_cards("Algebra", "Chapter 1", _cards("a", "b"), now=NOW)
+    store.add_chapter_cards("Physics", "Chapter 1", _cards("c"), now=NOW + 10)
+
+    first = store.due_cards(now=NOW + 10)[0]
+    store.review(first.id, 4, now=NOW + 10)
+
+    due = store.due_cards(now=NOW + 10)
+    assert first.id not in [card.id for card in due]
+    assert [card.front for card in store.due_cards(now=NOW + 10, book="Physics")] == ["c"]
+    assert first.id in [card.id for card in store.due_cards(now=NOW + 10 + SECONDS_PER_DAY)]
+
+
+def test_exports_stream_every_card(store):
+    store.add_chapter_cards("Linear Algebra", "Chapter 2", _cards("$a < b$ and\nmore"), now=NOW)
+
+    csv_output = io.StringIO()
+    assert export_csv(store, csv_output) == 1
+    assert csv_output.getvalue().splitlines()[0].startswith("id,book,chapter,kind,front")
+
+    anki_output = io.StringIO()
+    assert export_anki(store, anki_output) == 1
+    lines = anki_output.getvalue().split("\n")
+    assert lines[:3] == ["#separator:tab", "#html:true", "#tags column:3"]
+    assert "[latex]$a &lt; b$ and" in lines[3]
+    assert "Linear_Algebra::Chapter_2 definition" in anki_output.getvalue()
+
+
+def test_benchmark_due_queue_at_100k_cards(store):
+    """The due query is an index range scan: its time doesn't depend on the store size"""
+    for book in range(10):
+        store.add_chapter_cards(
+            f"Book {book}",
+            "Chapter",
+            [ExtractedCard(kind=CardKind.EXERCISE, front=f"Exercise {i} of book {book}") for i in range(10_000)],
+            now=NOW + book,
+        )
+    assert store.count() == 100_000
+
+    plan = " ".join(
+        row[3] for row in store.connection.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM cards WHERE due_at <= ? ORDER BY due_at LIMIT 20", (NOW,)
+        )
+    )
+    assert "cards_due_at" in plan
+
+    started = time.perf_counter()
+    for _ in range(100):
+        due = store.due_cards(now=NOW + 5, limit=20)
+    elapsed_ms = (time.perf_counter() - started) * 10
+    print(f"\ndue query at 100k cards: {elapsed_ms:.3f} ms")
+    assert len(due) == 20
+    assert elapsed_ms < 50
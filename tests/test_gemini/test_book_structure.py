@@ -0,0 +1,93 @@
+import io
+from types import SimpleNamespace
+
+from pypdf import PdfReader
+
+from easy_study_flashcards.gemini.client import get_chapters_from_gemini
+from easy_study_flashcards.gemini.models import BookStructure, ChapterInfo
+from easy_study_flashcards.pdf_processing.text_layer import InputMode
+
+
+class StructureClient:
+    """Answers every request with the same BookStructure and records the requests."""
+
+    def __init__(self, first_chapter_physical_page: int):
+        self.first_chapter_physical_page = first_chapter_physical_page
+        self.requests = []
+
+    def generate_content_with_rate_limit(self, **kwargs):
+        self.requests.append(kwargs)
+        return SimpleNamespace(
+            parsed=BookStructure(
+                chapters=[ChapterInfo(title="Background", start_page=1)],
+                first_chapter_physical_page=self.first_chapter_physical_page,
+            ),
+            text=None,
+        )
+
+
+def _sent_pages(request) -> int:
+    """Pages sent as text plus pages attached as PDF (the ones without a text layer)."""
+    return sum(
+        segment.count("--- Page ")
+        if isinstance(segment, str)
+        else len(PdfReader(io.BytesIO(segment.inline_data.data)).pages)
+        for segment in request["contents"][:-1]
+    )
+
+
+def test_single_call_fills_book_structure(algebra_pdf):
+    client = StructureClient(first_chapter_physical_page=9)
+    structure = get_chapters_from_gemini(
+        algebra_pdf,
+        "chapters-model",
+        "page-model",
+        client,  # type: ignore
+        lang="en",
+        input_mode=InputMode.TEXT_LAYER,
+        single_call=True,
+    )
+
+    assert len(client.requests) == 1
+    request = client.requests[0]
+    assert request["model"] == "page-model"
+    assert request["config"]["response_schema"] is BookStructure
+    # One window, the larger of the two
+    assert _sent_pages(request) == 40
+    assert structure.first_chapter_physical_page == 9
+    assert [chapter.title for chapter in structure.chapters] == ["Background"]
+
+
+def test_single_call_maps_position_in_located_pages(algebra_pdf):
+    client = StructureClient(first_chapter_physical_page=4)
+    structure = get_chapters_from_gemini(
+        algebra_pdf,
+        "chapters-model",
+        "page-model",
+        client,  # type: ignore
+        lang="en",
+        input_mode=InputMode.TEXT_LAYER,
+        locate_toc=True,
+        single_call=True,
+    )
+
+    assert len(client.requests) == 1
+    assert _sent_pages(client.requests[0]) == 7
+    assert structure.first_chapter_physical_page == 9
+
+
+def test_single_call_rejects_positions_outside_sent_pages(algebra_pdf):
+    client = StructureClient(first_chapter_physical_page=30)
+    assert (
+        get_chapters_from_gemini(
+            algebra_pdf,
+            "chapters-model",
+            "page-model",
+            client,  # type: ignore
+            lang="en",
+            input_mode=InputMode.TEXT_LAYER,
+            locate_toc=True,
+            single_call=True,
+        )
+        is None
+    )
@@ -0,0 +1,88 @@
+import pytest
+from pypdf import PdfWriter
+
+from easy_study_flashcards.gemini.chapter_scheduler import (
+    ChapterJob,
+    ProgressTracker,
+    SchedulePolicy,
+    format_duration,
+    schedule_chapters,
+)
+
+CHAPTER_PAGES = {
+    "Chapter_1-Intro.pdf": 3,
+    "Chapter_2-Groups.pdf": 12,
+    "Chapter_10-Fields.pdf": 7,
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def chapter_folder(tmp_path):
+    for file_name, pages in CHAPTER_PAGES.items():
+        writer = PdfWriter()
+        for _ in range(pages):
+            writer.add_blank_page(width=200, height=200)
+        writer.write(tmp_path / file_name)
+    return tmp_path
+
+
+def _order(chapter_folder, policy, priorities=None):
+    jobs = schedule_chapters(str(chapter_folder), list(CHAPTER_PAGES), policy, priorities)
+    return [job.file_name for job in jobs]
+
+
+def test_file_order_is_natural(chapter_folder):
+    assert _order(chapter_folder, SchedulePolicy.FILE_ORDER) == [
+        "Chapter_1-Intro.pdf",
+        "Chapter_2-Groups.pdf",
+        "Chapter_10-Fields.pdf",
+    ]
+
+
+def test_size_policies_use_page_counts(chapter_folder):
+    assert _order(chapter_folder, SchedulePolicy.LONGEST_FIRST) == [
+        "Chapter_2-Groups.pdf",
+        "Chapter_10-Fields.pdf",
+        "Chapter_1-Intro.pdf",
+    ]
+    assert _order(chapter_folder, SchedulePolicy.SHORTEST_FIRST)[0] == "Chapter_1-Intro.pdf"
+
+
+def test_priority_puts_listed_chapters_first(chapter_folder):
+    assert _order(chapter_folder, SchedulePolicy.PRIORITY, ["fields", "GROUPS"]) == [
+        "Chapter_10-Fields.pdf",
+        "Chapter_2-Groups.pdf",
+        "Chapter_1-Intro.pdf",
+    ]
+
+
+def test_eta_follows_observed_throughput():
+    clock = FakeClock()
+    jobs = [ChapterJob("a.pdf", 10), ChapterJob("b.pdf", 10), ChapterJob("c.pdf", 20)]
+    progress = ProgressTracker(jobs, clock=clock)
+    assert progress.eta_seconds() is None
+
+    # First chapter: 2 requests, 1000 tokens in 60 seconds
+    clock.now += 30
+    progress.record_request(500)
+    clock.now += 30
+    progress.record_request(500)
+    progress.finish_chapter(jobs[0])
+
+    assert progress.tokens_per_second == pytest.approx(1000 / 60)
+    assert progress.requests_per_minute == pytest.approx(2.0)
+    # 30 pages left at 100 tokens per page, 4 requests left at 2 per minute
+    assert progress.eta_seconds() == pytest.approx(180.0)
+
+
+def test_format_duration():
+    assert format_duration(65) == "1m 05s"
+    assert format_duration(3 * 3600 + 120) == "3h 02m"
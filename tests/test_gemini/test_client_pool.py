@@ -0,0 +1,209 @@
+import threading
+
+import httpx
+import pytest
+from google.genai.errors import ClientError, ServerError
+
+from easy_study_flashcards.gemini import client as client_module
+from easy_study_flashcards.gemini.client import GeminiClientManager, RequestCancelled
+from easy_study_flashcards.gemini.client_pool import (
+    BASE_COOLDOWN_SECONDS,
+    GeminiClientPool,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class StubClient:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    def generate_content_with_rate_limit(self, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return f"response {self.calls}"
+
+
+def _pool(clients, clock, max_requests_per_minute=10):
+    return GeminiClientPool(clients, max_requests_per_minute, clock=clock, sleep=clock.sleep)
+
+
+def _quota_error():
+    return ClientError(429, {"error": {"code": 429, "message": "quota", "status": "RESOURCE_EXHAUSTED"}})
+
+
+def test_requests_go_to_the_least_loaded_key():
+    clock = FakeClock()
+    clients = [StubClient(), StubClient(), StubClient()]
+    pool = _pool(clients, clock)
+
+    for _ in range(9):
+        pool.generate_content_with_rate_limit(model="m", contents=[])
+
+    assert [client.calls for client in clients] == [3, 3, 3]
+    assert clock.slept == []
+
+
+def test_failing_key_leaves_rotation_until_cooldown():
+    clock = FakeClock()
+    failing, healthy = StubClient(error=_quota_error()), StubClient()
+    pool = _pool([failing, healthy], clock)
+
+    for _ in range(4):
+        assert pool.generate_content_with_rate_limit(model="m", contents=[]).startswith("response")
+
+    # Tried once, then skipped while cooling down
+    assert failing.calls == 1
+    assert healthy.calls == 4
+    assert pool.keys[0].failures == 1
+
+    clock.now += BASE_COOLDOWN_SECONDS
+    failing.error = None
+    pool.generate_content_with_rate_limit(model="m", contents=[])
+    assert failing.calls == 2
+    assert pool.keys[0].consecutive_failures == 0
+
+
+def test_request_errors_are_not_blamed_on_the_key():
+    clock = FakeClock()
+    client = StubClient(error=ClientError(400, {"error": {"code": 400, "message": "bad", "status": "INVALID_ARGUMENT"}}))
+    pool = _pool([client, StubClient()], clock)
+
+    with pytest.raises(ClientError):
+        pool.generate_content_with_rate_limit(model="m", contents=[])
+    assert pool.keys[0].failures == 0
+    assert pool.keys[0].is_healthy(clock.now)
+
+
+@pytest.mark.parametrize("error", [ValueError("bad schema"), KeyError("usage_metadata")])
+def test_local_errors_are_not_blamed_on_the_key(error):
+    clock = FakeClock()
+    client = StubClient(error=error)
+    pool = _pool([client, StubClient()], clock)
+
+    with pytest.raises(type(error)):
+        pool.generate_content_with_rate_limit(model="m", contents=[])
+    assert client.calls == 1
+    assert pool.keys[0].failures == 0
+
+
+def test_request_errors_dont_reset_the_failure_streak_of_a_key():
+    clock = FakeClock()
+    pool = _pool([StubClient()], clock)
+    key = pool.keys[0]
+    bad_request = ClientError(400, {"error": {"code": 400, "message": "bad", "status": "INVALID_ARGUMENT"}})
+
+    for error in (_quota_error(), bad_request, _quota_error()):
+        key.in_flight += 1
+        pool._release(key, error)
+
+    assert key.consecutive_failures == 2
+    assert key.requests == 0
+    assert key.unavailable_until == clock.now + 2 * BASE_COOLDOWN_SECONDS
+
+
+def test_connection_errors_are_blamed_on_the_key():
+    clock = FakeClock()
+    failing, healthy = StubClient(error=httpx.ConnectError("refused")), StubClient()
+    pool = _pool([failing, healthy], clock)
+
+    assert pool.generate_content_with_rate_limit(model="m", contents=[]) == "response 1"
+    assert pool.keys[0].failures == 1
+
+
+def test_all_keys_failing_raises_last_error():
+    clock = FakeClock()
+    pool = _pool([StubClient(error=_quota_error()), StubClient(error=_quota_error())], clock)
+
+    with pytest.raises(ClientError):
+        pool.generate_content_with_rate_limit(model="m", contents=[])
+
+
+def test_pool_waits_when_every_key_is_at_its_limit():
+    clock = FakeClock()
+    clients = [StubClient(), StubClient()]
+    pool = _pool(clients, clock, max_requests_per_minute=2)
+
+    for _ in range(5):
+        pool.generate_content_with_rate_limit(model="m", contents=[])
+
+    # 4 requests fit in the first minute, the 5th waits for the window
+    assert sum(clock.slept) == pytest.approx(60.0)
+    assert sum(client.calls for client in clients) == 5
+
+
+def test_client_manager_rate_limit_is_configurable():
+    client = GeminiClientManager(api_key="test", max_requests_per_minute=3)
+    assert client.max_requests_per_minute == 3
+
+
+def test_client_manager_reserves_slots_across_threads():
+    client = GeminiClientManager(api_key="test", max_requests_per_minute=3)
+    threads = [threading.Thread(target=client._wait_for_rate_limit) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(client.request_timestamps) == 3
+    assert not client.has_headroom()
+
+
+class UnavailableModels:
+    """Always answers 503, cancelling the request after the calls given."""
+
+    def __init__(self, cancel_after=None, cancelled=None):
+        self.calls = 0
+        self.cancel_after = cancel_after
+        self.cancelled = cancelled
+
+    def count_tokens(self, **kwargs):
+        class Count:
+            total_tokens = 10
+
+        return Count()
+
+    def generate_content(self, **kwargs):
+        self.calls += 1
+        if self.calls == self.cancel_after:
+            self.cancelled.set()
+        raise ServerError(503, {"error": {"code": 503, "message": "overloaded", "status": "UNAVAILABLE"}})
+
+
+def test_client_manager_gives_up_on_unavailable_server(monkeypatch):
+    models = UnavailableModels()
+    monkeypatch.setattr(GeminiClientManager, "models", models)
+    monkeypatch.setattr(client_module, "UNAVAILABLE_RETRY_SECONDS", 0.0)
+    sent = []
+
+    with pytest.raises(ServerError):
+        GeminiClientManager(api_key="test").generate_content_with_rate_limit(
+            model="m", contents=[], on_sent=lambda: sent.append(1)
+        )
+    assert models.calls == len(sent) == client_module.MAX_UNAVAILABLE_RETRIES + 1
+
+
+def test_client_manager_stops_retrying_an_abandoned_request(monkeypatch):
+    cancelled = threading.Event()
+    models = UnavailableModels(cancel_after=2, cancelled=cancelled)
+    monkeypatch.setattr(GeminiClientManager, "models", models)
+    monkeypatch.setattr(client_module, "UNAVAILABLE_RETRY_SECONDS", 0.0)
+
+    with pytest.raises(RequestCancelled):
+        GeminiClientManager(api_key="test").generate_content_with_rate_limit(
+            model="m", contents=[], cancelled=cancelled
+        )
+    assert models.calls == 2
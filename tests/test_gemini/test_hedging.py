@@ -0,0 +1,144 @@
+import threading
+import time
+
+import pytest
+from google.genai.types import GenerateContentConfig, HttpOptions
+
+from easy_study_flashcards.gemini.hedging import (
+    MAX_ABANDONED_RUNNING,
+    HedgedClient,
+    LatencyTracker,
+    RequestDeadlineExceeded,
+    with_http_timeout,
+)
+from easy_study_flashcards.gemini.routing import Stage
+
+
+class SlowClient:
+    """Answers after the delays given, one per call; records the configs it receives."""
+
+    def __init__(self, delays, headroom=True):
+        self.delays = list(delays)
+        self.headroom = headroom
+        self.configs = []
+        self._lock = threading.Lock()
+
+    def has_headroom(self):
+        return self.headroom
+
+    def generate_content_with_rate_limit(self, stage=None, on_sent=None, cancelled=None, queued=0.0, **kwargs):
+        # Waiting for a rate-limit slot
+        time.sleep(queued)
+        with self._lock:
+            call = len(self.configs)
+            self.configs.append(kwargs.get("config"))
+        on_sent()
+        time.sleep(self.delays[call])
+        return f"response {call}"
+
+
+def _warm_up(client, stage, latency, samples=20):
+    for _ in range(samples):
+        client.latencies[stage].record(latency)
+
+
+def test_percentile_needs_enough_samples():
+    tracker = LatencyTracker()
+    for latency in range(1, 20):
+        tracker.record(latency)
+    assert tracker.percentile(0.95) is None
+    tracker.record(20)
+    assert tracker.percentile(0.95) == 19
+    assert tracker.percentile(0.5) == 10
+
+
+def test_deadline_is_sent_to_the_sdk_and_enforced():
+    inner = SlowClient([1.0])
+    client = HedgedClient(inner, deadlines={Stage.FIRST_CHAPTER_PAGE: 0.1})
+
+    started = time.monotonic()
+    with pytest.raises(RequestDeadlineExceeded):
+        client.generate_content_with_rate_limit(
+            stage=Stage.FIRST_CHAPTER_PAGE, model="m", contents=[], config={"response_mime_type": "text/plain"}
+        )
+
+    assert time.monotonic() - started < 0.5
+    assert inner.configs[0] == {"response_mime_type": "text/plain", "http_options": {"timeout": 100}}
+    assert client.metrics.deadlines_exceeded == 1
+    assert client.metrics.requests_abandoned == 1
+
+
+def test_stage_without_deadline_is_called_directly():
+    inner = SlowClient([0.0])
+    client = HedgedClient(inner, deadlines={})
+    assert client.generate_content_with_rate_limit(stage=Stage.GENERATION, model="m", contents=[]) == "response 0"
+    assert inner.configs == [None]
+
+
+def test_slow_request_is_hedged_and_the_hedge_wins():
+    inner = SlowClient([1.0, 0.0])
+    client = HedgedClient(inner, deadlines={}, hedging=True)
+    _warm_up(client, Stage.GENERATION, 0.05)
+
+    assert client.generate_content_with_rate_limit(stage=Stage.GENERATION, model="m", contents=[]) == "response 1"
+    assert client.metrics.hedges_issued == 1
+    assert client.metrics.hedges_won == 1
+    # The primary was already running: it couldn't be cancelled
+    assert client.metrics.requests_abandoned == 1
+
+
+def test_no_hedge_without_headroom_or_history():
+    inner = SlowClient([0.2, 0.0], headroom=False)
+    client = HedgedClient(inner, deadlines={}, hedging=True)
+    _warm_up(client, Stage.GENERATION, 0.05)
+    assert client.generate_content_with_rate_limit(stage=Stage.GENERATION, model="m", contents=[]) == "response 0"
+
+    cold = HedgedClient(SlowClient([0.1, 0.0]), deadlines={}, hedging=True)
+    cold.generate_content_with_rate_limit(stage=Stage.CORRECTION, model="m", contents=[])
+
+    assert client.metrics.hedges_issued == cold.metrics.hedges_issued == 0
+
+
+def test_direct_requests_warm_up_the_hedge_delay():
+    client = HedgedClient(SlowClient([0.0] * 3), deadlines={}, hedging=True, min_samples=3)
+    for _ in range(3):
+        client.generate_content_with_rate_limit(stage=Stage.GENERATION, model="m", contents=[])
+
+    assert len(client.latencies[Stage.GENERATION]) == 3
+    assert client.hedge_delay(Stage.GENERATION) is not None
+
+
+def test_no_hedge_while_abandoned_requests_run():
+    client = HedgedClient(SlowClient([0.2, 0.0]), deadlines={}, hedging=True)
+    _warm_up(client, Stage.GENERATION, 0.05)
+    client._abandoned_running = MAX_ABANDONED_RUNNING
+
+    assert client.generate_content_with_rate_limit(stage=Stage.GENERATION, model="m", contents=[]) == "response 0"
+    assert client.metrics.hedges_issued == 0
+
+
+def test_http_timeout_keeps_existing_options():
+    assert with_http_timeout(None, 2) == {"http_options": {"timeout": 2000}}
+    assert with_http_timeout({"http_options": {"api_version": "v1"}}, 1.5) == {
+        "http_options": {"api_version": "v1", "timeout": 1500}
+    }
+
+
+def test_deadline_and_latency_start_when_the_request_is_sent():
+    inner = SlowClient([0.1])
+    client = HedgedClient(inner, deadlines={Stage.FIRST_CHAPTER_PAGE: 0.3})
+
+    # The wait for the rate-limit slot is longer than the deadline
+    response = client.generate_content_with_rate_limit(
+        stage=Stage.FIRST_CHAPTER_PAGE, model="m", contents=[], queued=0.5
+    )
+    assert response == "response 0"
+    assert client.metrics.deadlines_exceeded == 0
+    assert client.latencies[Stage.FIRST_CHAPTER_PAGE].percentile(0.5, min_samples=1) < 0.3
+
+
+def test_typed_config_keeps_its_http_options():
+    config = GenerateContentConfig(http_options=HttpOptions(base_url="https://proxy", headers={"x-team": "a"}))
+    options = with_http_timeout(config, 2).http_options
+    assert (options.base_url, options.headers, options.timeout) == ("https://proxy", {"x-team": "a"}, 2000)
+    assert with_http_timeout(GenerateContentConfig(), 1).http_options.timeout == 1000
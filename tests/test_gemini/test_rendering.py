@@ -0,0 +1,64 @@
+import shutil
+import tempfile
+
+import pytest
+
+from easy_study_flashcards.gemini.models import ChapterFlashcards
+from easy_study_flashcards.gemini.rendering import render_flashcards_body, sanitize_fragment
+from easy_study_flashcards.utils.latex import is_latex_body, wrap_latex_body
+
+RESPONSE = """{
+    "title": "Groups",
+    "author": "E. H. Connell",
+    "statements": [
+        {"kind": "definition", "label": "Definition 2.1", "text": "group."},
+        {"kind": "theorem", "label": "Theorem 2.2", "text": "If $G$ is a group, its identity is unique."}
+    ],
+    "exercises": [
+        {"label": "Exercise 2.3", "text": "Show that 50% of the elements of $S_3$ are even."}
+    ],
+    "generated_exercises": ["Show that $\\\\mathbb{Z}$ is a group under addition.", "  "]
+}"""
+
+
+def test_render_structured_response():
+    flashcards = ChapterFlashcards.model_validate_json(RESPONSE)
+    body = render_flashcards_body(flashcards, "en")
+
+    assert is_latex_body(body)
+    assert body.startswith("\\title{Groups}")
+    # Definitions and theorems keep the order of the document
+    assert body.index("Definition 2.1") < body.index("Theorem 2.2")
+    assert "\\textbf{Definition 2.1:} Define group." in body
+    assert "\\par \\textbf{Proof:}" in body
+    assert "50\\% of the elements" in body
+    assert body.count("\\item") == 4
+    assert "\\section*{AI-Generated Exercises}" in body
+
+
+def test_empty_sections_are_left_out():
+    flashcards = ChapterFlashcards(
+        title="", author="", statements=[], exercises=[], generated_exercises=[]
+    )
+    assert render_flashcards_body(flashcards, "it") == ""
+
+    flashcards.generated_exercises = ["Calcola $2 + 2$."]
+    body = render_flashcards_body(flashcards, "it")
+    assert body.startswith("\\section*{Esercizi Generati dall'AI}")
+    assert "\\maketitle" not in body
+
+
+def test_sanitize_fragment():
+    assert sanitize_fragment(" 10% and \\% and #1 ") == "10\\% and \\% and \\#1"
+
+
+@pytest.mark.skipif(shutil.which("xelatex") is None, reason="xelatex not installed")
+def test_rendered_document_compiles():
+    from easy_study_flashcards.pdf_processing.core import PDFProcessor
+
+    flashcards = ChapterFlashcards.model_validate_json(RESPONSE)
+    with tempfile.TemporaryDirectory() as output_dir:
+        is_valid, error = PDFProcessor.validate_and_compile_latex_to_pdf(
+            wrap_latex_body(render_flashcards_body(flashcards, "en")), output_dir, "chapter"
+        )
+    assert is_valid, error
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from stockholm import Money
+
+from easy_study_flashcards.gemini.routing import (
+    DEFAULT_MODEL_PROFILES,
+    RoutingPolicy,
+    Stage,
+    UsageReport,
+    load_model_profiles,
+)
+
+
+@pytest.fixture
+def policy():
+    return RoutingPolicy.from_models(
+        "gemini-2.0-flash", "gemini-2.5-flash", light_model="gemini-2.5-flash-lite", small_chapter_pages=8
+    )
+
+
+def test_without_light_model_every_stage_uses_its_model():
+    policy = RoutingPolicy.from_models("chapters", "generation")
+    assert policy.choose_model(Stage.CHAPTER_DETECTION) == "chapters"
+    assert policy.choose_model(Stage.FIRST_CHAPTER_PAGE) == "generation"
+    assert policy.choose_model(Stage.GENERATION, pages=2) == "generation"
+    assert policy.choose_model(Stage.CORRECTION, retry=1) == "generation"
+
+
+def test_light_model_takes_small_and_cheap_requests(policy):
+    assert policy.choose_model(Stage.FIRST_CHAPTER_PAGE) == "gemini-2.5-flash-lite"
+    assert policy.choose_model(Stage.GENERATION, pages=5) == "gemini-2.5-flash-lite"
+    assert policy.choose_model(Stage.GENERATION, tokens=3000) == "gemini-2.5-flash-lite"
+    assert policy.choose_model(Stage.GENERATION, pages=60) == "gemini-2.5-flash"
+    assert policy.choose_model(Stage.CHAPTER_DETECTION) == "gemini-2.0-flash"
+
+
+def test_few_pages_of_many_tokens_are_not_small(policy):
+    assert policy.choose_model(Stage.GENERATION, pages=5, tokens=3000) == "gemini-2.5-flash-lite"
+    assert policy.choose_model(Stage.GENERATION, pages=5, tokens=50_000) == "gemini-2.5-flash"
+
+
+def test_corrections_escalate_after_the_first_retry(policy):
+    assert policy.choose_model(Stage.CORRECTION, pages=60, retry=1) == "gemini-2.5-flash-lite"
+    assert policy.choose_model(Stage.CORRECTION, pages=60, retry=2) == "gemini-2.5-flash"
+
+
+def test_usage_is_split_by_model():
+    report = UsageReport()
+    report.record("gemini-2.5-flash", 1_000_000, 0, 10.0)
+    report.record("gemini-2.5-flash", 0, 1_000_000, 20.0)
+    report.record("gemini-2.0-flash", 1_000_000, 1_000_000, 3.0)
+    assert report.record("unknown-model", 10, 10, 1.0) is None
+
+    flash = report.by_model["gemini-2.5-flash"]
+    assert flash.requests == 2
+    assert flash.cost == Money("2.80")
+    assert flash.average_latency == 15.0
+    assert report.by_model["gemini-2.0-flash"].cost == Money("0.50")
+    assert report.by_model["unknown-model"].requests == 1
+    assert report.total_cost == Money("3.30")
+
+
+def test_model_table_overrides_defaults(tmp_path):
+    table = tmp_path / "models.json"
+    table.write_text(
+        json.dumps(
+            {
+                "gemini-2.5-flash": {"input_price": 1.0, "output_price": 2.0, "latency_seconds": 5.0},
+                "my-tuned-model": {"input_price": 0.5, "output_price": 0.5, "latency_seconds": 1.0},
+            }
+        )
+    )
+    profiles = load_model_profiles(str(table))
+
+    assert profiles["gemini-2.5-flash"].input_price == 1.0
+    assert profiles["my-tuned-model"].latency_seconds == 1.0
+    assert profiles["gemini-2.0-flash"] == DEFAULT_MODEL_PROFILES["gemini-2.0-flash"]
@@ -0,0 +1,67 @@
+from easy_study_flashcards.gemini.models import BookStructure, ChapterInfo
+from easy_study_flashcards.gemini.scan_window import (
+    IncompleteReason,
+    detect_with_adaptive_window,
+    find_incompleteness,
+)
+
+BOOK_PAGES = 146
+
+
+def _structure(start_pages, first_chapter_physical_page=10):
+    return BookStructure(
+        chapters=[ChapterInfo(title=f"Chapter {i}", start_page=page) for i, page in enumerate(start_pages, 1)],
+        first_chapter_physical_page=first_chapter_physical_page,
+    )
+
+
+FULL = _structure([1, 15, 30, 50, 80, 110])
+TRUNCATED = _structure([1, 15, 30])
+
+
+def test_complete_chapter_list():
+    assert find_incompleteness(FULL, 24, BOOK_PAGES) is None
+
+
+def test_incomplete_chapter_lists():
+    assert find_incompleteness(_structure([]), 24, BOOK_PAGES) == IncompleteReason.NO_CHAPTERS
+    assert (
+        find_incompleteness(_structure([1, 15], first_chapter_physical_page=12), 12, BOOK_PAGES)
+        == IncompleteReason.FIRST_CHAPTER_OUTSIDE_WINDOW
+    )
+    # Chapter headings read from the scanned pages, the next ones are beyond them
+    assert find_incompleteness(_structure([1, 14]), 24, BOOK_PAGES) == IncompleteReason.LAST_CHAPTER_AT_WINDOW_END
+    assert find_incompleteness(_structure([1, 10, 20, 120]), 24, BOOK_PAGES) == IncompleteReason.PAGE_GAP
+    assert find_incompleteness(TRUNCATED, 24, BOOK_PAGES) == IncompleteReason.BOOK_NOT_COVERED
+
+
+def test_whole_document_window_is_complete():
+    assert find_incompleteness(_structure([]), 20, 20) is None
+
+
+def test_window_grows_until_the_list_looks_complete():
+    windows = []
+
+    def detect(window):
+        windows.append(window)
+        return FULL if window >= 48 else TRUNCATED
+
+    structure, pages = detect_with_adaptive_window(detect, BOOK_PAGES, "book.pdf")
+
+    assert windows == [12, 24, 48]
+    assert structure is FULL and pages == 48
+
+
+def test_window_stops_at_its_limits():
+    windows = []
+
+    def detect(window):
+        windows.append(window)
+        return None
+
+    assert detect_with_adaptive_window(detect, BOOK_PAGES, "book.pdf", max_pages=60) == (None, 60)
+    assert windows == [12, 24, 48, 60]
+
+    windows.clear()
+    assert detect_with_adaptive_window(detect, 20, "notes.pdf")[1] == 20
+    assert windows == [12, 20]
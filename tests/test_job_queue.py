@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from easy_study_flashcards.job_queue import JobQueue, JobStatus, QueueWorker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def job_queue(tmp_path, clock):
+    with JobQueue(str(tmp_path / "queue.sqlite"), lease_seconds=60, max_attempts=2, clock=clock) as job_queue:
+        yield job_queue
+
+
+def test_jobs_are_leased_once_in_order(job_queue):
+    assert job_queue.enqueue("/books/a_chapters/Chapter_1.pdf", "a")
+    assert job_queue.enqueue("/books/a_chapters/Chapter_2.pdf", "a", "algebra")
+    assert not job_queue.enqueue("/books/a_chapters/Chapter_1.pdf", "a")
+
+    first = job_queue.claim("worker-1")
+    second = job_queue.claim("worker-2")
+
+    assert first.chapter_path.endswith("Chapter_1.pdf") and first.attempts == 1
+    assert second.subject_matter == "algebra"
+    assert job_queue.claim("worker-3") is None
+    assert job_queue.counts() == {JobStatus.RUNNING.value: 2}
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_ignored(job_queue, clock):
+    job_queue.enqueue("/books/a_chapters/Chapter_1.pdf", "a")
+    job = job_queue.claim("dead-worker")
+
+    clock.now += 30
+    assert job_queue.heartbeat(job.id, "dead-worker")
+    clock.now += 59
+    assert job_queue.claim("worker-2") is None
+
+    clock.now += 2
+    reclaimed = job_queue.claim("worker-2")
+    assert reclaimed.id == job.id and reclaimed.attempts == 2
+
+    assert not job_queue.heartbeat(job.id, "dead-worker")
+    assert not job_queue.finish(job.id, "dead-worker", succeeded=True)
+    assert job_queue.finish(job.id, "worker-2", succeeded=True)
+    assert job_queue.is_drained()
+
+
+def test_job_failing_its_leases_too_often_is_failed(job_queue, clock):
+    job_queue.enqueue("/books/a_chapters/Chapter_1.pdf", "a")
+    job_queue.claim("worker-1")
+    clock.now += 61
+    job_queue.claim("worker-2")
+    clock.now += 61
+
+    assert job_queue.claim("worker-3") is None
+    assert job_queue.counts() == {JobStatus.FAILED.value: 1}
+
+
+def test_finished_chapter_can_be_queued_again(job_queue):
+    job_queue.enqueue("/books/a_chapters/Chapter_1.pdf", "a")
+    job = job_queue.claim("worker-1")
+    job_queue.finish(job.id, "worker-1", succeeded=True)
+
+    assert job_queue.enqueue("/books/a_chapters/Chapter_1.pdf", "a")
+    again = job_queue.claim("worker-1")
+    assert again.id == job.id and again.attempts == 1
+
+
+def test_worker_records_failures(job_queue):
+    job_queue.enqueue("/books/a_chapters/Chapter_1.pdf", "a")
+    job_queue.enqueue("/books/a_chapters/Chapter_2.pdf", "a")
+
+    def process(job):
+        if job.chapter_path.endswith("2.pdf"):
+            raise RuntimeError("xelatex crashed")
+        return True
+
+    worker = QueueWorker(job_queue, process, worker_id="worker-1", poll_interval_seconds=0)
+    worker.run(exit_when_drained=True)
+
+    assert worker.processed == 2
+    assert job_queue.counts() == {JobStatus.DONE.value: 1, JobStatus.FAILED.value: 1}
+
+
+# --- Several processes ---
+
+
+def _record_chapter(done_folder, job):
+    time.sleep(0.05)
+    with open(os.path.join(done_folder, f"{job.id}-{os.getpid()}"), "w"):
+        pass
+    return True
+
+
+def _run_worker(queue_path, done_folder):
+    with JobQueue(queue_path, lease_seconds=1.0) as job_queue:
+        QueueWorker(
+            job_queue, lambda job: _record_chapter(done_folder, job), poll_interval_seconds=0.05
+        ).run(exit_when_drained=True)
+
+
+def _die_holding_a_job(queue_path):
+    with JobQueue(queue_path, lease_seconds=1.0) as job_queue:
+        job_queue.claim("doomed-worker")
+    os._exit(1)
+
+
+def test_several_processes_share_the_queue(tmp_path):
+    queue_path = str(tmp_path / "queue.sqlite")
+    done_folder = tmp_path / "done"
+    done_folder.mkdir()
+    with JobQueue(queue_path) as job_queue:
+        for chapter in range(20):
+            job_queue.enqueue(f"/books/a_chapters/Chapter_{chapter}.pdf", "a")
+
+    context = multiprocessing.get_context("spawn")
+    doomed = context.Process(target=_die_holding_a_job, args=(queue_path,))
+    doomed.start()
+    doomed.join(timeout=60)
+
+    workers = [context.Process(target=_run_worker, args=(queue_path, str(done_folder))) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    done = os.listdir(done_folder)
+    # Every chapter exactly once, the one of the dead worker included
+    assert sorted(int(name.split("-")[0]) for name in done) == list(range(1, 21))
+    with JobQueue(queue_path) as job_queue:
+        assert job_queue.counts() == {JobStatus.DONE.value: 20}
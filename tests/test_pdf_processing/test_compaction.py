@@ -0,0 +1,71 @@
+import io
+import time
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+from easy_study_flashcards.pdf_processing.compaction import (
+    CompactionOptions,
+    compact_pdf_bytes,
+)
+
+
+def _chapter_bytes(algebra_pdf, start: int, end: int) -> bytes:
+    """Copies a page range the same way split_pdf_by_chapters does"""
+    reader = PdfReader(algebra_pdf)
+    writer = PdfWriter()
+    for i in range(start, end):
+        writer.add_page(reader.pages[i])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_compaction_keeps_pages(algebra_pdf):
+    original = _chapter_bytes(algebra_pdf, 8, 30)
+    result = compact_pdf_bytes(original, CompactionOptions())
+
+    assert result.original_size == len(original)
+    assert result.compacted_size <= result.original_size
+    assert len(PdfReader(io.BytesIO(result.data)).pages) == 22
+
+
+def test_images_above_target_dpi_are_downsampled():
+    Image = pytest.importorskip("PIL.Image")
+    # An 8x8 inch page fully covered by a 300 DPI image
+    image = Image.effect_noise((2400, 2400), 60).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PDF", resolution=300.0)
+
+    result = compact_pdf_bytes(buffer.getvalue(), CompactionOptions(target_dpi=100))
+    assert result.images_downsampled == 1
+    assert result.bytes_saved > 0
+    compacted_image = PdfReader(io.BytesIO(result.data)).pages[0].images[0].image
+    assert compacted_image.width == 800
+
+
+def test_invalid_pdf_is_left_untouched():
+    result = compact_pdf_bytes(b"not a pdf", CompactionOptions())
+    assert result.data == b"not a pdf"
+    assert result.bytes_saved == 0
+
+
+def test_benchmark_compaction_on_asset(algebra_pdf):
+    """Reports the bytes saved on every chapter-sized slice of the test book"""
+    reader = PdfReader(algebra_pdf)
+    slices = [(start, min(start + 20, len(reader.pages))) for start in range(8, len(reader.pages), 20)]
+
+    total_original = 0
+    total_compacted = 0
+    started = time.perf_counter()
+    for start, end in slices:
+        result = compact_pdf_bytes(_chapter_bytes(algebra_pdf, start, end), CompactionOptions())
+        total_original += result.original_size
+        total_compacted += result.compacted_size
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"\ncompaction: {total_original} -> {total_compacted} bytes "
+        f"({total_original - total_compacted} saved) in {elapsed:.2f}s over {len(slices)} chapters"
+    )
+    assert total_compacted <= total_original
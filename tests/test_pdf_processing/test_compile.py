@@ -0,0 +1,167 @@
+import shutil
+import subprocess
+import time
+
+import pytest
+
+from easy_study_flashcards.pdf_processing import core
+from easy_study_flashcards.pdf_processing.core import PDFProcessor
+
+DOCUMENT = "\\documentclass{article}\n\\begin{document}\nHello\n\\end{document}\n"
+
+
+def test_compile_is_fail_fast_and_time_bounded(tmp_path, monkeypatch):
+    calls = []
+
+    def hanging_run(command, **kwargs):
+        calls.append((command, kwargs))
+        raise subprocess.TimeoutExpired(command, kwargs["timeout"])
+
+    monkeypatch.setattr(core, "get_xelatex_path", lambda: "xelatex")
+    monkeypatch.setattr(core.subprocess, "run", hanging_run)
+
+    is_valid, error = PDFProcessor.validate_and_compile_latex_to_pdf(
+        DOCUMENT, str(tmp_path), "chapter", timeout_seconds=5
+    )
+
+    assert not is_valid
+    assert "5 seconds" in error
+    command, kwargs = calls[0]
+    assert "-halt-on-error" in command and "-interaction=nonstopmode" in command
+    assert kwargs["timeout"] == 5
+    assert kwargs["stdin"] == subprocess.DEVNULL
+
+
+def test_error_is_read_from_the_log(tmp_path, monkeypatch):
+    def failing_run(command, **kwargs):
+        (tmp_path / "chapter.log").write_text(
+            "./chapter.tex:3: Undefined control sequence.\nl.3 \\foo\n    \n"
+        )
+
+        class Result:
+            returncode = 1
+            stderr = ""
+
+        return Result()
+
+    monkeypatch.setattr(core, "get_xelatex_path", lambda: "xelatex")
+    monkeypatch.setattr(core.subprocess, "run", failing_run)
+
+    is_valid, error = PDFProcessor.validate_and_compile_latex_to_pdf(DOCUMENT, str(tmp_path), "chapter")
+    assert not is_valid
+    assert error == "./chapter.tex:3: Undefined control sequence.\n    \\foo"
+    # The log is cleaned up, the source is kept
+    assert not (tmp_path / "chapter.log").exists()
+    assert (tmp_path / "chapter.tex").exists()
+
+
+def test_validation_skips_pdf_output_and_the_driver_writes_it(tmp_path, monkeypatch):
+    commands = []
+
+    def fake_run(command, **kwargs):
+        commands.append(command)
+        if "-no-pdf" in command:
+            (tmp_path / "chapter.xdv").write_bytes(b"xdv")
+        else:
+            (tmp_path / "chapter.pdf").write_bytes(b"%PDF-1.4")
+
+        class Result:
+            returncode = 0
+            stderr = ""
+
+        return Result()
+
+    monkeypatch.setattr(core, "get_xelatex_path", lambda: "/texlive/bin/xelatex")
+    monkeypatch.setattr(core.shutil, "which", lambda name, path=None: f"/texlive/bin/{name}")
+    monkeypatch.setattr(core.subprocess, "run", fake_run)
+
+    assert PDFProcessor.validate_and_compile_latex_to_pdf(
+        DOCUMENT, str(tmp_path), "chapter", produce_pdf=False
+    ) == (True, "")
+    assert (tmp_path / "chapter.xdv").exists()
+    assert not (tmp_path / "chapter.pdf").exists()
+
+    assert PDFProcessor.convert_xdv_to_pdf(str(tmp_path), "chapter")
+    assert commands[1][0] == "/texlive/bin/xdvipdfmx"
+    assert (tmp_path / "chapter.pdf").exists()
+    assert not (tmp_path / "chapter.xdv").exists()
+    # Nothing left to convert: the caller compiles to PDF instead
+    assert not PDFProcessor.convert_xdv_to_pdf(str(tmp_path), "chapter")
+
+
+@pytest.mark.parametrize("returncode, produce_pdf", [(1, False), (0, True)])
+def test_xdv_is_removed_unless_left_for_the_driver(tmp_path, monkeypatch, returncode, produce_pdf):
+    exit_code = returncode
+
+    def fake_run(command, **kwargs):
+        (tmp_path / "chapter.xdv").write_bytes(b"xdv")
+
+        class Result:
+            returncode = exit_code
+            stderr = "error"
+
+        return Result()
+
+    monkeypatch.setattr(core, "get_xelatex_path", lambda: "xelatex")
+    monkeypatch.setattr(core.subprocess, "run", fake_run)
+
+    PDFProcessor.validate_and_compile_latex_to_pdf(DOCUMENT, str(tmp_path), "chapter", produce_pdf=produce_pdf)
+    assert not (tmp_path / "chapter.xdv").exists()
+
+
+def test_xdv_of_a_timed_out_validation_is_removed(tmp_path, monkeypatch):
+    def hanging_run(command, **kwargs):
+        (tmp_path / "chapter.xdv").write_bytes(b"partial xdv")
+        raise subprocess.TimeoutExpired(command, kwargs["timeout"])
+
+    monkeypatch.setattr(core, "get_xelatex_path", lambda: "xelatex")
+    monkeypatch.setattr(core.subprocess, "run", hanging_run)
+
+    assert not PDFProcessor.validate_and_compile_latex_to_pdf(
+        DOCUMENT, str(tmp_path), "chapter", timeout_seconds=5, produce_pdf=False
+    )[0]
+    assert not (tmp_path / "chapter.xdv").exists()
+
+
+def test_unloadable_format_is_discarded_and_the_compile_retried(tmp_path, monkeypatch):
+    format_base = tmp_path / "preamble-stale"
+    format_base.with_suffix(".fmt").write_bytes(b"format of another xelatex")
+    commands = []
+
+    def fake_run(command, **kwargs):
+        commands.append(command)
+
+        class Result:
+            # TeX stops before writing the log when the format can't be loaded
+            returncode = 1 if any(arg.startswith("-fmt=") for arg in command) else 0
+            stderr = ""
+
+        return Result()
+
+    monkeypatch.setattr(core, "get_xelatex_path", lambda: "xelatex")
+    monkeypatch.setattr(core, "get_or_build_format", lambda preamble, xelatex_exe: str(format_base))
+    monkeypatch.setattr(core.subprocess, "run", fake_run)
+
+    assert PDFProcessor.validate_and_compile_latex_to_pdf(
+        DOCUMENT, str(tmp_path), "chapter", use_precompiled_preamble=True
+    ) == (True, "")
+    assert [any(arg.startswith("-fmt=") for arg in command) for command in commands] == [True, False]
+    assert not format_base.with_suffix(".fmt").exists()
+
+
+@pytest.mark.skipif(shutil.which("xelatex") is None, reason="xelatex not installed")
+def test_benchmark_validation_without_pdf(tmp_path):
+    """Time of a validation compile against a full compile, i.e. the saving of every rejected attempt"""
+    document = DOCUMENT.replace("Hello", "Hello $x^2$ \\textbf{bold} \\texttt{mono}\n\n" * 200)
+    timings = {}
+    for produce_pdf in (True, False):
+        PDFProcessor.validate_and_compile_latex_to_pdf(document, str(tmp_path), "warmup", produce_pdf=produce_pdf)
+        started = time.perf_counter()
+        is_valid, error = PDFProcessor.validate_and_compile_latex_to_pdf(
+            document, str(tmp_path), "chapter", produce_pdf=produce_pdf
+        )
+        timings[produce_pdf] = time.perf_counter() - started
+        assert is_valid, error
+
+    print(f"\nfull compile {timings[True]:.2f}s, validation {timings[False]:.2f}s, "
+          f"saved per rejected attempt {timings[True] - timings[False]:.2f}s")
@@ -0,0 +1,154 @@
+import os
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, NameObject
+
+from easy_study_flashcards.gemini.models import BookStructure, ChapterInfo
+from easy_study_flashcards.pdf_processing.fingerprint import BookManifest, page_fingerprint, pdf_fingerprint
+from easy_study_flashcards import pipeline
+from easy_study_flashcards.pipeline import PipelineSettings, get_chapter_folder, process_book, result_pdf_path
+
+
+def _write_book(path, page_marks, compress=False, title=None):
+    """A PDF whose pages only differ by their content stream."""
+    writer = PdfWriter()
+    for mark in page_marks:
+        page = writer.add_blank_page(width=200, height=200)
+        stream = DecodedStreamObject()
+        stream.set_data(f"q 1 0 0 1 {mark} 0 cm 0 0 10 10 re f Q".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        if compress:
+            page.compress_content_streams()
+    if title:
+        writer.add_metadata({"/Title": title})
+    writer.write(path)
+
+
+def test_fingerprint_ignores_file_bytes_but_not_content(tmp_path):
+    _write_book(tmp_path / "a.pdf", [1, 2, 3])
+    _write_book(tmp_path / "b.pdf", [1, 2, 3], compress=True, title="Revised")
+    _write_book(tmp_path / "c.pdf", [1, 2, 4])
+
+    assert (tmp_path / "a.pdf").read_bytes() != (tmp_path / "b.pdf").read_bytes()
+    assert pdf_fingerprint(tmp_path / "a.pdf") == pdf_fingerprint(tmp_path / "b.pdf")
+    assert pdf_fingerprint(tmp_path / "a.pdf") != pdf_fingerprint(tmp_path / "c.pdf")
+
+    pages_a, pages_c = PdfReader(tmp_path / "a.pdf").pages, PdfReader(tmp_path / "c.pdf").pages
+    assert page_fingerprint(pages_a[1]) == page_fingerprint(pages_c[1])
+
+
+def test_manifest_round_trip_and_bad_files(tmp_path):
+    manifest = BookManifest(total_pages=3, detection_fingerprint="abc", chapters={"Chapter_1.pdf": "f1"})
+    manifest.save(str(tmp_path))
+
+    loaded = BookManifest.load(str(tmp_path))
+    assert loaded == manifest
+    assert loaded.is_up_to_date("Chapter_1.pdf", "f1")
+    assert not loaded.is_up_to_date("Chapter_1.pdf", "f2")
+    assert loaded.reusable_structure(3, "abc") is None  # nothing stored
+    assert BookManifest.load(str(tmp_path / "missing")) == BookManifest()
+
+    with open(BookManifest.path_in(str(tmp_path)), "w") as manifest_file:
+        manifest_file.write("{not json")
+    assert BookManifest.load(str(tmp_path)) == BookManifest()
+
+
+class StructureClient:
+    def __init__(self, chapters=None):
+        self.requests = 0
+        self.chapters = chapters or [
+            ChapterInfo(title="Groups", start_page=1),
+            ChapterInfo(title="Rings", start_page=4),
+        ]
+
+    def generate_content_with_rate_limit(self, **kwargs):
+        self.requests += 1
+        structure = BookStructure(chapters=self.chapters, first_chapter_physical_page=1)
+
+        class Response:
+            parsed = structure
+            text = None
+
+        return Response()
+
+
+@pytest.fixture
+def generated(monkeypatch):
+    """Records the chapters sent to generation and writes their results as a valid run would."""
+    calls = []
+
+    def generate_chapters(chapter_folder, client, settings, book_name, chapter_files=None):
+        calls.append(list(chapter_files))
+        os.makedirs(os.path.join(chapter_folder, "results"), exist_ok=True)
+        for chapter_file in chapter_files:
+            open(result_pdf_path(chapter_folder, chapter_file), "wb").close()
+        return list(chapter_files)
+
+    monkeypatch.setattr(pipeline, "generate_chapters", generate_chapters)
+    return calls
+
+
+def test_rerun_generates_only_changed_chapters(tmp_path, generated):
+    book = tmp_path / "book.pdf"
+    _write_book(book, [1, 2, 3, 4, 5, 6])
+    settings = PipelineSettings(
+        subject_matter="algebra",
+        lang="en",
+        single_call_detection=True,
+        pages_to_analyze_for_chapters=2,
+        pages_to_analyze_for_first_chapter_physical_page=2,
+        incremental=True,
+    )
+    client = StructureClient()
+
+    assert process_book(book, client, settings)
+    assert generated == [["Chapter_1-Groups.pdf", "Chapter_2-Rings.pdf"]]
+
+    # Same content, saved differently: nothing is sent at all
+    _write_book(book, [1, 2, 3, 4, 5, 6], compress=True)
+    assert process_book(book, client, settings)
+    assert client.requests == 1
+    assert len(generated) == 1
+
+    # A page of the second chapter changed
+    _write_book(book, [1, 2, 3, 4, 50, 6])
+    assert process_book(book, client, settings)
+    assert client.requests == 1
+    assert generated[-1] == ["Chapter_2-Rings.pdf"]
+
+    # Missing flashcards are generated again
+    os.remove(result_pdf_path(get_chapter_folder(book), "Chapter_1-Groups.pdf"))
+    assert process_book(book, client, settings)
+    assert generated[-1] == ["Chapter_1-Groups.pdf"]
+
+
+def test_resplit_removes_chapters_of_the_earlier_split(tmp_path, generated):
+    book = tmp_path / "book.pdf"
+    _write_book(book, [1, 2, 3, 4, 5, 6])
+    settings = PipelineSettings(
+        subject_matter="algebra",
+        lang="en",
+        single_call_detection=True,
+        pages_to_analyze_for_chapters=2,
+        pages_to_analyze_for_first_chapter_physical_page=2,
+        incremental=True,
+    )
+    three_chapters = [
+        ChapterInfo(title="Groups", start_page=1),
+        ChapterInfo(title="Rings", start_page=3),
+        ChapterInfo(title="Fields", start_page=5),
+    ]
+    assert process_book(book, StructureClient(three_chapters), settings)
+
+    # The first pages changed: the structure is detected again, with two chapters
+    _write_book(book, [10, 2, 3, 4, 5, 6])
+    assert process_book(book, StructureClient(), settings)
+
+    chapter_folder = get_chapter_folder(book)
+    assert sorted(f for f in os.listdir(chapter_folder) if f.endswith(".pdf")) == [
+        "Chapter_1-Groups.pdf",
+        "Chapter_2-Rings.pdf",
+    ]
+    assert generated[-1] == ["Chapter_1-Groups.pdf", "Chapter_2-Rings.pdf"]
+    assert "Chapter_3-Fields.pdf" not in BookManifest.load(chapter_folder).chapters
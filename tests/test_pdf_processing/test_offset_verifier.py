@@ -0,0 +1,98 @@
+import pytest
+from pypdf import PdfReader
+
+from easy_study_flashcards.gemini.models import ChapterInfo
+from easy_study_flashcards.pdf_processing.offset_verifier import (
+    OffsetCheck,
+    PageTextIndex,
+    title_match_score,
+    title_words,
+    verify_chapter_offsets,
+)
+
+# Logical start pages as printed in the table of contents of the test book
+CHAPTERS = [
+    ChapterInfo(title="Chapter 1: Background and Fundamentals of Mathematics", start_page=1),
+    ChapterInfo(title="Groups", start_page=19),
+    ChapterInfo(title="Rings", start_page=37),
+]
+# Logical page 1 is physical page 9
+CORRECT_OFFSET = 9
+
+
+@pytest.fixture(scope="module")
+def page_index(algebra_pdf):
+    return PageTextIndex(PdfReader(algebra_pdf))
+
+
+def test_title_words_drop_numbering():
+    assert title_words("Chapter 2: Groups, Cosets") == ["groups", "cosets"]
+    assert title_match_score(["groups", "cosets"], "chapter 2 groups and more") == 0.5
+
+
+def test_correct_offset_is_verified(page_index):
+    report = verify_chapter_offsets(page_index, CHAPTERS, CORRECT_OFFSET)
+
+    assert [result.check for result in report.results] == [OffsetCheck.VERIFIED] * 3
+    assert report.chapters == CHAPTERS
+    assert report.reliable
+
+
+@pytest.mark.parametrize("wrong_offset", [CORRECT_OFFSET - 2, CORRECT_OFFSET + 3])
+def test_wrong_offset_is_corrected_per_chapter(page_index, wrong_offset):
+    report = verify_chapter_offsets(page_index, CHAPTERS, wrong_offset)
+
+    assert [result.check for result in report.results] == [OffsetCheck.CORRECTED] * 3
+    # The corrected chapters land on the same physical pages as with the right offset
+    assert [wrong_offset + chapter.start_page for chapter in report.chapters] == [
+        CORRECT_OFFSET + chapter.start_page for chapter in CHAPTERS
+    ]
+    assert report.reliable
+
+
+def test_far_off_structure_is_flagged(page_index):
+    report = verify_chapter_offsets(page_index, CHAPTERS, CORRECT_OFFSET + 40)
+    assert not report.reliable
+
+
+def test_only_looked_up_pages_are_extracted(page_index):
+    verify_chapter_offsets(page_index, CHAPTERS[1:2], CORRECT_OFFSET)
+    assert len(page_index._heads) < len(page_index)
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        return self.text
+
+
+class FakeReader:
+    def __init__(self, texts):
+        self.pages = [FakePage(text) for text in texts]
+
+
+# "Groups" starts on physical page 11, the exercises before it mention groups
+GROUPS_BOOK = (
+    ["Sets and functions. A set is a collection of objects."] * 6
+    + ["Exercises. 3. Show that the symmetries of a square form one of the groups we will meet later."] * 4
+    + ["Chapter 2 Groups. A group is a set with an associative operation."]
+    + ["Groups 12. Every subgroup of a cyclic group is cyclic."] * 4
+)
+
+
+def test_title_mentioned_on_earlier_pages_does_not_move_the_chapter():
+    index = PageTextIndex(FakeReader(GROUPS_BOOK))
+    report = verify_chapter_offsets(index, [ChapterInfo(title="Groups", start_page=1)], 11)
+
+    assert [result.check for result in report.results] == [OffsetCheck.VERIFIED]
+    assert report.chapters[0].start_page == 1
+
+
+def test_wrong_prediction_walks_back_through_running_headers_only():
+    index = PageTextIndex(FakeReader(GROUPS_BOOK))
+    # Predicted on physical page 13, inside the running headers of the chapter
+    report = verify_chapter_offsets(index, [ChapterInfo(title="Groups", start_page=1)], 13)
+
+    assert [(result.check, result.shift) for result in report.results] == [(OffsetCheck.CORRECTED, -2)]
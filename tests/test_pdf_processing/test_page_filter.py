@@ -0,0 +1,53 @@
+from pypdf import PdfReader
+
+from easy_study_flashcards.pdf_processing.page_filter import (
+    PageFilterPolicy,
+    PageKind,
+    classify_page,
+    classify_page_features,
+    filter_pages,
+)
+
+
+def test_classify_page_features():
+    """Blank pages, figures, bibliographies and indexes are recognized"""
+    policy = PageFilterPolicy()
+    assert classify_page_features("  12 ", 0.0, policy) == PageKind.BLANK
+    assert classify_page_features("Figure 3.2: the unit circle", 0.8, policy) == PageKind.FIGURE
+    assert classify_page_features("Bibliography\n[1] A. Author, A Book on Groups and Rings, 1998", 0.0, policy) == PageKind.BIBLIOGRAPHY
+
+    citations = "\n".join(f"[{i}] Author {i}, Some title, Publisher, 19{i + 10}." for i in range(12))
+    assert classify_page_features(citations, 0.0, policy) == PageKind.BIBLIOGRAPHY
+
+    content = "\n".join(["A group is a set G with an associative operation."] * 12)
+    assert classify_page_features(content, 0.0, policy) == PageKind.CONTENT
+    assert classify_page_features(content, 0.9, policy) == PageKind.CONTENT
+
+
+def test_years_alone_dont_make_a_bibliography():
+    """Exercises and tables full of numbers like 1998 stay content, author-year citations don't"""
+    policy = PageFilterPolicy()
+    exercises = "\n".join(f"{i}. Compute {1900 + 9 * i} mod 7 and show that {2000 + i} is not prime." for i in range(12))
+    assert classify_page_features(exercises, 0.0, policy) == PageKind.CONTENT
+    table = "\n".join(f"{1850 + 10 * i}   {1900 + 10 * i}   {1950 + i}" for i in range(12))
+    assert classify_page_features(table, 0.0, policy) == PageKind.CONTENT
+
+    author_year = "\n".join(f"Author{i}, A. ({1980 + i}). Some title. Publisher" for i in range(12))
+    assert classify_page_features(author_year, 0.0, policy) == PageKind.BIBLIOGRAPHY
+
+
+def test_index_pages_of_the_book(algebra_pdf):
+    """The analytic index at the end of the book is classified as index"""
+    reader = PdfReader(algebra_pdf)
+    policy = PageFilterPolicy()
+    assert classify_page(reader.pages[143], 143, policy).kind == PageKind.INDEX
+    assert classify_page(reader.pages[10], 10, policy).kind == PageKind.CONTENT
+
+
+def test_filter_pages_respects_policy(algebra_pdf):
+    reader = PdfReader(algebra_pdf)
+    pages = [10, 11, 143, 144]
+
+    assert filter_pages(reader, pages, PageFilterPolicy(), "book.pdf") == [10, 11]
+    keep_index = PageFilterPolicy(drop_kinds={PageKind.BLANK})
+    assert filter_pages(reader, pages, keep_index, "book.pdf") == pages
@@ -0,0 +1,139 @@
+import os
+import time
+import tracemalloc
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+    NumberObject,
+)
+
+from easy_study_flashcards.gemini.models import ChapterInfo
+from easy_study_flashcards.pdf_processing.splitter import (
+    split_pdf_by_chapters,
+    with_used_resources,
+)
+
+IMAGE_SIZE: int = 64 * 1024
+
+
+def _image(writer: PdfWriter):
+    image = DecodedStreamObject()
+    image.set_data(os.urandom(IMAGE_SIZE))  # incompressible, like a real scan
+    image.update(
+        {
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(256),
+            NameObject("/Height"): NumberObject(256),
+            NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+        }
+    )
+    return writer._add_object(image)
+
+
+def _shared_resources_pdf(
+    path: str, pages: int = 6, content_template: str = "q 100 0 0 100 50 50 cm /Im{i} Do Q"
+) -> None:
+    """
+    A book whose pages share one resource dictionary with an image per page,
+    like the ones written by many desktop publishing tools.
+    """
+    writer = PdfWriter()
+    xobjects = DictionaryObject(
+        {NameObject(f"/Im{i}"): _image(writer) for i in range(pages)}
+    )
+    shared = writer._add_object(
+        DictionaryObject(
+            {
+                NameObject("/XObject"): xobjects,
+                NameObject("/ProcSet"): ArrayObject([NameObject("/PDF"), NameObject("/ImageC")]),
+            }
+        )
+    )
+    for i in range(pages):
+        page = writer.add_blank_page(200, 200)
+        stream = DecodedStreamObject()
+        stream.set_data(content_template.format(i=i).encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = shared
+    with open(path, "wb") as output:
+        writer.write(output)
+
+
+def _split(pdf_path, chapters, output_folder, prune_resources: bool):
+    tracemalloc.start()
+    started = time.perf_counter()
+    split_pdf_by_chapters(pdf_path, chapters, 1, str(output_folder), prune_resources=prune_resources)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    total_bytes = sum(os.path.getsize(os.path.join(output_folder, f)) for f in os.listdir(output_folder))
+    return total_bytes, peak, elapsed
+
+
+def test_pruning_keeps_only_used_resources(tmp_path):
+    pdf_path = tmp_path / "shared.pdf"
+    _shared_resources_pdf(str(pdf_path))
+    page = PdfReader(pdf_path).pages[2]
+
+    pruned_page, removed = with_used_resources(page)
+    assert removed == 5
+    resources = pruned_page["/Resources"]
+    assert list(resources["/XObject"].keys()) == ["/Im2"]
+    assert "/ProcSet" in resources
+    # The page of the reader still lists every image
+    assert len(page["/Resources"]["/XObject"]) == 6
+
+
+def test_escaped_names_in_the_content_stream_are_kept(tmp_path):
+    pdf_path = tmp_path / "shared.pdf"
+    _shared_resources_pdf(str(pdf_path), content_template="q 100 0 0 100 50 50 cm /Im#3{i} Do Q")
+    pruned_page, removed = with_used_resources(PdfReader(pdf_path).pages[2])
+
+    assert removed == 5
+    assert list(pruned_page["/Resources"]["/XObject"].keys()) == ["/Im2"]
+
+
+def test_shared_resources_are_not_copied_to_every_chapter(tmp_path):
+    pdf_path = tmp_path / "shared.pdf"
+    _shared_resources_pdf(str(pdf_path))
+    chapters = [
+        ChapterInfo(title="One", start_page=1),
+        ChapterInfo(title="Two", start_page=3),
+    ]
+
+    full_bytes, _, _ = _split(pdf_path, chapters, tmp_path / "full", prune_resources=False)
+    pruned_bytes, _, _ = _split(pdf_path, chapters, tmp_path / "pruned", prune_resources=True)
+
+    # Every file of the full split carries all 6 images, the pruned ones only their own
+    assert full_bytes > 2 * 6 * IMAGE_SIZE
+    assert pruned_bytes < 7 * IMAGE_SIZE
+    first_chapter = PdfReader(tmp_path / "pruned" / "Chapter_1-One.pdf")
+    assert len(first_chapter.pages) == 2
+    assert [
+        list(page["/Resources"]["/XObject"].keys()) for page in first_chapter.pages
+    ] == [["/Im0"], ["/Im1"]]
+
+
+def test_benchmark_split_modes_on_asset(algebra_pdf, tmp_path):
+    """Reports bytes on disk and peak memory of both split modes on the test book"""
+    total_pages = len(PdfReader(algebra_pdf).pages)
+    chapters = [
+        ChapterInfo(title=f"Part {i}", start_page=start)
+        for i, start in enumerate(range(1, total_pages + 1, 30))
+    ]
+
+    full_bytes, full_peak, full_time = _split(algebra_pdf, chapters, tmp_path / "full", False)
+    pruned_bytes, pruned_peak, pruned_time = _split(algebra_pdf, chapters, tmp_path / "pruned", True)
+
+    print(
+        f"\nsource: {os.path.getsize(algebra_pdf)} bytes"
+        f"\nfull split: {full_bytes} bytes, peak {full_peak / 1024:.0f} KiB, {full_time:.2f}s"
+        f"\npruned split: {pruned_bytes} bytes, peak {pruned_peak / 1024:.0f} KiB, {pruned_time:.2f}s"
+    )
+    assert pruned_bytes <= full_bytes
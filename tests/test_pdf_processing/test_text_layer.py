@@ -0,0 +1,52 @@
+import io
+
+from pypdf import PdfReader, PdfWriter
+
+from easy_study_flashcards.pdf_processing.text_layer import (
+    PDF_PAGE_TOKEN_COST,
+    build_text_layer_payload,
+    has_usable_text,
+)
+
+
+def test_has_usable_text():
+    """Short or unreadable text layers are not usable"""
+    assert not has_usable_text("")
+    assert not has_usable_text("Chapter 1")
+    assert has_usable_text("A group is a set with an operation. " * 20)
+    assert not has_usable_text("�" * 400)
+
+
+def test_text_pages_are_sent_as_text(algebra_pdf):
+    """Born-digital pages become text, with a token estimate for both forms"""
+    payload = build_text_layer_payload(algebra_pdf, 8, 12)
+    assert payload is not None
+    assert payload.total_pages == 4
+    assert payload.text_pages == 4
+    assert all(isinstance(segment, str) for segment in payload.segments)
+    assert "--- Page 9 ---" in payload.segments[0]
+    assert payload.estimated_pdf_tokens == 4 * PDF_PAGE_TOKEN_COST
+    assert payload.estimated_tokens > 0
+    assert payload.estimated_saved_tokens == payload.estimated_pdf_tokens - payload.estimated_tokens
+
+
+def test_pages_without_text_fall_back_to_pdf(algebra_pdf, tmp_path):
+    """Pages without a usable text layer are still attached as PDF"""
+    reader = PdfReader(algebra_pdf)
+    writer = PdfWriter()
+    writer.add_page(reader.pages[8])
+    writer.add_blank_page(width=612, height=792)
+    writer.add_page(reader.pages[9])
+    mixed_pdf = tmp_path / "mixed.pdf"
+    with open(mixed_pdf, "wb") as f:
+        writer.write(f)
+
+    payload = build_text_layer_payload(mixed_pdf)
+    assert payload is not None
+    assert (payload.text_pages, payload.pdf_pages) == (2, 1)
+    assert [type(segment) for segment in payload.segments] == [str, bytes, str]
+    assert len(PdfReader(io.BytesIO(payload.segments[1])).pages) == 1
+
+
+def test_invalid_range(algebra_pdf):
+    assert build_text_layer_payload(algebra_pdf, 10, 5) is None
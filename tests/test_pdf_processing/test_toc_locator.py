@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+from pypdf import PdfReader
+
+from easy_study_flashcards.gemini.client import get_chapters_from_gemini
+from easy_study_flashcards.gemini.models import ChapterInfo, ChaptersOnly
+from easy_study_flashcards.pdf_processing.text_layer import InputMode
+from easy_study_flashcards.pdf_processing.toc_locator import (
+    TocLocation,
+    is_toc_page,
+    locate_table_of_contents,
+    map_sent_page_to_physical,
+    starts_first_chapter,
+)
+
+
+def test_toc_pages_are_recognized():
+    toc = "Contents\nPreface ........ ix\n1 Sets .......... 1\n2 Groups ........ 19\n3 Rings 37\n"
+    body = "Theorem 2 Let G be a group.\nThen the identity is unique.\nProof. Suppose e and e' are\n"
+    assert is_toc_page(toc)
+    assert not is_toc_page(body)
+    assert starts_first_chapter("1\nChapter 1\nBackground and Fundamentals")
+    assert not starts_first_chapter("Chapter 2\nGroups")
+
+
+def test_locates_toc_of_asset(algebra_pdf):
+    reader = PdfReader(algebra_pdf)
+    location = locate_table_of_contents(reader)
+
+    assert location == TocLocation(toc_pages=[5, 6], first_chapter_page=8)
+    # 7 pages instead of 30 + 40
+    assert location.pages_to_send(len(reader.pages)) == [5, 6, 7, 8, 9, 10, 11]
+
+
+def test_window_without_first_chapter_follows_toc():
+    location = TocLocation(toc_pages=[3], first_chapter_page=None)
+    assert location.pages_to_send(100, pages_before=1, pages_after=1) == [3, 4, 5, 6]
+    assert location.pages_to_send(5, pages_before=1, pages_after=1) == [3, 4]
+
+
+def test_sent_page_positions_map_to_physical_pages():
+    assert map_sent_page_to_physical(4, [5, 6, 7, 8, 9]) == 9
+    assert map_sent_page_to_physical(0, [5, 6]) is None
+    assert map_sent_page_to_physical(3, [5, 6]) is None
+
+
+class StubClient:
+    """Answers the two detection calls and records how many pages were sent."""
+
+    def __init__(self):
+        self.sent_page_counts = []
+
+    def generate_content_with_rate_limit(self, **kwargs):
+        document = kwargs["contents"][:-1]
+        self.sent_page_counts.append(sum(segment.count("--- Page ") for segment in document))
+        if "response_schema" in kwargs["config"]:
+            return SimpleNamespace(
+                parsed=ChaptersOnly(chapters=[ChapterInfo(title="Background", start_page=1)])
+            )
+        return SimpleNamespace(text="4")
+
+
+def test_detection_sends_only_located_pages(algebra_pdf):
+    client = StubClient()
+    structure = get_chapters_from_gemini(
+        algebra_pdf,
+        "chapters-model",
+        "page-model",
+        client,  # type: ignore
+        lang="en",
+        input_mode=InputMode.TEXT_LAYER,
+        locate_toc=True,
+    )
+
+    assert client.sent_page_counts == [7, 7]
+    # The 4th sent page is the physical page 9, where chapter 1 starts
+    assert structure.first_chapter_physical_page == 9
@@ -0,0 +1,153 @@
+import os
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+from easy_study_flashcards.gemini.client import count_pdf_tokens, estimate_contents_tokens
+from easy_study_flashcards.gemini.routing import DEFAULT_MODEL_PROFILES, UsageReport
+from easy_study_flashcards.pdf_processing.fingerprint import BookManifest
+from easy_study_flashcards.pdf_processing.page_filter import PageFilterPolicy, PageKind
+from easy_study_flashcards.pdf_processing.text_layer import PDF_PAGE_TOKEN_COST, InputMode
+from easy_study_flashcards.pipeline import PipelineSettings, get_chapter_folder
+from easy_study_flashcards.planner import (
+    PAGES_PER_CHAPTER,
+    plan_book,
+    plan_folder,
+    wall_seconds,
+)
+
+
+@pytest.fixture
+def book_folder(tmp_path, algebra_pdf):
+    os.symlink(algebra_pdf, tmp_path / algebra_pdf.name)
+    return tmp_path
+
+
+@pytest.fixture
+def settings():
+    return PipelineSettings(subject_matter="algebra", lang="en")
+
+
+def _write_chapter(path, pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    writer.write(path)
+
+
+def test_unsplit_book_is_cut_into_estimated_chapters(book_folder, algebra_pdf, settings):
+    plan = plan_book(book_folder / algebra_pdf.name, settings)
+
+    assert plan.pages == 146
+    assert not plan.chapters_known
+    assert len(plan.chapters) == -(-146 // PAGES_PER_CHAPTER)
+    assert sum(chapter.input_tokens for chapter in plan.chapters) == 146 * PDF_PAGE_TOKEN_COST
+    # Two detection requests, then a generation and half a correction per chapter
+    assert plan.requests == pytest.approx(2 + 1.5 * len(plan.chapters))
+    assert plan.cost > 0
+
+
+def test_split_book_uses_its_chapter_files(book_folder, algebra_pdf, settings):
+    pdf_path = book_folder / algebra_pdf.name
+    chapter_folder = get_chapter_folder(pdf_path)
+    os.mkdir(chapter_folder)
+    _write_chapter(os.path.join(chapter_folder, "Chapter_1-Groups.pdf"), 4)
+    _write_chapter(os.path.join(chapter_folder, "Chapter_2-Rings.pdf"), 30)
+
+    light_settings = PipelineSettings(
+        subject_matter="algebra", lang="en", light_model="gemini-2.5-flash-lite", small_chapter_pages=8
+    )
+    plan = plan_book(pdf_path, light_settings)
+
+    assert plan.chapters_known
+    assert [(chapter.name, chapter.pages) for chapter in plan.chapters] == [
+        ("Chapter_1-Groups", 4),
+        ("Chapter_2-Rings", 30),
+    ]
+    generation_models = [estimate.model for estimate in plan.estimates[2::2]]
+    assert generation_models == ["gemini-2.5-flash-lite", "gemini-2.5-flash"]
+
+
+def test_text_layer_and_located_toc_change_the_estimate(book_folder, algebra_pdf, settings):
+    pdf_plan = plan_book(book_folder / algebra_pdf.name, settings)
+    text_settings = PipelineSettings(
+        subject_matter="algebra", lang="en", input_mode=InputMode.TEXT_LAYER, locate_toc=True
+    )
+    text_plan = plan_book(book_folder / algebra_pdf.name, text_settings)
+
+    assert text_plan.estimates[0].input_tokens < pdf_plan.estimates[0].input_tokens
+    assert text_plan.input_tokens != pdf_plan.input_tokens
+
+
+def test_adaptive_scan_uses_the_recorded_window(book_folder, algebra_pdf):
+    pdf_path = book_folder / algebra_pdf.name
+    adaptive_settings = PipelineSettings(subject_matter="algebra", lang="en", adaptive_scan=True)
+
+    first_plan = plan_book(pdf_path, adaptive_settings)
+    BookManifest(scan_pages=48).save(get_chapter_folder(pdf_path))
+    recorded_plan = plan_book(pdf_path, adaptive_settings)
+
+    assert [estimate.input_tokens for estimate in first_plan.estimates[:2]] == [12 * PDF_PAGE_TOKEN_COST] * 2
+    assert [estimate.input_tokens for estimate in recorded_plan.estimates[:2]] == [48 * PDF_PAGE_TOKEN_COST] * 2
+
+
+def test_counted_tokens_rescale_the_chapters(book_folder, algebra_pdf, settings):
+    counted_batches = []
+
+    def count_tokens(pdf_paths, model_name):
+        counted_batches.append((pdf_paths, model_name))
+        return 146 * PDF_PAGE_TOKEN_COST * 2
+
+    plan = plan_book(book_folder / algebra_pdf.name, settings, count_tokens=count_tokens)
+
+    assert counted_batches == [([book_folder / algebra_pdf.name], "gemini-2.5-flash")]
+    assert sum(chapter.input_tokens for chapter in plan.chapters) == pytest.approx(
+        146 * PDF_PAGE_TOKEN_COST * 2, abs=len(plan.chapters)
+    )
+
+
+def test_wall_time_respects_latency_and_rate_limit(book_folder, algebra_pdf, settings):
+    plan = plan_book(book_folder / algebra_pdf.name, settings, UsageReport(DEFAULT_MODEL_PROFILES))
+
+    assert wall_seconds(plan, 1000) == pytest.approx(plan.latency_seconds)
+    assert wall_seconds(plan, 1) >= plan.requests * 60
+
+
+def test_plan_folder_sends_nothing(book_folder, settings):
+    plans = plan_folder(str(book_folder), settings, requests_per_minute=10)
+    assert [plan.book for plan in plans] == [os.listdir(book_folder)[0]]
+
+
+class CountingModels:
+    """Counts the tokens of the contents locally instead of calling the API"""
+
+    def count_tokens(self, model, contents):
+        class Count:
+            total_tokens = estimate_contents_tokens(contents)
+
+        return Count()
+
+
+class CountingClient:
+    models = CountingModels()
+
+
+def test_counted_tokens_use_the_page_filter(tmp_path, algebra_pdf):
+    writer = PdfWriter()
+    for page in PdfReader(algebra_pdf).pages[20:24]:
+        writer.add_page(page)
+    for _ in range(3):
+        writer.add_blank_page(width=612, height=792)
+    chapter_path = tmp_path / "chapter.pdf"
+    writer.write(chapter_path)
+
+    unfiltered = count_pdf_tokens(CountingClient(), [chapter_path], "gemini-2.5-flash")
+    filtered = count_pdf_tokens(
+        CountingClient(),
+        [chapter_path],
+        "gemini-2.5-flash",
+        page_filter_policy=PageFilterPolicy(drop_kinds={PageKind.BLANK}),
+    )
+
+    assert unfiltered == 7 * PDF_PAGE_TOKEN_COST
+    assert filtered == 4 * PDF_PAGE_TOKEN_COST
@@ -0,0 +1,114 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from easy_study_flashcards.service import FlashcardService, Job, JobStatus
+
+
+class StubPipeline:
+    """Records the processed jobs instead of calling Gemini"""
+
+    def __init__(self, fail_on=None):
+        self.processed = []
+        self.fail_on = fail_on
+        self.lock = threading.Lock()
+
+    def __call__(self, job: Job) -> bool:
+        with self.lock:
+            self.processed.append(job.pdf_path)
+        if self.fail_on and job.pdf_path.endswith(self.fail_on):
+            raise RuntimeError("broken book")
+        return True
+
+
+@pytest.fixture
+def service():
+    pipeline = StubPipeline(fail_on="broken.pdf")
+    service = FlashcardService(pipeline, poll_interval_seconds=0.05)
+    service.pipeline = pipeline
+    yield service
+    service.stop()
+
+
+def _request(service, method, path, payload=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{service.port}{path}", data=data, method=method
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_jobs_are_processed_in_order(service, tmp_path):
+    service.start(port=None)
+    first = service.submit(str(tmp_path / "a.pdf"))
+    second = service.submit(str(tmp_path / "broken.pdf"), subject_matter="Algebra")
+
+    assert service.wait_until_idle(timeout_seconds=5)
+    assert service.pipeline.processed == [first.pdf_path, second.pdf_path]
+    assert first.status == JobStatus.DONE
+    assert second.status == JobStatus.FAILED
+    assert second.error == "broken book"
+
+
+def test_exiting_job_does_not_stop_the_worker(tmp_path):
+    def process_job(job):
+        if job.pdf_path.endswith("exit.pdf"):
+            exit()
+        return True
+
+    service = FlashcardService(process_job, poll_interval_seconds=0.05)
+    service.start(port=None)
+    try:
+        exiting = service.submit(str(tmp_path / "exit.pdf"))
+        following = service.submit(str(tmp_path / "b.pdf"))
+
+        assert service.wait_until_idle(timeout_seconds=5)
+        assert exiting.status == JobStatus.FAILED
+        assert following.status == JobStatus.DONE
+    finally:
+        service.stop()
+
+
+def test_http_api(service, tmp_path):
+    book = tmp_path / "book.pdf"
+    book.write_bytes(b"%PDF-1.4")
+    service.start(port=0)
+
+    status, job = _request(service, "POST", "/jobs", {"pdf_path": str(book), "subject_matter": "Physics"})
+    assert status == 202
+    assert job["subject_matter"] == "Physics"
+    assert service.wait_until_idle(timeout_seconds=5)
+
+    status, fetched = _request(service, "GET", f"/jobs/{job['id']}")
+    assert status == 200
+    assert fetched["status"] == "done"
+
+    status, jobs = _request(service, "GET", "/jobs")
+    assert [j["id"] for j in jobs] == [job["id"]]
+
+    assert _request(service, "POST", "/jobs", {"pdf_path": str(tmp_path / "missing.pdf")})[0] == 400
+    assert _request(service, "GET", "/jobs/unknown")[0] == 404
+    assert _request(service, "GET", "/health")[1]["status"] == "ok"
+
+
+def test_watched_folder_waits_for_complete_files(tmp_path):
+    pipeline = StubPipeline()
+    service = FlashcardService(pipeline, watch_folder=str(tmp_path))
+    (tmp_path / "book.pdf").write_bytes(b"%PDF-1.4")
+    (tmp_path / "done.pdf").write_bytes(b"%PDF-1.4")
+    (tmp_path / "done_chapters").mkdir()
+    (tmp_path / "notes.txt").write_text("not a book")
+
+    # The first scan only records the size of the new file
+    assert service.scan_watch_folder() == []
+    queued = service.scan_watch_folder()
+    assert [job.pdf_path for job in queued] == [str(tmp_path / "book.pdf")]
+    # Already queued files are not queued again
+    assert service.scan_watch_folder() == []
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+import easy_study_flashcards
+from easy_study_flashcards.gemini.chapter_scheduler import SchedulePolicy
+from easy_study_flashcards.gemini.prompts import GenerationMode
+from easy_study_flashcards.gemini.routing import Stage
+from easy_study_flashcards.pdf_processing.page_filter import PageKind
+from easy_study_flashcards.pdf_processing.text_layer import InputMode
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["google.genai", "pypdf", "stockholm", "requests", "pydantic"]
+# Cumulative import time of the package, in microseconds
+IMPORT_TIME_BUDGET_US = 150_000
+
+
+def _import_times(args: List[str]) -> Dict[str, int]:
+    """Runs python -X importtime and returns the cumulative time of every imported module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self, cumulative, module = line.split(":", 1)[1].split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_package_import_is_within_budget():
+    times = _import_times(["-c", "import easy_study_flashcards"])
+    assert times["easy_study_flashcards"] < IMPORT_TIME_BUDGET_US
+    for module in HEAVY_MODULES:
+        assert module not in times, f"{module} is imported eagerly"
+
+
+def test_help_does_not_load_the_sdk():
+    times = _import_times(["-m", "easy_study_flashcards", "--help"])
+    for module in HEAVY_MODULES:
+        assert module not in times, f"{module} is imported by --help"
+
+
+def test_empty_folder_exits_before_loading_the_sdk(tmp_path):
+    times = _import_times(["-m", "easy_study_flashcards", str(tmp_path)])
+    assert "easy_study_flashcards.utils.localization" in times
+    for module in HEAVY_MODULES:
+        assert module not in times, f"{module} is imported for an empty folder"
+
+
+def test_cli_choices_match_enums():
+    assert easy_study_flashcards.INPUT_MODES == [mode.value for mode in InputMode]
+    assert easy_study_flashcards.DROPPABLE_PAGE_KINDS == [
+        kind.value for kind in PageKind if kind != PageKind.CONTENT
+    ]
+    assert easy_study_flashcards.GENERATION_MODES == [mode.value for mode in GenerationMode]
+    assert easy_study_flashcards.SCHEDULE_POLICIES == [policy.value for policy in SchedulePolicy]
+    assert easy_study_flashcards.STAGES == [stage.value for stage in Stage]
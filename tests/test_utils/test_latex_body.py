@@ -0,0 +1,72 @@
+import pytest
+
+from easy_study_flashcards.gemini.prompts import GenerationMode, PromptsForGemini
+from easy_study_flashcards.utils import latex
+from easy_study_flashcards.utils.latex import (
+    LATEX_PREAMBLE,
+    XelatexNotFoundError,
+    extract_latex_body,
+    get_xelatex_path,
+    is_latex_body,
+    shift_error_line_numbers,
+    wrap_latex_body,
+)
+
+BODY = r"""\section*{Extracted Content}
+\begin{enumerate}
+    \item \textbf{Definition 1.1:} A group is a set with an associative operation.
+\end{enumerate}"""
+
+
+def test_wrap_and_extract_round_trip():
+    document = wrap_latex_body(BODY)
+    assert document.startswith(r"\documentclass{article}")
+    assert document.rstrip().endswith(r"\end{document}")
+    assert extract_latex_body(document) == BODY
+    # A body without the document environment is returned as it is
+    assert extract_latex_body("\n" + BODY + "\n") == BODY
+
+
+def test_body_check():
+    assert is_latex_body(BODY)
+    assert not is_latex_body("   ")
+    assert not is_latex_body(r"\documentclass{article}" + "\n" + BODY)
+    assert not is_latex_body(r"\usepackage{tikz}" + "\n" + BODY)
+
+
+def test_error_lines_are_relative_to_the_body():
+    preamble_lines = LATEX_PREAMBLE.count("\n")
+    error = f"./results/chapter-domande.tex:{preamble_lines + 3}: Undefined control sequence."
+    assert shift_error_line_numbers(error, preamble_lines) == (
+        "./results/chapter-domande.tex:3: Undefined control sequence."
+    )
+    assert shift_error_line_numbers("! Emergency stop.", preamble_lines) == "! Emergency stop."
+
+
+@pytest.mark.parametrize("lang", ["en", "it"])
+def test_body_prompts_do_not_ask_for_the_preamble(lang):
+    full_prompt = PromptsForGemini.get_prompt_to_elaborate_single_pdf(lang, "Algebra")
+    body_prompt = PromptsForGemini.get_prompt_to_elaborate_single_pdf(
+        lang, "Algebra", GenerationMode.BODY_ONLY
+    )
+    correction_prompt = PromptsForGemini.get_prompt_for_error_correction(
+        lang, "line 3: error", GenerationMode.BODY_ONLY
+    )
+
+    assert r"\usepackage{amsmath}" in full_prompt
+    assert r"\usepackage{amsmath}" not in body_prompt
+    assert "Algebra" in body_prompt
+    assert "line 3: error" in correction_prompt
+    assert "`\\documentclass{article}`" not in body_prompt + correction_prompt
+    assert len(body_prompt) < len(full_prompt)
+
+
+def test_missing_xelatex_raises_not_found(monkeypatch):
+    monkeypatch.setattr(latex.shutil, "which", lambda name: None)
+    monkeypatch.setattr(latex.os, "name", "posix")
+    get_xelatex_path.cache_clear()
+    try:
+        with pytest.raises(XelatexNotFoundError):
+            get_xelatex_path()
+    finally:
+        get_xelatex_path.cache_clear()
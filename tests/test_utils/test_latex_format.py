@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+from easy_study_flashcards.utils import latex_format
+from easy_study_flashcards.utils.latex_format import (
+    format_name_for,
+    get_or_build_format,
+    is_format_failure,
+    preamble_hash,
+    split_preamble,
+)
+
+PREAMBLE = r"""\documentclass{article}
+\usepackage{amsmath} % For advanced math equations
+\usepackage{amssymb}
+\usepackage{enumitem}
+\usepackage{hyperref}
+\usepackage{xcolor}
+\usepackage{listings}
+"""
+DOCUMENT = PREAMBLE + r"""\begin{document}
+\section*{Extracted Content}
+\begin{enumerate}
+    \item \textbf{Theorem 1.1:} $a^2 + b^2 = c^2$. \par \textbf{Proof:}
+\end{enumerate}
+\end{document}
+"""
+
+
+def test_split_preamble():
+    preamble, body = split_preamble(DOCUMENT)
+    assert preamble == PREAMBLE
+    assert body.startswith(r"\begin{document}")
+    assert split_preamble(r"\section{No preamble}") is None
+
+
+def test_hash_ignores_comments_and_indentation():
+    reformatted = PREAMBLE.replace("\\usepackage{xcolor}", "    \\usepackage{xcolor} % colors\n")
+    assert preamble_hash(reformatted) == preamble_hash(PREAMBLE)
+    assert preamble_hash(PREAMBLE + "\\usepackage{courier}") != preamble_hash(PREAMBLE)
+
+
+def test_format_is_built_once(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_run(command, cwd, **kwargs):
+        calls.append(command)
+        job_name = next(arg for arg in command if arg.startswith("-jobname=")).split("=", 1)[1]
+        with open(os.path.join(cwd, job_name + ".fmt"), "wb") as f:
+            f.write(b"format")
+
+        class Result:
+            returncode = 0
+            stdout = ""
+
+        return Result()
+
+    monkeypatch.setattr(latex_format, "engine_identity", lambda xelatex_exe: "XeTeX 3.141592653")
+    monkeypatch.setattr(latex_format.subprocess, "run", fake_run)
+
+    first = get_or_build_format(PREAMBLE, "xelatex", cache_dir=tmp_path)
+    second = get_or_build_format(PREAMBLE, "xelatex", cache_dir=tmp_path)
+    assert first == second
+    assert os.path.exists(first + ".fmt")
+    assert len(calls) == 1
+    assert "mylatexformat.ltx" in calls[0]
+
+
+def test_failed_format_is_not_retried(tmp_path, monkeypatch):
+    calls = []
+
+    def failing_run(command, cwd, **kwargs):
+        calls.append(command)
+
+        class Result:
+            returncode = 1
+            stdout = "! LaTeX Error: File `mylatexformat.ltx' not found."
+
+        return Result()
+
+    monkeypatch.setattr(latex_format, "engine_identity", lambda xelatex_exe: "XeTeX 3.141592653")
+    monkeypatch.setattr(latex_format.subprocess, "run", failing_run)
+    preamble = PREAMBLE + "\\usepackage{missing-package}"
+
+    assert get_or_build_format(preamble, "xelatex", cache_dir=tmp_path) is None
+    assert get_or_build_format(preamble, "xelatex", cache_dir=tmp_path) is None
+    assert len(calls) == 1
+
+
+def test_format_name_depends_on_the_xelatex_installation(monkeypatch):
+    monkeypatch.setattr(latex_format, "engine_identity", lambda xelatex_exe: xelatex_exe)
+    assert format_name_for(PREAMBLE, "/texlive/2024/bin/xelatex") != format_name_for(
+        PREAMBLE, "/texlive/2025/bin/xelatex"
+    )
+
+
+def test_format_failure_is_recognized_from_the_log(tmp_path):
+    log = tmp_path / "chapter.log"
+    assert is_format_failure(str(log))
+    log.write_text("---! preamble.fmt made by different executable version, strings are different\n")
+    assert is_format_failure(str(log))
+    log.write_text("This is XeTeX, Version 3.141592653\n! Emergency stop.\n")
+    assert not is_format_failure(str(log))
+
+
+@pytest.mark.skipif(shutil.which("xelatex") is None, reason="xelatex not installed")
+def test_benchmark_compile_time_with_format():
+    """Compile time of one chapter-like document, with and without the precompiled preamble"""
+    from easy_study_flashcards.pdf_processing.core import PDFProcessor
+
+    timings = {}
+    for use_format in (False, True):
+        with tempfile.TemporaryDirectory() as output_dir:
+            # The first compile with the format also builds it, it is not measured
+            PDFProcessor.validate_and_compile_latex_to_pdf(DOCUMENT, output_dir, "warmup", use_format)
+            started = time.perf_counter()
+            is_valid, error = PDFProcessor.validate_and_compile_latex_to_pdf(
+                DOCUMENT, output_dir, "chapter", use_precompiled_preamble=use_format
+            )
+            timings[use_format] = time.perf_counter() - started
+            assert is_valid, error
+
+    print(f"\ncompile time per chapter: {timings[False]:.2f}s without format, {timings[True]:.2f}s with format")
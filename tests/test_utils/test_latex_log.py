@@ -0,0 +1,49 @@
+import io
+
+from easy_study_flashcards.utils.latex_log import iter_latex_errors, parse_latex_log
+
+LOG = r"""This is XeTeX, Version 3.141592653-2.6-0.999995 (TeX Live 2023) (preloaded format=xelatex 2024.1.1)
+(./chapter.tex
+LaTeX2e <2023-11-01> patch level 1
+(/usr/share/texlive/texmf-dist/tex/latex/base/article.cls
+Document Class: article 2023/05/17 v1.4n Standard LaTeX document class
+)
+./chapter.tex:27: Undefined control sequence.
+l.27 Let $x \in \R
+                  $ be a real number.
+The control sequence at the end of the top line
+of your error message was never \def'ed.
+
+! ==> Fatal error occurred, no output PDF file produced!
+"""
+
+TEX_STYLE_LOG = r"""(./chapter.tex
+! Missing $ inserted.
+<inserted text>
+                $
+l.14 The value a_
+                 1 is positive.
+"""
+
+
+def test_c_style_error_with_context():
+    errors = list(iter_latex_errors(io.StringIO(LOG)))
+
+    assert len(errors) == 1
+    assert (errors[0].file, errors[0].line, errors[0].message) == (
+        "./chapter.tex",
+        27,
+        "Undefined control sequence.",
+    )
+    assert errors[0].context == [r"Let $x \in \R", "$ be a real number."]
+    assert str(errors[0]).startswith("./chapter.tex:27: Undefined control sequence.\n    Let $x")
+
+
+def test_tex_style_error_gets_line_and_file(tmp_path):
+    log_path = tmp_path / "chapter.log"
+    log_path.write_text(TEX_STYLE_LOG + LOG)
+
+    errors = parse_latex_log(str(log_path), source_file="./chapter.tex", max_errors=1)
+    assert len(errors) == 1
+    assert str(errors[0]).splitlines()[0] == "./chapter.tex:14: Missing $ inserted."
+    assert errors[0].context == ["The value a_", "1 is positive."]
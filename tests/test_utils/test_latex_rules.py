@@ -0,0 +1,94 @@
+from easy_study_flashcards.utils.latex_rules import (
+    ERROR_PATCHES,
+    TEXT_RULES,
+    LatexRuleEngine,
+)
+
+
+def _engine():
+    return LatexRuleEngine(TEXT_RULES, ERROR_PATCHES)
+
+
+def test_text_rules_in_a_single_pass():
+    engine = _engine()
+    text = "```latex\n\\begin{enumerate>\n    \\item 50% of $x$ % a comment\n\\end{enumerate>\n```"
+
+    assert engine.apply_text_rules(text) == (
+        "\\begin{enumerate}\n    \\item 50\\% of $x$ % a comment\n\\end{enumerate}"
+    )
+    assert engine.hits == {
+        "code_fence_start": 1,
+        "code_fence_end": 1,
+        "enumerate_typo": 2,
+        "percent_after_number": 1,
+    }
+    # Already fixed text is left as it is
+    assert engine.apply_text_rules("\\item 50\\% of $x$") == "\\item 50\\% of $x$"
+
+
+def test_error_patches_use_signature_and_line():
+    engine = _engine()
+    document = "\n".join(
+        [
+            "\\begin{document}",
+            "Let $x \\in \\R$ and $n \\in \\N$.",
+            "Fish & chips cost $5.",
+            "The value a_1 is positive.",
+            "\\end{document}",
+        ]
+    )
+    errors = "\n".join(
+        [
+            "./chapter.tex:2: Undefined control sequence.",
+            "    Let $x \\in \\R",
+            "    $ and $n \\in \\N$.",
+            "./chapter.tex:3: Misplaced alignment tab character &.",
+            "./chapter.tex:3: Missing $ inserted.",
+            "./chapter.tex:4: Missing $ inserted.",
+        ]
+    )
+
+    patched, applied = engine.patch_errors(document, errors)
+    lines = patched.split("\n")
+    assert lines[1] == "Let $x \\in \\mathbb{R}$ and $n \\in \\mathbb{N}$."
+    assert lines[2] == "Fish \\& chips cost $5.$"
+    assert lines[3] == "The value a\\_{}1 is positive."
+    assert applied == ["undefined_number_set", "misplaced_ampersand", "missing_dollar", "missing_dollar"]
+    assert engine.hits["missing_dollar"] == 2
+
+
+def test_unknown_errors_are_left_to_the_model():
+    engine = _engine()
+    patched, applied = engine.patch_errors(
+        "\\begin{document}\n\\foo\n\\end{document}", "./chapter.tex:2: Undefined control sequence."
+    )
+    assert patched is None
+    assert applied == []
+
+
+def test_number_sets_are_patched_only_when_undefined():
+    engine = _engine()
+    document = "\n".join(
+        [
+            "\\documentclass{article}",
+            "\\newcommand{\\R}{\\mathbb{R}}",
+            "\\begin{document}",
+            "Let $x \\in \\R$ and \\foo.",
+            "\\end{document}",
+        ]
+    )
+
+    patched, applied = engine.patch_errors(
+        document, "./chapter.tex:4: Undefined control sequence.\n    Let $x \\in \\R$ and \\foo\n    ."
+    )
+    assert patched is None
+    assert applied == []
+
+    # Without a line, only the body is patched
+    patched, applied = engine.patch_errors(
+        document.replace("\\newcommand{\\R}{\\mathbb{R}}", "% \\R is defined below"),
+        "! Undefined control sequence.\n    Let $x \\in \\R\n    $ and \\foo.",
+    )
+    assert applied == ["undefined_number_set"]
+    assert patched.split("\n")[1] == "% \\R is defined below"
+    assert patched.split("\n")[3] == "Let $x \\in \\mathbb{R}$ and \\foo."